@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for websocket frame decoding
+Usage: python benchmarks/bench_decode.py [--rounds N] [--connections N]
+
+Replays recorded frames (benchmarks/recorded_frames.jsonl) through an eager
+path that parses every payload as soon as the envelope is decoded and through
+the lazy decode_frame/decode_payload path, and reports frames per second.
+Both paths do the same envelope decode, topic routing, frame_key and
+first-arrival filtering with the same decoder; they differ only in whether
+the payload is parsed before or after those checks. Each decoder is compared
+against its own eager run, so the orjson speedup is not credited to laziness.
+
+With --connections above 1 every frame is delivered once per connection, as
+with redundant sockets, and only the first copy has its payload decoded.
+Laziness only saves the parses of frames that are then skipped. On a single
+connection, where nearly every frame is wanted, the lazy path is not faster
+with either decoder: runs here put it at 0.7-1.0x of eager, the extra work
+before the parse costing about what the skipped parses save. With two or
+three redundant connections stdlib lazy reached 1.2-1.5x of eager. Most of
+the orjson speedup (1.7-2.5x) comes from the decoder, not from laziness.
+Timings are the best of several runs and still vary by tens of percent
+between runs on a shared machine.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+FRAMES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_frames.jsonl")
+
+def load_frames(path=FRAMES_FILE):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def eager(frames):
+    """Parse every payload up front, then route and filter like the bot does."""
+    arrivals = main.FirstArrivalFilter()
+    for raw in frames:
+        msg = main.decode_frame(raw)
+        if "data" in msg:
+            key = main.frame_key(msg)
+            try:
+                main.decode_payload(msg)
+            except ValueError:
+                pass
+        if msg.get("type") == "COMMAND" or "data" not in msg:
+            continue
+        if (msg.get("topic", main.TOPIC), "DATA") not in main.HANDLERS or not arrivals.first(key):
+            continue
+
+def lazy(frames):
+    """Envelope first, payload only for the first copy of a matching DATA frame."""
+    arrivals = main.FirstArrivalFilter()
+    for raw in frames:
+        msg = main.decode_frame(raw)
+        if msg.get("type") == "COMMAND" or "data" not in msg:
+            continue
+        if (msg.get("topic", main.TOPIC), "DATA") not in main.HANDLERS or not arrivals.first(main.frame_key(msg)):
+            continue
+        try:
+            main.decode_payload(msg)
+        except ValueError:
+            pass
+
+def measure(fn, frames, rounds, repeat=5):
+    """Best of ``repeat`` timed runs, after one untimed warm-up pass."""
+    fn(frames)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            fn(frames)
+        best = min(best, time.perf_counter() - start)
+    return len(frames) * rounds / best
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--connections", type=int, default=1)
+    args = parser.parse_args()
+
+    recorded = load_frames()
+    frames = [raw for raw in recorded for _ in range(args.connections)]
+    print(f"{len(recorded)} recorded frames x {args.connections} connection(s), {args.rounds} rounds")
+
+    decoders = ["json"] + (["orjson"] if main.orjson is not None else [])
+    stdlib = None
+    for name in decoders:
+        main.json_decode = main.get_json_decoder(name)
+        baseline = measure(eager, frames, args.rounds)
+        fps = measure(lazy, frames, args.rounds)
+        stdlib = stdlib or baseline
+        print(f"{'eager ' + name:<24} {baseline:>12,.0f} frames/s  ({baseline / stdlib:.2f}x eager json)")
+        print(f"{'lazy ' + name:<24} {fps:>12,.0f} frames/s  ({fps / baseline:.2f}x eager {name})")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput and latency benchmark against local fake servers
+Usage: python benchmarks/bench_pipeline.py [--frames N] [--rate FPS] [options]
+
+Starts the fake Binance websocket and fake Telegram API from tests/fakes.py,
+runs the real listen_announcements against them and pushes unique listing
+announcements. Reports the sustained receive rate, delivered alerts per
+second and p50/p99 latency from frame send to sendMessage acknowledgement.
+Runs fully offline.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "tests"))
+
+import main
+from fakes import FakeBinanceServer, FakeTelegramServer, bot_overrides, listing
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run(args):
+    binance = await FakeBinanceServer(api_key="bench_key", api_secret="bench_secret").start()
+    telegram = await FakeTelegramServer(
+        delay=args.telegram_delay, rate_limit_every=args.rate_limit_every,
+    ).start()
+    overrides = bot_overrides(main, binance, telegram)
+    try:
+        with patch.multiple(main, **overrides):
+            main._outbox = main.TelegramOutbox(
+                global_rate=args.global_rate, chat_rate=args.global_rate, workers=args.workers,
+                maxsize=max(args.frames * 2, 1000),
+            )
+            main._outbox_loop = asyncio.get_running_loop()
+            bot = asyncio.create_task(main.listen_announcements())
+            await asyncio.wait_for(binance.subscribed.wait(), 10)
+            await telegram.wait_for_messages(1)
+            baseline = len(telegram.messages)
+
+            announcements = [listing(i) for i in range(args.frames)]
+            started = time.perf_counter()
+            await binance.stream(announcements, args.rate)
+            sent_done = time.perf_counter()
+            try:
+                await telegram.wait_for_messages(baseline + args.frames, args.timeout)
+            except asyncio.TimeoutError:
+                print(f"Timed out with {len(telegram.messages) - baseline}/{args.frames} alerts delivered")
+            finished = time.perf_counter()
+
+            received = overrides["METRICS"].counters["messages_received"] - 1
+            latencies = []
+            for _, text, acked_at in telegram.messages[baseline:]:
+                title = text.split("\n")[2].strip()
+                if title in binance.sent_at:
+                    latencies.append((acked_at - binance.sent_at[title]) * 1000)
+
+            bot.cancel()
+            await asyncio.gather(bot, return_exceptions=True)
+            await main.stop_outbox(timeout=1)
+            await main.close_telegram_session()
+    finally:
+        await binance.stop()
+        await telegram.stop()
+
+    print(f"frames pushed          {args.frames} in {sent_done - started:.3f}s")
+    print(f"frames received        {received} ({received / (sent_done - started):,.0f} frames/s)")
+    print(f"alerts delivered       {len(latencies)} ({len(latencies) / (finished - started):,.0f} alerts/s)")
+    print(f"telegram 429s          {telegram.rate_limited}")
+    print(f"receive->ack p50       {percentile(latencies, 50):.2f} ms")
+    print(f"receive->ack p99       {percentile(latencies, 99):.2f} ms")
+    return latencies
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=0.0, help="frames per second, 0 = as fast as possible")
+    parser.add_argument("--workers", type=int, default=main.CONFIG.telegram_workers)
+    parser.add_argument("--global-rate", type=float, default=10000.0,
+                        help="outbox rate limit; defaults high to measure the pipeline, not Telegram limits")
+    parser.add_argument("--telegram-delay", type=float, default=0.0, help="seconds per sendMessage")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="return 429 on every Nth sendMessage")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    main.logger.setLevel(args.log_level.upper())
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: process start to first subscription and first alert
+Usage: python benchmarks/bench_startup.py [--runs N] [--script]
+
+Starts the fake Binance websocket, Telegram API and Binance REST servers
+from tests/fakes.py, then launches the bot as a fresh process pointed at
+them, the way a Kubernetes restart would. For every run it reports the time
+from spawning the process until ``import main`` finished, until the
+subscription was acknowledged and until the first listing pushed after
+that reached sendMessage. The "connected" notice is sent to the same chat
+just before, so with the default per-chat rate of one message per second
+the first alert waits for that budget; ``--chat-rate`` raises it to see
+the bot's own cost. ``--script`` starts ``python main.py`` instead of
+``python -m main`` to show the cost of recompiling the module on each start.
+Runs fully offline.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "tests"))
+
+from fakes import FakeAnnouncementServer, FakeBinanceServer, FakeTelegramServer, listing
+
+def bot_env(binance, telegram, rest, workdir, args):
+    env = dict(os.environ)
+    env.update({
+        "BINANCE_WS_BASE": binance.url,
+        "BINANCE_API_KEY": binance.api_key,
+        "BINANCE_API_SECRET": binance.api_secret,
+        "BINANCE_TIME_URL": rest.time_url,
+        "TELEGRAM_API_BASE": telegram.url,
+        "TELEGRAM_BOT_TOKEN": "123:FAKE",
+        "TELEGRAM_CHAT_ID": "1001",
+        "TELEGRAM_COALESCE_WINDOW": "0",
+        "POLL_ENABLED": "0",
+        "SYMBOL_SNAPSHOT_PATH": "",
+        "SYMBOL_REFRESH_INTERVAL": "0",
+        "METRICS_PORT": "0",
+        "DEDUP_DB_PATH": os.path.join(workdir, "dedup.sqlite3"),
+        "TELEGRAM_CHAT_RATE": str(args.chat_rate),
+        "LOG_LEVEL": args.log_level,
+    })
+    return env
+
+async def measure_import(env):
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", code, cwd=ROOT, env=env, stdout=asyncio.subprocess.PIPE,
+    )
+    out, _ = await proc.communicate()
+    return float(out.decode().strip()) * 1000
+
+async def measure_run(i, env, binance, telegram, args):
+    command = [sys.executable, "main.py"] if args.script else [sys.executable, "-m", "main"]
+    baseline = len(telegram.messages)
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(*command, cwd=ROOT, env=env, stdout=asyncio.subprocess.DEVNULL)
+    try:
+        await asyncio.wait_for(binance.subscribed.wait(), args.timeout)
+        subscribed = time.perf_counter()
+        data = listing(i, f"CS{i}")
+        await binance.push(data)
+        while not any(data["title"] in text for _, text, _ in telegram.messages[baseline:]):
+            await telegram.wait_for_messages(len(telegram.messages) + 1, args.timeout)
+        alerted = time.perf_counter()
+    finally:
+        proc.terminate()
+        await proc.wait()
+        await asyncio.sleep(0.05)
+    return (subscribed - started) * 1000, (alerted - started) * 1000
+
+def summary(name, values):
+    values = sorted(values)
+    p90 = values[min(len(values) - 1, round(0.9 * len(values)) - 1)]
+    print(f"{name:<26} median {statistics.median(values):8.1f} ms   p90 {p90:8.1f} ms")
+
+async def run(args):
+    binance = await FakeBinanceServer(api_key="bench_key", api_secret="bench_secret").start()
+    telegram = await FakeTelegramServer().start()
+    rest = await FakeAnnouncementServer().start()
+    imports, subscribes, alerts = [], [], []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            env = bot_env(binance, telegram, rest, workdir, args)
+            for i in range(args.runs):
+                imports.append(await measure_import(env))
+                subscribe_ms, alert_ms = await measure_run(i, env, binance, telegram, args)
+                subscribes.append(subscribe_ms)
+                alerts.append(alert_ms)
+    finally:
+        await binance.stop()
+        await telegram.stop()
+        await rest.stop()
+
+    print(f"runs                       {args.runs} ({'python main.py' if args.script else 'python -m main'})")
+    summary("import main", imports)
+    summary("start -> subscribed", subscribes)
+    summary("start -> first alert", alerts)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--script", action="store_true", help="run main.py as a script instead of -m main")
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="TELEGRAM_CHAT_RATE for the bot")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main_cli()
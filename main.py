@@ -1,46 +1,736 @@
 import asyncio
+import importlib.util
 import json
+import logging
+import logging.handlers
+import queue
+import sys
 import time
 import hmac
 import hashlib
 import secrets
 import string
-import requests
 import re
 import os
-import websockets
-from dotenv import load_dotenv
+import random
+import socket
+import sqlite3
+import ssl
+import threading
+import traceback
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+import aiohttp
 
-load_dotenv("config.env")
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-BINANCE_WS_BASE = "wss://api.binance.com/sapi/wss"
-BINANCE_API_KEY = os.getenv("BINANCE_API_KEY")
-BINANCE_API_SECRET = os.getenv("BINANCE_API_SECRET")
-BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-TOPIC = "com_announcement_en"
+def lazy_import(name):
+    """Return ``name`` as a module that is only executed on first attribute use.
+
+    ``requests`` and ``websockets`` are not needed until the clock sync and
+    the first connection, so importing them eagerly only delays startup.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+requests = lazy_import("requests")
+websockets = lazy_import("websockets")
+
+# Telegram rejects sendMessage texts longer than this many characters
+TELEGRAM_MESSAGE_LIMIT = 4096
+RECV_WINDOW = 30000
+
+class ConfigError(ValueError):
+    """Raised with every invalid setting listed, so one fix-and-restart is enough."""
+
+def _parse_pairs(spec, cast=float):
+    """Parse ``name=value,name=value`` settings, skipping malformed entries."""
+    pairs = {}
+    for entry in spec.split(","):
+        name, sep, value = entry.strip().partition("=")
+        if sep:
+            pairs[name] = cast(value)
+    return pairs
+
+def _csv(cast=str):
+    return lambda value: tuple(cast(v.strip()) for v in value.split(",") if v.strip())
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def setting(env, default=None, cast=str):
+    """Declare a Config field read from environment variable ``env``."""
+    return field(default=default, metadata={"env": env, "cast": cast})
+
+@dataclass(frozen=True)
+class Config:
+    """Every setting the bot reads from the environment, parsed and checked once.
+
+    ``from_env`` casts the raw strings (config.env first, the real
+    environment overriding it) and ``validate`` rejects values that would
+    otherwise only fail later at runtime. Importing the module reads
+    nothing: ``CONFIG`` starts out as the defaults and ``main`` installs the
+    one built from the environment with ``configure``.
+    """
+
+    binance_ws_base: str = setting("BINANCE_WS_BASE", "wss://api.binance.com/sapi/wss")
+    binance_time_url: str = setting("BINANCE_TIME_URL", "https://api.binance.com/api/v3/time")
+    binance_api_key: str = setting("BINANCE_API_KEY")
+    binance_api_secret: str = setting("BINANCE_API_SECRET")
+    binance_extra_credentials: str = setting("BINANCE_EXTRA_CREDENTIALS", "")
+    binance_connections: int = setting("BINANCE_CONNECTIONS", 1, int)
+    bot_token: str = setting("TELEGRAM_BOT_TOKEN")
+    chat_id: str = setting("TELEGRAM_CHAT_ID")
+    telegram_chats_file: str = setting("TELEGRAM_CHATS_FILE")
+    topics: tuple = setting("BINANCE_TOPICS", ("com_announcement_en",), _csv())
+    topic_config_file: str = setting("TOPIC_CONFIG_FILE")
+    announcement_rules_file: str = setting("ANNOUNCEMENT_RULES_FILE")
+    clock_sync_interval: float = setting("CLOCK_SYNC_INTERVAL", 300.0, float)
+    clock_sync_samples: int = setting("CLOCK_SYNC_SAMPLES", 3, int)
+    reconnect_base_delay: float = setting("RECONNECT_BASE_DELAY", 0.5, float)
+    reconnect_max_delay: float = setting("RECONNECT_MAX_DELAY", 60.0, float)
+    reconnect_auth_delay: float = setting("RECONNECT_AUTH_DELAY", 30.0, float)
+    ping_interval: float = setting("PING_INTERVAL", 10.0, float)
+    pong_timeout: float = setting("PONG_TIMEOUT", 5.0, float)
+    silence_timeout: float = setting("SILENCE_TIMEOUT", 0.0, float)
+    dedup_db_path: str = setting("DEDUP_DB_PATH", "dedup.sqlite3")
+    dedup_ttl: float = setting("DEDUP_TTL", 7 * 24 * 3600.0, float)
+    dedup_max_entries: int = setting("DEDUP_MAX_ENTRIES", 10000, int)
+    dedup_flush_interval: float = setting("DEDUP_FLUSH_INTERVAL", 1.0, float)
+    metrics_host: str = setting("METRICS_HOST", "0.0.0.0")
+    metrics_port: int = setting("METRICS_PORT", 9100, int)
+    health_max_silence: float = setting("HEALTH_MAX_SILENCE", 900.0, float)
+    json_decoder: str = setting("JSON_DECODER", "auto")
+    log_level: str = setting("LOG_LEVEL", "INFO", str.upper)
+    log_sample_rates: str = setting("LOG_SAMPLE_RATES", "frame_received=0.01,ping_sent=0.1")
+    symbol_snapshot_path: str = setting("SYMBOL_SNAPSHOT_PATH", "exchange_info.json")
+    symbol_refresh_url: str = setting("SYMBOL_REFRESH_URL", "https://api.binance.com/api/v3/exchangeInfo")
+    symbol_refresh_interval: float = setting("SYMBOL_REFRESH_INTERVAL", 3600.0, float)
+    announcement_rest_url: str = setting(
+        "ANNOUNCEMENT_REST_URL", "https://www.binance.com/bapi/composite/v1/public/cms/article/list/query"
+    )
+    poll_enabled: bool = setting("POLL_ENABLED", True, _flag)
+    poll_catalog_ids: tuple = setting("POLL_CATALOG_IDS", (48,), _csv(int))
+    poll_min_interval: float = setting("POLL_MIN_INTERVAL", 1.0, float)
+    poll_max_interval: float = setting("POLL_MAX_INTERVAL", 15.0, float)
+    poll_lookback: float = setting("POLL_LOOKBACK", 600.0, float)
+    lease_backend: str = setting("LEASE_BACKEND", "none")
+    lease_name: str = setting("LEASE_NAME", "notification-bot")
+    lease_file: str = setting("LEASE_FILE", "/tmp/notification-bot.lease")
+    lease_duration: float = setting("LEASE_DURATION", 15.0, float)
+    lease_renew_interval: float = setting("LEASE_RENEW_INTERVAL", 5.0, float)
+    standby_replay_window: float = setting("STANDBY_REPLAY_WINDOW", 60.0, float)
+    pod_name: str = setting("POD_NAME")
+    pod_namespace: str = setting("POD_NAMESPACE")
+    pipeline_queue_size: int = setting("PIPELINE_QUEUE_SIZE", 1024, int)
+    pipeline_concurrency: str = setting("PIPELINE_CONCURRENCY", "decode=1,classify=1,render=1")
+    telegram_api_base: str = setting("TELEGRAM_API_BASE", "https://api.telegram.org")
+    telegram_connect_timeout: float = setting("TELEGRAM_CONNECT_TIMEOUT", 3.0, float)
+    telegram_total_timeout: float = setting("TELEGRAM_TOTAL_TIMEOUT", 10.0, float)
+    telegram_pool_size: int = setting("TELEGRAM_POOL_SIZE", 8, int)
+    telegram_keepalive: float = setting("TELEGRAM_KEEPALIVE", 60.0, float)
+    telegram_queue_size: int = setting("TELEGRAM_QUEUE_SIZE", 1000, int)
+    telegram_drop_policy: str = setting("TELEGRAM_DROP_POLICY", "drop_oldest")
+    telegram_workers: int = setting("TELEGRAM_WORKERS", 4, int)
+    telegram_global_rate: float = setting("TELEGRAM_GLOBAL_RATE", 30.0, float)
+    telegram_chat_rate: float = setting("TELEGRAM_CHAT_RATE", 1.0, float)
+    telegram_max_retries: int = setting("TELEGRAM_MAX_RETRIES", 5, int)
+    telegram_broadcast_concurrency: int = setting("TELEGRAM_BROADCAST_CONCURRENCY", 50, int)
+    telegram_coalesce_window: float = setting("TELEGRAM_COALESCE_WINDOW", 0.5, float)
+    telegram_lane_rates: str = setting("TELEGRAM_LANE_RATES", "status=3,digest=1")
+    digest_interval: float = setting("DIGEST_INTERVAL", 0.0, float)
+    history_size: int = setting("HISTORY_SIZE", 500, int)
+    telegram_commands: bool = setting("TELEGRAM_COMMANDS", True, _flag)
+    telegram_poll_timeout: int = setting("TELEGRAM_POLL_TIMEOUT", 25, int)
+    loop_lag_interval: float = setting("LOOP_LAG_INTERVAL", 0.25, float)
+    loop_lag_threshold: float = setting("LOOP_LAG_THRESHOLD", 0.5, float)
+    profile_seconds: float = setting("PROFILE_SECONDS", 30.0, float)
+    profile_dir: str = setting("PROFILE_DIR", "/tmp")
+    shutdown_timeout: float = setting("SHUTDOWN_TIMEOUT", 20.0, float)
+    outbox_spool_path: str = setting("OUTBOX_SPOOL_PATH", "outbox-spool.json")
+
+    # Settings that must be > 0 and settings where 0 means "disabled"
+    POSITIVE = (
+        "binance_connections", "clock_sync_interval", "clock_sync_samples", "reconnect_base_delay",
+        "reconnect_max_delay", "ping_interval", "pong_timeout", "dedup_max_entries", "poll_min_interval", "poll_max_interval",
+        "lease_duration", "lease_renew_interval", "pipeline_queue_size", "telegram_connect_timeout",
+        "telegram_total_timeout", "telegram_pool_size", "telegram_queue_size", "telegram_workers",
+        "telegram_global_rate", "telegram_chat_rate", "telegram_broadcast_concurrency", "history_size",
+        "loop_lag_interval", "profile_seconds", "shutdown_timeout",
+    )
+    NON_NEGATIVE = (
+        "reconnect_auth_delay", "silence_timeout", "dedup_ttl", "dedup_flush_interval", "health_max_silence",
+        "symbol_refresh_interval", "poll_lookback", "standby_replay_window", "telegram_keepalive",
+        "telegram_max_retries", "telegram_coalesce_window", "digest_interval", "telegram_poll_timeout",
+        "loop_lag_threshold",
+    )
+    URLS = {
+        "binance_ws_base": ("ws", "wss"),
+        "binance_time_url": ("http", "https"),
+        "symbol_refresh_url": ("http", "https"),
+        "announcement_rest_url": ("http", "https"),
+        "telegram_api_base": ("http", "https"),
+    }
+    CHOICES = {
+        "json_decoder": ("auto", "json", "orjson"),
+        "log_level": ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"),
+        "lease_backend": ("none", "memory", "file", "kubernetes"),
+        "telegram_drop_policy": ("drop_oldest", "drop_newest"),
+    }
+
+    @classmethod
+    def from_env(cls, env=None, env_file="config.env"):
+        """Build and validate a Config from ``env`` (default: config.env + os.environ)."""
+        if env is None:
+            env = {}
+            if env_file and os.path.exists(env_file):
+                from dotenv import dotenv_values
+                env.update((k, v) for k, v in dotenv_values(env_file).items() if v is not None)
+            env.update(os.environ)
+        values = {}
+        errors = []
+        for f in fields(cls):
+            raw = env.get(f.metadata["env"])
+            if raw is None:
+                continue
+            try:
+                values[f.name] = f.metadata["cast"](raw)
+            except ValueError:
+                errors.append(f"{f.metadata['env']}={raw!r} is not a valid {f.type.__name__}")
+        if not values.get("pod_name"):
+            values["pod_name"] = env.get("HOSTNAME") or socket.gethostname()
+        config = cls(**values)
+        errors += config.problems()
+        if errors:
+            raise ConfigError("Invalid configuration: " + "; ".join(errors))
+        return config
+
+    @property
+    def subscription(self):
+        """The SUBSCRIBE value covering every configured topic."""
+        return "|".join(self.topics)
+
+    def env_name(self, name):
+        return self.__dataclass_fields__[name].metadata["env"]
+
+    def validate(self):
+        errors = self.problems()
+        if errors:
+            raise ConfigError("Invalid configuration: " + "; ".join(errors))
+        return self
+
+    def problems(self):
+        """List every setting that is out of range, malformed or inconsistent."""
+        errors = []
+        for name in self.POSITIVE:
+            if getattr(self, name) <= 0:
+                errors.append(f"{self.env_name(name)} must be > 0")
+        for name in self.NON_NEGATIVE:
+            if getattr(self, name) < 0:
+                errors.append(f"{self.env_name(name)} must be >= 0")
+        for name, schemes in self.URLS.items():
+            parts = urlsplit(getattr(self, name))
+            if parts.scheme not in schemes or not parts.netloc:
+                errors.append(f"{self.env_name(name)} must be a {'/'.join(schemes)} URL")
+        for name, choices in self.CHOICES.items():
+            if getattr(self, name) not in choices:
+                errors.append(f"{self.env_name(name)} must be one of {', '.join(choices)}")
+        if not self.topics:
+            errors.append("BINANCE_TOPICS must name at least one topic")
+        if not 0 <= self.metrics_port <= 65535:
+            errors.append("METRICS_PORT must be between 0 and 65535")
+        if self.poll_min_interval > self.poll_max_interval:
+            errors.append("POLL_MIN_INTERVAL must not exceed POLL_MAX_INTERVAL")
+        if self.lease_backend != "none" and self.lease_renew_interval >= self.lease_duration:
+            errors.append("LEASE_RENEW_INTERVAL must be shorter than LEASE_DURATION")
+        for name, cast in (("log_sample_rates", float), ("pipeline_concurrency", int),
+                           ("telegram_lane_rates", float)):
+            try:
+                _parse_pairs(getattr(self, name), cast)
+            except ValueError:
+                errors.append(f"{self.env_name(name)} must be name=value pairs")
+        return errors
+
+CONFIG = Config()
+
+_telegram_session = None
+_telegram_session_loop = None
+
+logger = logging.getLogger("notificationbot")
+_log_listener = None
+
+REDACTED = "***"
+SECRET_FIELDS = {"signature", "secret", "api_secret", "api_key", "token", "bot_token"}
+
+_sample_rates = _parse_pairs(CONFIG.log_sample_rates)
+
+def redact(value):
+    """Mask configured credentials anywhere inside a log value."""
+    if isinstance(value, str):
+        for secret in (CONFIG.binance_api_secret, CONFIG.binance_api_key, CONFIG.bot_token):
+            if secret and secret in value:
+                value = value.replace(secret, REDACTED)
+        return re.sub(r"signature=[0-9a-f]+", "signature=" + REDACTED, value)
+    if isinstance(value, dict):
+        return {k: REDACTED if k.lower() in SECRET_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON line with its structured fields, redacted."""
+
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "event": record.msg,
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(redact(payload), default=str, ensure_ascii=False)
+
+class _FieldsQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the record untouched so formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+def log(level, event, **fields):
+    """Emit a structured event; cheap no-op when the level is disabled.
+
+    Events listed in LOG_SAMPLE_RATES are only emitted for that fraction of
+    calls, which keeps per-frame logs from dominating output.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    rate = _sample_rates.get(event)
+    if rate is not None and random.random() >= rate:
+        return
+    logger.log(level, event, extra={"fields": fields})
+
+def setup_logging(level=None, stream=None):
+    """Send log records through a queue to a JSON-lines handler on a thread."""
+    level = CONFIG.log_level if level is None else level
+    global _log_listener
+    stop_logging()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    logger.handlers = [_FieldsQueueHandler(log_queue)]
+    logger.setLevel(level)
+    logger.propagate = False
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+
+def stop_logging():
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+def load_chat_ids(path=None, chat_id=None):
+    """Collect broadcast targets from TELEGRAM_CHAT_ID and the chats file.
+
+    The file holds one chat or channel id per line; blank lines and lines
+    starting with ``#`` are ignored. Duplicates are dropped, order is kept.
+    """
+    path = CONFIG.telegram_chats_file if path is None else path
+    chat_id = CONFIG.chat_id if chat_id is None else chat_id
+    chat_ids = [c.strip() for c in (chat_id or "").split(",") if c.strip()]
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        chat_ids.append(line)
+        except OSError as e:
+            log(logging.ERROR, "chats_file_read_failed", path=path, error=str(e))
+    return list(dict.fromkeys(chat_ids))
+
+CHAT_IDS = load_chat_ids()
+
+ANNOUNCEMENT_FIELDS = ("title", "content", "body", "description", "catalogName")
+
+# Used when ANNOUNCEMENT_RULES_FILE is not set. Catalog 48 is
+# "New Cryptocurrency Listing"; the keyword rule covers listings posted
+# under other catalogs.
+DEFAULT_ANNOUNCEMENT_RULES = [
+    {"name": "new_listing_catalog", "catalog_ids": [48]},
+    {
+        "name": "listing_keywords",
+        "fields": list(ANNOUNCEMENT_FIELDS),
+        "include": ["will list", "new listing", "trading pair", "binance will list", "will add", "binance will add"],
+    },
+]
+
+# Below this many terms CPython's substring search beats a combined regex,
+# so small term sets are scanned with ``in`` and larger ones with one
+# prefix-factored pattern.
+TRIE_REGEX_MIN_TERMS = 16
+
+def _trie_regex(terms):
+    """Compile literal terms into one prefix-factored regex.
+
+    Shared prefixes are merged (``will (?:add|list)``) so the engine walks
+    the text once instead of retrying every term at every position.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node):
+        if "" in node and len(node) == 1:
+            return ""
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            pattern = "(?:" + pattern + ")?"
+        return pattern
+
+    return re.compile(build(trie))
+
+def _compile_terms(terms):
+    """Return a ``matcher(lowercased_text) -> bool`` for a set of terms, or None.
+
+    Terms that contain a shorter term are redundant for a containment test
+    and are dropped before compiling.
+    """
+    terms = sorted({t.lower() for t in terms if t}, key=len)
+    terms = [t for i, t in enumerate(terms) if not any(o in t for o in terms[:i])]
+    if not terms:
+        return None
+    if len(terms) >= TRIE_REGEX_MIN_TERMS:
+        search = _trie_regex(terms).search
+        return lambda text: search(text) is not None
+    terms = tuple(terms)
+
+    def matcher(text):
+        for term in terms:
+            if term in text:
+                return True
+        return False
+    return matcher
+
+class AnnouncementRule:
+    __slots__ = ("name", "catalog_ids", "fields", "include", "exclude")
+
+    def __init__(self, name, catalog_ids=(), fields=ANNOUNCEMENT_FIELDS, include=(), exclude=()):
+        self.name = name
+        self.catalog_ids = frozenset(catalog_ids)
+        self.fields = tuple(fields)
+        self.include = _compile_terms(include)
+        self.exclude = _compile_terms(exclude)
+
+    def _search(self, matcher, data):
+        for field in self.fields:
+            value = data.get(field)
+            if value and isinstance(value, str) and matcher(value.lower()):
+                return True
+        return False
+
+    def matches(self, data):
+        if self.catalog_ids and data.get("catalogId") not in self.catalog_ids:
+            return False
+        if self.include is not None and not self._search(self.include, data):
+            return False
+        if self.exclude is not None and self._search(self.exclude, data):
+            return False
+        return True
+
+class AnnouncementClassifier:
+    """Rules engine compiled once at startup.
+
+    Rules are evaluated in order and ``classify`` returns the name of the
+    first one that matches, or None. Rules that only filter on catalogId are
+    resolved with a dict lookup, so only the text rules declared before the
+    catalog hit still need to scan the announcement.
+    """
+
+    def __init__(self, rules):
+        # (position, rule) for rules that look at text; by_catalog maps a
+        # catalogId to the (position, name) of the first catalog-only rule
+        self.rules = []
+        self.by_catalog = {}
+        for position, spec in enumerate(rules):
+            rule = AnnouncementRule(
+                spec["name"],
+                catalog_ids=spec.get("catalog_ids", ()),
+                fields=spec.get("fields", ANNOUNCEMENT_FIELDS),
+                include=spec.get("include", ()),
+                exclude=spec.get("exclude", ()),
+            )
+            if rule.catalog_ids and rule.include is None and rule.exclude is None:
+                for catalog_id in rule.catalog_ids:
+                    self.by_catalog.setdefault(catalog_id, (position, rule.name))
+            else:
+                self.rules.append((position, rule))
+
+    @classmethod
+    def from_file(cls, path=None):
+        path = CONFIG.announcement_rules_file if path is None else path
+        if not path:
+            return cls(DEFAULT_ANNOUNCEMENT_RULES)
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def classify(self, data):
+        position, name = self.by_catalog.get(data.get("catalogId"), (None, None))
+        for rule_position, rule in self.rules:
+            if position is not None and rule_position > position:
+                break
+            if rule.matches(data):
+                return rule.name
+        return name
+
+DEFAULT_ALERT_TEMPLATE = "NEW LISTING ALERT! \nToken: {tokens}\n {title}\n\nCheck Binance now!"
+
+TICKER_PATTERN = re.compile(r"\(([A-Z0-9]{2,15})\)")
+TICKER_STOPWORDS = frozenset({"UTC", "KYC", "FAQ", "API", "APR", "APY", "VIP", "NFT", "AML"})
+
+def extract_symbols(*texts):
+    """Return every parenthesised ticker in the texts, in order, without repeats."""
+    symbols = {}
+    for text in texts:
+        if text:
+            for symbol in TICKER_PATTERN.findall(text):
+                if symbol not in TICKER_STOPWORDS and not symbol.isdigit():
+                    symbols[symbol] = None
+    return list(symbols)
+
+class SymbolIndex:
+    """Base asset -> trading status, loaded from a local exchangeInfo snapshot.
+
+    Lookups are dict hits and never touch the network. ``run`` refreshes the
+    snapshot from SYMBOL_REFRESH_URL in a worker thread and swaps the index
+    in one assignment. The snapshot may be a full exchangeInfo response or
+    the compact ``{"assets": {...}}`` form this class writes.
+    """
+
+    def __init__(self, path=None, url=None, interval=None):
+        self.path = CONFIG.symbol_snapshot_path if path is None else path
+        self.url = CONFIG.symbol_refresh_url if url is None else url
+        self.interval = CONFIG.symbol_refresh_interval if interval is None else interval
+        self.assets = {}
+
+    @staticmethod
+    def _index(info):
+        if "assets" in info:
+            return dict(info["assets"])
+        assets = {}
+        for entry in info.get("symbols", ()):
+            base, status = entry.get("baseAsset"), entry.get("status")
+            if base and assets.get(base) != "TRADING":
+                assets[base] = status
+        return assets
+
+    def load(self):
+        if not self.path:
+            return 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.assets = self._index(json.load(f))
+        except (OSError, ValueError) as e:
+            log(logging.WARNING, "symbol_snapshot_unavailable", path=self.path, error=str(e))
+            return 0
+        log(logging.INFO, "symbol_snapshot_loaded", path=self.path, assets=len(self.assets))
+        return len(self.assets)
+
+    def refresh(self):
+        r = requests.get(self.url, timeout=10)
+        r.raise_for_status()
+        assets = self._index(r.json())
+        if self.path:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"assets": assets}, f)
+            os.replace(tmp, self.path)
+        self.assets = assets
+        return len(assets)
+
+    async def run(self):
+        delay = self.interval if self.assets else 0
+        while True:
+            await asyncio.sleep(delay)
+            delay = self.interval
+            try:
+                count = await asyncio.to_thread(self.refresh)
+                log(logging.INFO, "symbol_snapshot_refreshed", assets=count)
+            except Exception as e:
+                log(logging.WARNING, "symbol_refresh_failed", error=str(e))
+
+    def status(self, symbol):
+        return self.assets.get(symbol)
+
+    def annotate(self, symbols):
+        """Render symbols for an alert, flagging those not trading yet.
+
+        Without a loaded snapshot nothing is known, so nothing is flagged.
+        """
+        if not self.assets:
+            return list(symbols)
+        return [s if self.assets.get(s) == "TRADING" else f"{s} (not trading yet)" for s in symbols]
+
+SYMBOLS = SymbolIndex()
+
+class RecentAnnouncement:
+    __slots__ = ("title", "symbols", "catalog_id", "catalog_name", "published_at", "rule")
+
+    def __init__(self, title, symbols, catalog_id, catalog_name, published_at, rule):
+        self.title = title
+        self.symbols = symbols
+        self.catalog_id = catalog_id
+        self.catalog_name = catalog_name
+        self.published_at = published_at
+        self.rule = rule
+
+class AnnouncementHistory:
+    """Fixed-size ring of recent announcements, indexed by symbol and catalog.
+
+    The ring holds ``size`` slotted records; adding one to a full ring
+    evicts the oldest. Because the evicted record is the oldest in every
+    index it appears in, each index is a deque trimmed from the left, so
+    adds, evictions and lookups are O(1) and memory never grows past
+    ``size`` records.
+    """
+
+    def __init__(self, size=None):
+        self.size = CONFIG.history_size if size is None else size
+        self.ring = [None] * self.size
+        self.next = 0
+        self.count = 0
+        self.by_symbol = {}
+        self.by_catalog = {}
+
+    def add(self, data, rule=None):
+        published = data.get("publishDate")
+        if not isinstance(published, (int, float)):
+            published = time.time() * 1000
+        record = RecentAnnouncement(
+            data.get("title", ""), tuple(extract_symbols(data.get("title", ""), data.get("body"))),
+            data.get("catalogId"), data.get("catalogName"), published / 1000, rule,
+        )
+        evicted = self.ring[self.next]
+        if evicted is not None:
+            for symbol in evicted.symbols:
+                self._evict(self.by_symbol, symbol, evicted)
+            self._evict(self.by_catalog, evicted.catalog_id, evicted)
+        self.ring[self.next] = record
+        self.next = (self.next + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        for symbol in record.symbols:
+            self.by_symbol.setdefault(symbol, deque()).append(record)
+        self.by_catalog.setdefault(record.catalog_id, deque()).append(record)
+        return record
+
+    @staticmethod
+    def _evict(index, key, record):
+        entries = index.get(key)
+        if entries and entries[0] is record:
+            entries.popleft()
+            if not entries:
+                del index[key]
+
+    def recent(self, limit=10, since=None):
+        """Newest published first, optionally only those published after ``since``.
+
+        The ring is in arrival order, and REST catch-up can add older
+        articles after newer stream frames, so the whole ring is filtered
+        and sorted rather than walked until the first old entry.
+        """
+        found = [record for record in self.ring
+                 if record is not None and (since is None or record.published_at >= since)]
+        found.sort(key=lambda record: record.published_at, reverse=True)
+        return found[:limit]
+
+    def symbol(self, symbol, limit=10):
+        return list(reversed(self.by_symbol.get(symbol.upper(), ())))[:limit]
+
+    def catalog(self, catalog_id, limit=10):
+        return list(reversed(self.by_catalog.get(catalog_id, ())))[:limit]
+
+HISTORY = AnnouncementHistory()
 
 def generate_random_string(length=16):
     return ''.join(secrets.choice(string.ascii_lowercase + string.digits) for _ in range(length))
 
-def get_binance_server_time():
-    try:
-        r = requests.get("https://api.binance.com/api/v3/time", timeout=5)
+class ClockSync:
+    """Estimate the offset between the local clock and Binance server time.
+
+    Each sync takes a few round trips to /api/v3/time and keeps the sample
+    with the smallest RTT, assuming the server stamped its reply halfway
+    through the round trip. Signing then only needs local time plus the
+    cached offset.
+    """
+
+    def __init__(self, samples=None, interval=None):
+        self.samples = CONFIG.clock_sync_samples if samples is None else samples
+        self.interval = CONFIG.clock_sync_interval if interval is None else interval
+        self.offset_ms = 0.0
+        self.rtt_ms = None
+        self.synced_at = None
+
+    def measure(self):
+        start = time.time()
+        r = requests.get(CONFIG.binance_time_url, timeout=5)
+        end = time.time()
         server_time = int(r.json()["serverTime"])
-        print(f"Server time: {server_time}")
-        return server_time
-    except Exception as e:
-        print(f"Failed to get server time: {e}")
-        # Fallback to local time
-        local_time = int(time.time() * 1000)
-        print(f"Using local time: {local_time}")
-        return local_time
-
-def create_signed_url(topic=TOPIC, recvWindow=30000):
-    if not BINANCE_API_SECRET:
+        rtt_ms = (end - start) * 1000
+        return server_time - (start * 1000 + rtt_ms / 2), rtt_ms
+
+    def sync(self):
+        best = None
+        for _ in range(self.samples):
+            try:
+                sample = self.measure()
+            except Exception as e:
+                log(logging.WARNING, "clock_sync_sample_failed", error=str(e))
+                continue
+            if best is None or sample[1] < best[1]:
+                best = sample
+        if best is None:
+            log(logging.WARNING, "clock_sync_failed", offset_ms=round(self.offset_ms))
+            return False
+        self.offset_ms, self.rtt_ms = best
+        self.synced_at = time.monotonic()
+        log(logging.INFO, "clock_synced", offset_ms=round(self.offset_ms), rtt_ms=round(self.rtt_ms))
+        return True
+
+    def now_ms(self):
+        return int(time.time() * 1000 + self.offset_ms)
+
+    async def run(self):
+        """Refresh the offset in the background without blocking the loop."""
+        while True:
+            await asyncio.sleep(self.interval)
+            await asyncio.to_thread(self.sync)
+
+CLOCK = ClockSync()
+
+def create_signed_url(topic=None, recvWindow=RECV_WINDOW, api_secret=None):
+    topic = CONFIG.subscription if topic is None else topic
+    api_secret = api_secret or CONFIG.binance_api_secret
+    if not api_secret:
         raise RuntimeError("BINANCE_API_SECRET missing")
 
-    timestamp = str(get_binance_server_time())
+    timestamp = str(CLOCK.now_ms())
 
     params = {
         "random": generate_random_string(16),
@@ -52,136 +742,2208 @@ def create_signed_url(topic=TOPIC, recvWindow=30000):
     sorted_items = sorted(params.items(), key=lambda kv: kv[0])
     payload = "&".join(f"{k}={v}" for k, v in sorted_items)
 
-    print("Signature payload:", payload)
-
     signature = hmac.new(
-        BINANCE_API_SECRET.encode("utf-8"),
+        api_secret.encode("utf-8"),
         payload.encode("utf-8"),
         hashlib.sha256
     ).hexdigest()
 
-    print("Signature:", signature)
-
-    final_url = f"{BINANCE_WS_BASE}?{payload}&signature={signature}"
+    final_url = f"{CONFIG.binance_ws_base}?{payload}&signature={signature}"
     return final_url
 
-async def notify_telegram(text):
-    if not BOT_TOKEN or not CHAT_ID:
-        print("Telegram not configured - missing BOT_TOKEN or CHAT_ID")
+class PresignedUrl:
+    """Keep the next signed websocket URL ready before a reconnect needs it.
+
+    A signed URL is accepted while its timestamp is within recvWindow of
+    server time, so a prepared URL is reused for half that window.
+    """
+
+    def __init__(self, topic=None, recvWindow=RECV_WINDOW, api_secret=None):
+        self.topic = CONFIG.subscription if topic is None else topic
+        self.recvWindow = recvWindow
+        self.api_secret = api_secret
+        self.ttl = recvWindow / 1000 / 2
+        self.url = None
+        self.expires_at = 0.0
+
+    def refresh(self):
+        self.url = create_signed_url(self.topic, self.recvWindow, self.api_secret)
+        self.expires_at = time.monotonic() + self.ttl
+        return self.url
+
+    def take(self):
+        """Return a valid signed URL and prepare a fresh one for next time."""
+        url = self.url if self.url and time.monotonic() < self.expires_at else self.refresh()
+        self.refresh()
+        return url
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            try:
+                self.refresh()
+            except Exception as e:
+                log(logging.ERROR, "presign_failed", error=str(e))
+
+def binance_credentials():
+    """Return the (api_key, api_secret) pairs available to connections.
+
+    The primary key pair comes first; BINANCE_EXTRA_CREDENTIALS adds more as
+    comma separated ``key:secret`` entries.
+    """
+    credentials = [(CONFIG.binance_api_key, CONFIG.binance_api_secret)]
+    for entry in CONFIG.binance_extra_credentials.split(","):
+        key, sep, secret = entry.strip().partition(":")
+        if sep and key and secret:
+            credentials.append((key, secret))
+    return credentials
+
+class FirstArrivalFilter:
+    """Pass the first copy of a frame and drop copies from other connections.
+
+    Keys are kept in insertion order and the oldest are evicted once
+    ``maxsize`` is reached, so memory stays bounded.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.seen = OrderedDict()
+        self.duplicates = 0
+
+    def first(self, key):
+        if key in self.seen:
+            self.duplicates += 1
+            return False
+        self.seen[key] = None
+        if len(self.seen) > self.maxsize:
+            self.seen.popitem(last=False)
+        return True
+
+def frame_key(msg):
+    """Identity of a DATA frame that is identical on every connection."""
+    data = msg.get("data")
+    if not isinstance(data, str):
+        data = json.dumps(data, sort_keys=True)
+    return hash((msg.get("topic"), data))
+
+async def get_telegram_session():
+    """Return the shared keep-alive session used for every Telegram call.
+
+    The session is created lazily on the running loop so that all sends reuse
+    the same pooled TLS connections instead of handshaking per alert.
+    """
+    global _telegram_session, _telegram_session_loop
+    loop = asyncio.get_running_loop()
+    if _telegram_session is None or _telegram_session.closed or _telegram_session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=CONFIG.telegram_pool_size,
+            keepalive_timeout=CONFIG.telegram_keepalive,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(total=CONFIG.telegram_total_timeout, connect=CONFIG.telegram_connect_timeout)
+        _telegram_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        _telegram_session_loop = loop
+    return _telegram_session
+
+async def close_telegram_session():
+    global _telegram_session, _telegram_session_loop
+    if _telegram_session is not None and not _telegram_session.closed:
+        await _telegram_session.close()
+    _telegram_session = None
+    _telegram_session_loop = None
+
+async def warm_telegram_connection():
+    """Open the pooled Telegram connection before the first alert needs it."""
+    if not CONFIG.bot_token:
         return
-    
-    print(f"Sending Telegram message to chat {CHAT_ID}")
-    print(f"Message: {text[:100]}")
-    
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
     try:
-        response = requests.post(url, data={"chat_id": CHAT_ID, "text": text}, timeout=10)
-        
-        if response.status_code == 200:
-            print("Telegram message sent successfully!")
-        else:
-            print(f"Telegram API error: {response.status_code}")
-            print(f"Response: {response.text}")
-            
+        session = await get_telegram_session()
+        async with session.get(f"{CONFIG.telegram_api_base}/bot{CONFIG.bot_token}/getMe") as response:
+            await response.read()
+            log(logging.INFO, "telegram_warmed", status=response.status)
+    except Exception as e:
+        log(logging.WARNING, "telegram_warmup_failed", error=str(e))
+
+async def send_telegram_message(chat_id, text):
+    """POST a single sendMessage call.
+
+    Returns ``(status, retry_after)``; status is None when the request never
+    got a response and retry_after is only set on HTTP 429.
+    """
+    url = f"{CONFIG.telegram_api_base}/bot{CONFIG.bot_token}/sendMessage"
+    try:
+        session = await get_telegram_session()
+        async with session.post(url, data={"chat_id": chat_id, "text": text}) as response:
+            if response.status == 200:
+                return 200, None
+            body = await response.text()
+            retry_after = None
+            if response.status == 429:
+                try:
+                    retry_after = float(json.loads(body)["parameters"]["retry_after"])
+                except Exception:
+                    retry_after = 1.0
+            log(logging.WARNING, "telegram_api_error", chat_id=chat_id, status=response.status, response=body)
+            return response.status, retry_after
     except Exception as e:
-        print(f"Telegram send failed: {e}")
-        print(f"URL: {url}")
-        print(f"Chat ID: {CHAT_ID}")
-        print(f"Bot token starts with: {BOT_TOKEN[:10] if BOT_TOKEN else 'None'}...")
+        log(logging.WARNING, "telegram_send_failed", chat_id=chat_id, error=str(e))
+        return None, None
 
-async def send_ping(ws):
-    while True:
+class TokenBucket:
+    """Async token bucket; ``pause`` blocks it for a server-imposed retry_after.
+
+    ``acquire`` takes an optional priority (0 is highest). A waiter never
+    takes a token while one of higher priority is waiting, so a listing
+    alert is not held up by a status message queued for the same chat.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = {}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def _outranked(self, priority):
+        return any(count and p < priority for p, count in self.waiting.items())
+
+    async def acquire(self, priority=0):
+        self.waiting[priority] = self.waiting.get(priority, 0) + 1
         try:
-            await asyncio.sleep(25)
-            await ws.ping()
-            print("WebSocket PING sent")
-        except Exception as e:
-            print(f"Ping error: {e}")
-            break
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.tokens >= 1 and not self._outranked(priority):
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep(max(1 - self.tokens, 0.05) / self.rate)
+        finally:
+            self.waiting[priority] -= 1
 
-async def listen_announcements():
-    if not BINANCE_API_KEY:
-        raise RuntimeError("BINANCE_API_KEY missing")
-    
-    print(f"API Key: {BINANCE_API_KEY[:10]}..." if BINANCE_API_KEY else "API Key: None")
-    print(f"API Secret: {BINANCE_API_SECRET[:10]}..." if BINANCE_API_SECRET else "API Secret: None")
+# Outbox lanes, highest priority first
+TELEGRAM_LANES = ("listing", "status", "digest")
+
+class LaneQueue:
+    """Bounded multi-lane FIFO whose consumers always take the highest lane first.
+
+    Mirrors the ``asyncio.Queue`` calls the outbox uses (``qsize``,
+    ``full``, ``task_done``, ``join``) with the total size bounded across
+    lanes. ``get`` can be told to skip lower lanes, which is how the outbox
+    keeps a worker free for listings.
+    """
+
+    def __init__(self, maxsize=0, lanes=TELEGRAM_LANES):
+        self.maxsize = maxsize
+        self.lanes = {lane: deque() for lane in lanes}
+        self.priority = {lane: i for i, lane in enumerate(lanes)}
+        self.unfinished = 0
+        self.changed = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.finished.set()
+
+    def qsize(self, lane=None):
+        if lane is not None:
+            return len(self.lanes[lane])
+        return sum(len(items) for items in self.lanes.values())
+
+    def full(self):
+        return 0 < self.maxsize <= self.qsize()
+
+    def lowest(self):
+        """The lowest-priority lane holding anything, or None."""
+        for lane in reversed(self.lanes):
+            if self.lanes[lane]:
+                return lane
+        return None
+
+    def put_nowait(self, item, lane=TELEGRAM_LANES[0]):
+        self.lanes[lane].append(item)
+        self.unfinished += 1
+        self.finished.clear()
+        self.changed.set()
+
+    def pop(self, lane, newest=False):
+        """Remove a queued item without handing it to a consumer."""
+        items = self.lanes[lane]
+        item = items.pop() if newest else items.popleft()
+        self.task_done()
+        return item
+
+    def get_nowait(self, top_only=False):
+        for lane, items in self.lanes.items():
+            if items:
+                return lane, items.popleft()
+            if top_only:
+                break
+        raise asyncio.QueueEmpty
+
+    async def get(self, top_only=lambda: False):
+        """Wait for the next item as ``(lane, item)``; ``top_only()`` limits it to the top lane."""
+        while True:
+            try:
+                return self.get_nowait(top_only())
+            except asyncio.QueueEmpty:
+                self.changed.clear()
+                await self.changed.wait()
+
+    def task_done(self):
+        self.unfinished -= 1
+        if self.unfinished <= 0:
+            self.unfinished = 0
+            self.finished.set()
+
+    async def join(self):
+        await self.finished.wait()
+
+class TelegramOutbox:
+    """Bounded outbound queue drained by a pool of rate-limited delivery workers.
+
+    ``enqueue`` never waits, so the Binance receive path is never blocked by
+    Telegram. Messages travel in priority lanes (TELEGRAM_LANES): listing
+    alerts, then status notices and command replies, then digests. Workers
+    always take the highest lane first, one worker never takes anything but
+    listings, and chat buckets serve waiting listings first, so listing
+    latency does not depend on the backlog below it. The lower lanes get
+    their own rate budgets (TELEGRAM_LANE_RATES) carved out of the global
+    one rather than competing for it. When the queue is full, lower lanes
+    are shed first; within the incoming lane the drop policy decides
+    whether the oldest queued message or the incoming one is discarded.
+    """
+
+    def __init__(self, maxsize=None, workers=None, drop_policy=None, global_rate=None, chat_rate=None,
+                 max_retries=None, broadcast_concurrency=None, sender=None, lane_rates=None):
+        drop_policy = CONFIG.telegram_drop_policy if drop_policy is None else drop_policy
+        if drop_policy not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.queue = LaneQueue(CONFIG.telegram_queue_size if maxsize is None else maxsize)
+        self.workers = CONFIG.telegram_workers if workers is None else workers
+        self.drop_policy = drop_policy
+        global_rate = CONFIG.telegram_global_rate if global_rate is None else global_rate
+        lane_rates = _parse_pairs(CONFIG.telegram_lane_rates) if lane_rates is None else lane_rates
+        reserved = sum(lane_rates.get(lane, 0) for lane in TELEGRAM_LANES[1:])
+        self.lane_buckets = {TELEGRAM_LANES[0]: TokenBucket(max(1.0, global_rate - reserved))}
+        for lane in TELEGRAM_LANES[1:]:
+            self.lane_buckets[lane] = TokenBucket(lane_rates.get(lane, 1.0))
+        self.low_lane_busy = 0
+        self.inflight = {}
+        self.chat_rate = CONFIG.telegram_chat_rate if chat_rate is None else chat_rate
+        self.chat_buckets = {}
+        self.max_retries = CONFIG.telegram_max_retries if max_retries is None else max_retries
+        self.broadcast_concurrency = (CONFIG.telegram_broadcast_concurrency if broadcast_concurrency is None
+                                      else broadcast_concurrency)
+        self.sender = sender or send_telegram_message
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
 
-    while True:
+    def enqueue(self, chat_ids, text, created_at=None, lane=TELEGRAM_LANES[0], alert_ids=()):
+        """Queue a message for one chat or a list of chats without waiting.
+
+        ``created_at`` is the monotonic time the alert was classified, used
+        for the classify-to-ack latency histogram. ``alert_ids`` are handed
+        to LEADER once Telegram acknowledges the message. Returns False if
+        the message was dropped.
+        """
+        if isinstance(chat_ids, str):
+            chat_ids = (chat_ids,)
+        if self.queue.full():
+            self.dropped += 1
+            METRICS.inc("telegram_dropped")
+            victim = self.queue.lowest()
+            if self.queue.priority[victim] < self.queue.priority[lane] or (
+                    victim == lane and self.drop_policy == "drop_newest"):
+                METRICS.inc(f"telegram_dropped_{lane}")
+                log(logging.WARNING, "telegram_queue_full", dropped="newest", lane=lane,
+                    chats=list(chat_ids), text=text[:50])
+                return False
+            METRICS.inc(f"telegram_dropped_{victim}")
+            dropped_chats, dropped_text, _, _ = self.queue.pop(victim)
+            log(logging.WARNING, "telegram_queue_full", dropped="oldest", lane=victim,
+                chats=list(dropped_chats), text=dropped_text[:50])
+        self.queue.put_nowait((tuple(chat_ids), text, created_at, tuple(alert_ids)), lane)
+        METRICS.set_gauge(f"telegram_queue_{lane}", self.queue.qsize(lane))
+        return True
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate)
+        return bucket
+
+    async def deliver(self, chat_id, text, created_at=None, lane=TELEGRAM_LANES[0]):
+        """Send one message, honoring rate limits, retry_after and backoff."""
+        chat_bucket = self._chat_bucket(chat_id)
+        priority = self.queue.priority[lane]
+        for attempt in range(self.max_retries + 1):
+            await chat_bucket.acquire(priority)
+            await self.lane_buckets[lane].acquire()
+            status, retry_after = await self.sender(chat_id, text)
+            if status == 200:
+                self.sent += 1
+                METRICS.inc("telegram_sent")
+                if created_at is not None:
+                    METRICS.observe("classify_to_ack_seconds", time.monotonic() - created_at)
+                return True
+            if status == 429:
+                log(logging.WARNING, "telegram_rate_limited", chat_id=chat_id, retry_after=retry_after)
+                chat_bucket.pause(retry_after)
+                continue
+            if status is not None and 400 <= status < 500:
+                break
+            delay = min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+            log(logging.WARNING, "telegram_retry", chat_id=chat_id, attempt=attempt + 1, delay=round(delay, 3))
+            await asyncio.sleep(delay)
+        self.failed += 1
+        METRICS.inc("telegram_failed")
+        log(logging.ERROR, "telegram_delivery_failed", chat_id=chat_id)
+        return False
+
+    async def broadcast(self, chat_ids, text, created_at=None, lane=TELEGRAM_LANES[0], alert_ids=()):
+        """Fan one prepared text out to many chats with bounded parallelism.
+
+        Returns a ``{chat_id: delivered}`` report. The lane buckets keep the
+        whole fan-out inside Telegram's bot-wide rate budget.
+        """
+        semaphore = asyncio.Semaphore(self.broadcast_concurrency)
+
+        async def deliver_one(chat_id, token):
+            try:
+                async with semaphore:
+                    return await self.deliver(chat_id, text, created_at, lane)
+            except asyncio.CancelledError:
+                # Stopped mid-send: stays in ``inflight`` so ``save`` keeps it
+                token = None
+                raise
+            except Exception as e:
+                self.failed += 1
+                METRICS.inc("telegram_failed")
+                log(logging.ERROR, "telegram_delivery_error", chat_id=chat_id, error=str(e))
+                return False
+            finally:
+                if token is not None:
+                    del self.inflight[token]
+
+        # Registered before the first await so a stop cannot lose a chat
+        tokens = []
+        for chat_id in chat_ids:
+            token = object()
+            self.inflight[token] = (chat_id, text, lane, alert_ids)
+            tokens.append(token)
+        started = time.monotonic()
+        results = await asyncio.gather(*(deliver_one(c, t) for c, t in zip(chat_ids, tokens)))
+        report = dict(zip(chat_ids, results))
+        if len(report) > 1:
+            failed = [c for c, ok in report.items() if not ok]
+            log(logging.INFO, "broadcast_done", delivered=sum(results), total=len(report),
+                seconds=round(time.monotonic() - started, 3), failed=failed)
+        return report
+
+    def _listings_only(self):
+        # Keep one worker free for listings whatever the lower lanes hold
+        return self.low_lane_busy >= max(1, self.workers - 1)
+
+    async def _worker(self):
+        while True:
+            lane, (chat_ids, text, created_at, alert_ids) = await self.queue.get(self._listings_only)
+            low = lane != TELEGRAM_LANES[0]
+            if low:
+                self.low_lane_busy += 1
+            try:
+                report = await self.broadcast(chat_ids, text, created_at, lane, alert_ids)
+                if alert_ids and any(report.values()):
+                    LEADER.record_delivered(alert_ids)
+            except Exception as e:
+                self.failed += 1
+                log(logging.ERROR, "telegram_worker_error", error=str(e))
+            finally:
+                if low:
+                    self.low_lane_busy -= 1
+                    self.queue.changed.set()
+                self.queue.task_done()
+                METRICS.set_gauge(f"telegram_queue_{lane}", self.queue.qsize(lane))
+
+    async def drain(self, timeout=None):
+        """Wait until every queued message has been handled."""
+        await asyncio.wait_for(self.queue.join(), timeout)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def pending(self):
+        """Undelivered messages as ``(chat_ids, text, lane, alert_ids)``, in-flight sends first."""
+        messages = [((chat_id,), text, lane, alert_ids) for chat_id, text, lane, alert_ids in self.inflight.values()]
+        for lane, items in self.queue.lanes.items():
+            messages.extend((chat_ids, text, lane, alert_ids) for chat_ids, text, _, alert_ids in items)
+        return messages
+
+    def save(self, path=None):
+        """Write undelivered messages to ``path`` for the next instance; call after ``stop``."""
+        path = CONFIG.outbox_spool_path if path is None else path
+        messages = self.pending()
+        if not path or not messages:
+            return 0
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([{"chat_ids": list(c), "text": t, "lane": l, "alert_ids": list(a)}
+                       for c, t, l, a in messages], f)
+        os.replace(tmp, path)
+        log(logging.WARNING, "outbox_spooled", messages=len(messages), path=path)
+        return len(messages)
+
+    def load(self, path=None, delivered=()):
+        """Queue the messages a previous instance spooled and remove the file.
+
+        Messages whose alert ids are all in ``delivered`` were already sent
+        by another replica and are dropped.
+        """
+        path = CONFIG.outbox_spool_path if path is None else path
+        delivered = set(delivered)
+        if not path or not os.path.exists(path):
+            return 0
         try:
-            ws_url = create_signed_url()
-            headers = [("X-MBX-APIKEY", BINANCE_API_KEY)]
+            with open(path, encoding="utf-8") as f:
+                messages = json.load(f)
+        except (OSError, ValueError) as e:
+            log(logging.ERROR, "outbox_spool_unreadable", path=path, error=str(e))
+            return 0
+        messages = [m for m in messages if not m.get("alert_ids") or not delivered.issuperset(m["alert_ids"])]
+        for message in messages:
+            self.enqueue(message["chat_ids"], message["text"], lane=message.get("lane", TELEGRAM_LANES[0]),
+                         alert_ids=message.get("alert_ids", ()))
+        os.remove(path)
+        log(logging.INFO, "outbox_restored", messages=len(messages), path=path)
+        return len(messages)
+
+_outbox = None
+_outbox_loop = None
+
+def get_outbox():
+    """Return the process-wide outbox, started on the running loop."""
+    global _outbox, _outbox_loop
+    loop = asyncio.get_running_loop()
+    if _outbox is None or _outbox_loop is not loop:
+        _outbox = TelegramOutbox()
+        _outbox_loop = loop
+    _outbox.start()
+    return _outbox
+
+def pack_messages(parts, limit=TELEGRAM_MESSAGE_LIMIT, separator="\n\n"):
+    """Join texts into as few messages as fit within ``limit`` characters.
+
+    Parts are never reordered. A part that is too long on its own is split
+    at line breaks, and a single overlong line is cut hard.
+    """
+    pieces = []
+    for part in parts:
+        if len(part) <= limit:
+            pieces.append(part)
+            continue
+        chunk = ""
+        for line in part.split("\n"):
+            while len(line) > limit:
+                if chunk:
+                    pieces.append(chunk)
+                    chunk = ""
+                pieces.append(line[:limit])
+                line = line[limit:]
+            if chunk and len(chunk) + 1 + len(line) > limit:
+                pieces.append(chunk)
+                chunk = line
+            else:
+                chunk = f"{chunk}\n{line}" if chunk else line
+        if chunk:
+            pieces.append(chunk)
+
+    messages = []
+    for piece in pieces:
+        if messages and len(messages[-1]) + len(separator) + len(piece) <= limit:
+            messages[-1] += separator + piece
+        else:
+            messages.append(piece)
+    return messages
+
+class AlertCoalescer:
+    """Merge alerts arriving within ``window`` seconds into one message.
+
+    The first alert of a burst is passed through at once and opens the
+    window; alerts arriving while it is open are held and flushed together
+    when it closes, packed to Telegram's length limit. A lone listing is
+    therefore never delayed, and a burst costs two sends instead of one per
+    announcement. A window of 0 disables coalescing.
+    """
+
+    def __init__(self, sink, window=None, limit=TELEGRAM_MESSAGE_LIMIT):
+        self.sink = sink
+        self.window = CONFIG.telegram_coalesce_window if window is None else window
+        self.limit = limit
+        self.pending = []
+        self._window_ends = 0.0
+        self._flush_handle = None
+
+    def add(self, text, created_at=None, alert_id=None):
+        alert_ids = () if alert_id is None else (alert_id,)
+        if self.window <= 0:
+            return self.sink(text, created_at, alert_ids)
+        now = time.monotonic()
+        if not self.pending and now >= self._window_ends:
+            self._window_ends = now + self.window
+            return self.sink(text, created_at, alert_ids)
+        self.pending.append((text, created_at, alert_id))
+        if self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(max(0.0, self._window_ends - now), self.flush)
+        return True
+
+    def flush(self):
+        """Send everything held so far; the oldest alert's time marks the batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self.pending = self.pending, []
+        if not pending:
+            return
+        self._window_ends = time.monotonic() + self.window
+        stamps = [created_at for _, created_at, _ in pending if created_at is not None]
+        created_at = min(stamps) if stamps else None
+        # Group alerts the way pack_messages fills messages, so each message
+        # carries the ids of exactly the alerts it contains
+        batches = []
+        for text, _, alert_id in pending:
+            if batches and len(pack_messages(batches[-1][0] + [text], self.limit)) == 1:
+                batches[-1][0].append(text)
+            else:
+                batches.append(([text], []))
+            if alert_id is not None:
+                batches[-1][1].append(alert_id)
+        sent = 0
+        for texts, alert_ids in batches:
+            for message in pack_messages(texts, self.limit):
+                self.sink(message, created_at, tuple(alert_ids))
+                sent += 1
+        METRICS.inc("alerts_coalesced", len(pending) - sent)
+
+_coalescer = None
+_coalescer_loop = None
+
+def get_coalescer():
+    """Return the process-wide coalescer feeding the outbox on the running loop."""
+    global _coalescer, _coalescer_loop
+    loop = asyncio.get_running_loop()
+    if _coalescer is None or _coalescer_loop is not loop:
+        _coalescer = AlertCoalescer(
+            lambda text, created_at, alert_ids: get_outbox().enqueue(CHAT_IDS, text, created_at, alert_ids=alert_ids),
+            window=CONFIG.telegram_coalesce_window,
+        )
+        _coalescer_loop = loop
+    return _coalescer
+
+def enqueue_telegram(text, created_at=None, alert_id=None, coalesce=True, lane=TELEGRAM_LANES[0]):
+    if not CONFIG.bot_token or not CHAT_IDS:
+        log(logging.WARNING, "telegram_not_configured")
+        return False
+    if not LEADER.should_send(text, created_at, alert_id):
+        return False
+    if coalesce:
+        return get_coalescer().add(text, created_at, alert_id)
+    return get_outbox().enqueue(CHAT_IDS, text, created_at, lane, () if alert_id is None else (alert_id,))
+
+class AnnouncementDigest:
+    """Collect announcements that match no rule and send them as a summary.
+
+    Every ``interval`` seconds the titles gathered since the last summary
+    go out as one digest, split to Telegram's length limit. Matched
+    listings never wait for the digest. An interval of 0 disables it and
+    unmatched announcements are only logged.
+    """
+
+    def __init__(self, interval=None, limit=TELEGRAM_MESSAGE_LIMIT, max_items=500):
+        self.interval = CONFIG.digest_interval if interval is None else interval
+        self.limit = limit
+        self.items = deque(maxlen=max_items)
+
+    def add(self, topic, data):
+        if self.interval <= 0:
+            return False
+        self.items.append((topic, data.get("catalogName"), data.get("title", "")))
+        return True
+
+    def render(self, items):
+        lines = [f"- {title}" + (f" [{catalog}]" if catalog else "") for _, catalog, title in items]
+        header = f"Binance announcements digest ({len(items)})"
+        return pack_messages([header, "\n".join(lines)], self.limit)
+
+    def flush(self):
+        if not self.items:
+            return 0
+        items = list(self.items)
+        self.items.clear()
+        for message in self.render(items):
+            enqueue_telegram(message, coalesce=False, lane="digest")
+        log(logging.INFO, "digest_sent", announcements=len(items))
+        return len(items)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+DIGEST = AnnouncementDigest()
+
+async def stop_outbox(timeout=5, spool_path=None):
+    """Flush the coalescer and outbox for up to ``timeout`` seconds.
+
+    Whatever is still queued or in flight at the deadline is written to
+    ``spool_path`` for the next instance to send, if one is given.
+    """
+    global _outbox, _outbox_loop, _coalescer, _coalescer_loop
+    if _coalescer is not None and _coalescer_loop is asyncio.get_running_loop():
+        _coalescer.flush()
+    _coalescer = None
+    _coalescer_loop = None
+    if _outbox is None:
+        return
+    try:
+        await _outbox.drain(timeout)
+    except asyncio.TimeoutError:
+        log(logging.WARNING, "outbox_not_drained", pending=_outbox.queue.qsize(), inflight=len(_outbox.inflight))
+    await _outbox.stop()
+    if spool_path:
+        _outbox.save(spool_path)
+    _outbox = None
+    _outbox_loop = None
+
+class Lease:
+    """Shared lease logic; subclasses only load and store the record.
+
+    A record is ``{"holder", "version", "delivered"}`` where ``version``
+    changes on every renewal and ``delivered`` lists the alert ids the
+    holder has sent recently, so a successor can tell which buffered alerts
+    still need sending.
+
+    Expiry is judged the way client-go's leader election does: each
+    identity remembers when it last saw the holder or version change, on
+    its own monotonic clock, and treats the lease as expired once
+    ``duration`` passes without a change. No timestamp written by another
+    pod is compared with the local clock, so clock skew between nodes
+    cannot hand out the lease early or block it forever. A replica that
+    first sees a held lease therefore waits a full ``duration``.
+    """
+
+    def __init__(self):
+        self.observed = {}
+
+    def _acquire(self, record, identity, duration, delivered):
+        """Return ``(leader, previous_delivered, new_record)``."""
+        holder = record.get("holder")
+        now = time.monotonic()
+        key = (holder, record.get("version"))
+        seen = self.observed.get(identity)
+        if seen is None or seen[0] != key:
+            seen = self.observed[identity] = (key, now)
+        if holder and holder != identity and now - seen[1] < duration:
+            return False, [], None
+        previous = record.get("delivered", []) if holder != identity else []
+        return True, previous, {"holder": identity, "delivered": delivered}
+
+    @staticmethod
+    def _next_version(record):
+        return record.get("version", 0) + 1
+
+class MemoryLease(Lease):
+    """In-process lease shared by several electors; a stand-in for tests."""
 
-            async with websockets.connect(ws_url, extra_headers=headers, ping_interval=None) as ws:
-                sub = {"command": "SUBSCRIBE", "value": TOPIC}
-                await ws.send(json.dumps(sub))
+    def __init__(self):
+        super().__init__()
+        self.record = {}
 
-                ping_task = asyncio.create_task(send_ping(ws))
+    async def try_acquire(self, identity, duration, delivered):
+        leader, previous, record = self._acquire(self.record, identity, duration, delivered)
+        if record is not None:
+            self.record = dict(record, version=self._next_version(self.record))
+        return leader, previous
 
+    async def release(self, identity, delivered):
+        if self.record.get("holder") == identity:
+            self.record = {"holder": None, "version": self._next_version(self.record), "delivered": delivered}
+
+class FileLease(Lease):
+    """Lease stored as JSON in a file guarded by flock.
+
+    Only processes that see the same file can share it, such as several
+    bots on one host; the chart's replicas each mount their own volume and
+    use the Kubernetes backend instead.
+    """
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = CONFIG.lease_file if path is None else path
+
+    def _update(self, change):
+        import fcntl
+        with open(f"{self.path}.lock", "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                record = {}
+            result, record = change(record)
+            if record is not None:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(record, f)
+                os.replace(tmp, self.path)
+            return result
+
+    async def try_acquire(self, identity, duration, delivered):
+        def change(record):
+            leader, previous, new_record = self._acquire(record, identity, duration, delivered)
+            if new_record is not None:
+                new_record["version"] = self._next_version(record)
+            return (leader, previous), new_record
+        return await asyncio.to_thread(self._update, change)
+
+    async def release(self, identity, delivered):
+        def change(record):
+            if record.get("holder") != identity:
+                return None, None
+            return None, {"holder": None, "version": self._next_version(record), "delivered": delivered}
+        await asyncio.to_thread(self._update, change)
+
+class KubernetesLease(Lease):
+    """coordination.k8s.io/v1 Lease, updated with optimistic concurrency.
+
+    Uses the pod's service account, so the chart grants get/create/update on
+    leases. The delivered alert ids travel in an annotation.
+    """
+
+    API = "https://kubernetes.default.svc"
+    ACCOUNT = "/var/run/secrets/kubernetes.io/serviceaccount"
+    ANNOTATION = "notificationbot/delivered"
+
+    def __init__(self, name=None, namespace=None):
+        super().__init__()
+        self.name = CONFIG.lease_name if name is None else name
+        self.namespace = CONFIG.pod_namespace if namespace is None else namespace
+        self.session = None
+
+    async def _get_session(self):
+        if self.session is None or self.session.closed:
+            with open(f"{self.ACCOUNT}/token", encoding="utf-8") as f:
+                token = f.read().strip()
+            if not self.namespace:
+                with open(f"{self.ACCOUNT}/namespace", encoding="utf-8") as f:
+                    self.namespace = f.read().strip()
+            context = ssl.create_default_context(cafile=f"{self.ACCOUNT}/ca.crt")
+            self.session = aiohttp.ClientSession(
+                headers={"Authorization": f"Bearer {token}"},
+                connector=aiohttp.TCPConnector(ssl=context),
+                timeout=aiohttp.ClientTimeout(total=max(0.5, CONFIG.lease_renew_interval)),
+            )
+        return self.session
+
+    @staticmethod
+    def _format_time(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def _url(self, named=True):
+        url = f"{self.API}/apis/coordination.k8s.io/v1/namespaces/{self.namespace}/leases"
+        return f"{url}/{self.name}" if named else url
+
+    def _to_record(self, lease):
+        metadata = lease.get("metadata", {})
+        annotations = metadata.get("annotations") or {}
+        return {
+            "holder": lease.get("spec", {}).get("holderIdentity"),
+            # Every renewal writes renewTime, so the resourceVersion changes
+            "version": metadata.get("resourceVersion"),
+            "delivered": json.loads(annotations.get(self.ANNOTATION, "[]")),
+        }
+
+    def _to_lease(self, lease, record, duration, now):
+        lease = dict(lease)
+        metadata = dict(lease.get("metadata") or {"name": self.name, "namespace": self.namespace})
+        metadata["annotations"] = dict(metadata.get("annotations") or {})
+        metadata["annotations"][self.ANNOTATION] = json.dumps(record["delivered"])
+        lease["metadata"] = metadata
+        spec = dict(lease.get("spec") or {})
+        if spec.get("holderIdentity") != record["holder"]:
+            spec["acquireTime"] = self._format_time(now)
+            spec["leaseTransitions"] = spec.get("leaseTransitions", 0) + 1
+        spec["holderIdentity"] = record["holder"]
+        spec["leaseDurationSeconds"] = max(1, int(-(-duration // 1)))
+        spec["renewTime"] = self._format_time(now)
+        lease["spec"] = spec
+        lease.setdefault("apiVersion", "coordination.k8s.io/v1")
+        lease.setdefault("kind", "Lease")
+        return lease
+
+    async def try_acquire(self, identity, duration, delivered):
+        session = await self._get_session()
+        now = time.time()
+        async with session.get(self._url()) as response:
+            if response.status == 404:
+                lease = {}
+            else:
+                response.raise_for_status()
+                lease = await response.json()
+        leader, previous, record = self._acquire(self._to_record(lease) if lease else {},
+                                                 identity, duration, delivered)
+        if record is None:
+            return False, []
+        body = self._to_lease(lease, record, duration, now)
+        method, url = (session.put, self._url()) if lease else (session.post, self._url(named=False))
+        async with method(url, json=body) as response:
+            if response.status == 409:
+                return False, []
+            response.raise_for_status()
+        return True, previous
+
+    async def release(self, identity, delivered):
+        session = await self._get_session()
+        try:
+            async with session.get(self._url()) as response:
+                response.raise_for_status()
+                lease = await response.json()
+            if lease.get("spec", {}).get("holderIdentity") == identity:
+                lease["spec"]["holderIdentity"] = None
+                lease["metadata"].setdefault("annotations", {})[self.ANNOTATION] = json.dumps(delivered)
+                async with session.put(self._url(), json=lease) as response:
+                    response.raise_for_status()
+        finally:
+            await session.close()
+
+def make_lease_backend(name=None):
+    name = CONFIG.lease_backend if name is None else name
+    if name == "none":
+        return None
+    if name == "memory":
+        return MemoryLease()
+    if name == "file":
+        return FileLease()
+    if name == "kubernetes":
+        return KubernetesLease()
+    raise ValueError(f"Unknown lease backend: {name}")
+
+class LeaderElector:
+    """Gate Telegram delivery so only the lease holder sends alerts.
+
+    Every replica keeps its Binance connection warm and classifies frames;
+    standbys buffer the alerts they would have sent. The leader publishes the
+    ids Telegram acknowledged with each renewal, and a standby that takes over after the
+    lease expires replays only the buffered alerts its predecessor did not
+    send. Without a backend the replica is always the leader.
+
+    A spool left by this replica's previous run is replayed only once it
+    leads, minus what the interim leader already delivered, so a
+    restarted standby cannot send alerts a second time.
+    """
+
+    def __init__(self, backend=None, identity=None, duration=None, renew_interval=None, replay_window=None):
+        self.backend = backend
+        self.identity = CONFIG.pod_name if identity is None else identity
+        self.duration = CONFIG.lease_duration if duration is None else duration
+        self.renew_interval = CONFIG.lease_renew_interval if renew_interval is None else renew_interval
+        self.replay_window = CONFIG.standby_replay_window if replay_window is None else replay_window
+        self.is_leader = backend is None
+        self.delivered = deque(maxlen=100)
+        self.standby = deque(maxlen=100)
+        self.spool_path = None
+
+    def should_send(self, text, created_at=None, alert_id=None):
+        if self.is_leader:
+            return True
+        if alert_id is not None:
+            self.standby.append((alert_id, text, created_at, time.time()))
+        return False
+
+    def record_delivered(self, alert_ids):
+        """Publish ids Telegram acknowledged with the next renewal, so a successor skips them."""
+        self.delivered.extend(alert_ids)
+
+    def restore(self, path):
+        """Replay the outbox spool at ``path`` now or when this replica takes over."""
+        self.spool_path = path
+        if self.is_leader:
+            self._restore(())
+
+    def _restore(self, delivered):
+        path, self.spool_path = self.spool_path, None
+        if path:
+            get_outbox().load(path, delivered)
+
+    def _take_over(self, previous_delivered):
+        self.is_leader = True
+        sent = set(previous_delivered)
+        # The spool is older than anything buffered since this run started
+        self._restore(sent)
+        cutoff = time.time() - self.replay_window
+        pending = [entry for entry in self.standby if entry[0] not in sent and entry[3] >= cutoff]
+        self.standby.clear()
+        log(logging.INFO, "leader_elected", identity=self.identity, replaying=len(pending))
+        for alert_id, text, created_at, _ in pending:
+            enqueue_telegram(text, created_at, alert_id)
+
+    async def step(self):
+        """Acquire or renew the lease once and update leadership."""
+        try:
+            leader, previous = await self.backend.try_acquire(self.identity, self.duration, list(self.delivered))
+        except Exception as e:
+            log(logging.WARNING, "lease_renew_failed", identity=self.identity, error=str(e))
+            leader, previous = False, []
+        if leader and not self.is_leader:
+            self._take_over(previous)
+        elif not leader and self.is_leader:
+            log(logging.WARNING, "leader_lost", identity=self.identity)
+            self.is_leader = False
+        METRICS.set_gauge("is_leader", int(self.is_leader))
+        return self.is_leader
+
+    async def run(self):
+        try:
+            while True:
+                await self.step()
+                await asyncio.sleep(self.renew_interval)
+        finally:
+            if self.is_leader:
+                self.is_leader = False
                 try:
-                    async for raw in ws:
-                        try:
-                            msg = json.loads(raw)
-                            print("Received message:", msg)
-                        except Exception as e:
-                            print(f"Failed to parse JSON: {e}, raw: {raw}")
-                            continue
-
-                        if isinstance(msg, dict):
-                            if msg.get("type") == "COMMAND" and msg.get("data") == "SUCCESS" and msg.get("subType") == "SUBSCRIBE":
-                                test_text = "Bot connected successfully to Binance announcements!"
-                                print(test_text)
-                                await notify_telegram(test_text)
-                            
-                            elif "result" in msg:
-                                print(f"Subscription result: {msg}")
-                            
-                            elif "data" in msg:
-                                try:
-                                    if isinstance(msg["data"], str):
-                                        try:
-                                            data_parsed = json.loads(msg["data"])
-                                        except json.JSONDecodeError:
-                                            print(f"Data is string but not JSON: {msg['data']}")
-                                            continue
-                                    else:
-                                        data_parsed = msg["data"]
-                                    
-                                    title = data_parsed.get("title", "")
-                                    content = data_parsed.get("content", "")
-                                    body = data_parsed.get("body", "")
-                                    description = data_parsed.get("description", "")
-                                    catalog_name = data_parsed.get("catalogName", "")
-                                    
-                                    full_text = f"{title} {content} {body} {description} {catalog_name}".lower()
-                                    
-                                    if any(k in full_text for k in ["will list", "new listing", "trading pair", "binance will list", "will add", "binance will add"]):
-                                        token_match = re.search(r'\(([A-Z]+)\)', title)
-                                        token_symbol = token_match.group(1) if token_match else "Unknown"
-                                        
-                                        text = f"NEW LISTING ALERT! \nToken: {token_symbol}\n {title}\n\nCheck Binance now!"
-                                        print(text)
-                                        await notify_telegram(text)
-                                
-                                except Exception as e:
-                                    print(f"Error processing data: {e}")
-                            
-                            else:
-                                print(f"Other message type: {msg}")
-                    
-                    print("Message loop ended - connection closed by server")
-                except websockets.exceptions.ConnectionClosed as e:
-                    print(f"WebSocket connection closed: {e}")
+                    await asyncio.shield(self.backend.release(self.identity, list(self.delivered)))
                 except Exception as e:
-                    print(f"Error in message loop: {e}")
-                finally:
-                    ping_task.cancel()
+                    log(logging.WARNING, "lease_release_failed", error=str(e))
+
+LEADER = LeaderElector(make_lease_backend())
+
+class Keepalive:
+    """Detect dead connections that TCP still reports as open.
+
+    Sends a ping every ``interval`` seconds and waits at most
+    ``pong_timeout`` for its pong, recording the round trip in
+    ``pong_rtt_seconds``. With ``silence_timeout`` set, a connection that
+    delivers no frame for that long is dead too; announcement topics can be
+    quiet for hours, so that check is off by default. A dead connection is
+    aborted rather than closed, since a close handshake would wait on the
+    same unresponsive peer, and ``dead`` tells the reconnect loop why.
+    A half-open socket is therefore dropped within ``interval +
+    pong_timeout``.
+    """
+
+    def __init__(self, ws, conn_id=None, interval=None, pong_timeout=None, silence_timeout=None):
+        self.ws = ws
+        self.conn_id = conn_id
+        self.interval = CONFIG.ping_interval if interval is None else interval
+        self.pong_timeout = CONFIG.pong_timeout if pong_timeout is None else pong_timeout
+        self.silence_timeout = CONFIG.silence_timeout if silence_timeout is None else silence_timeout
+        self.last_frame = time.monotonic()
+        self.rtt = None
+        self.dead = None
+
+    def frame_received(self):
+        self.last_frame = time.monotonic()
+
+    async def _ping(self):
+        pong = await self.ws.ping()
+        await pong
+
+    async def ping(self):
+        """Send one ping; return False if the connection is gone."""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._ping(), self.pong_timeout)
+        except asyncio.TimeoutError:
+            self.fail("pong_timeout")
+            return False
+        except Exception as e:
+            log(logging.WARNING, "ping_failed", conn=self.conn_id, error=str(e))
+            return False
+        self.rtt = time.monotonic() - started
+        METRICS.observe("pong_rtt_seconds", self.rtt)
+        METRICS.mark_activity()
+        log(logging.DEBUG, "ping_sent", conn=self.conn_id, rtt_ms=round(self.rtt * 1000, 2))
+        return True
+
+    def fail(self, reason):
+        self.dead = reason
+        METRICS.inc("dead_connections")
+        log(logging.WARNING, "connection_dead", conn=self.conn_id, reason=reason,
+            silent_for=round(time.monotonic() - self.last_frame, 3))
+        transport = getattr(self.ws, "transport", None)
+        if transport is not None:
+            transport.abort()
+
+    async def run(self):
+        next_ping = time.monotonic() + self.interval
+        while True:
+            wake = next_ping
+            if self.silence_timeout:
+                wake = min(wake, self.last_frame + self.silence_timeout)
+            await asyncio.sleep(max(0.0, wake - time.monotonic()))
+            now = time.monotonic()
+            if self.silence_timeout and now - self.last_frame >= self.silence_timeout:
+                self.fail("silence")
+                return
+            if now >= next_ping:
+                if not await self.ping():
+                    return
+                next_ping = time.monotonic() + self.interval
+
+def announcement_id(data):
+    """Stable identity of an announcement across sockets, resends, restarts and the REST poller.
+
+    Only fields both sources carry unchanged are used: the stream's
+    publishDate and the listing's releaseDate can differ for one article.
+    """
+    key = f"{data.get('catalogId')}|{data.get('title', '')}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+
+class AnnouncementDedup:
+    """LRU of already-alerted announcements with TTL and SQLite persistence.
+
+    Lookups and inserts are O(1) against an in-memory OrderedDict. New ids
+    are buffered and written in batches by ``flush``, and ``load`` rebuilds
+    the in-memory state from disk on startup. An empty ``path`` keeps the
+    cache in memory only. Alongside the local time an id was seen, the
+    announcement's own publish time is kept, so ``newest`` can be compared
+    with other Binance timestamps.
+    """
 
+    def __init__(self, path=None, ttl=None, maxsize=None):
+        self.path = CONFIG.dedup_db_path if path is None else path
+        self.ttl = CONFIG.dedup_ttl if ttl is None else ttl
+        self.maxsize = CONFIG.dedup_max_entries if maxsize is None else maxsize
+        self.entries = OrderedDict()
+        self.newest_published = None
+        self.pending = []
+        self.db = None
+
+    def load(self):
+        if not self.path:
+            return 0
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS seen (id TEXT PRIMARY KEY, seen_at REAL NOT NULL, published_at REAL)"
+        )
+        # Databases written before publish times were kept lack the column
+        if "published_at" not in {row[1] for row in self.db.execute("PRAGMA table_info(seen)")}:
+            self.db.execute("ALTER TABLE seen ADD COLUMN published_at REAL")
+        self.db.execute("DELETE FROM seen WHERE seen_at < ?", (time.time() - self.ttl,))
+        self.db.commit()
+        rows = self.db.execute(
+            "SELECT id, seen_at FROM seen ORDER BY seen_at DESC LIMIT ?", (self.maxsize,)
+        ).fetchall()
+        for key, seen_at in reversed(rows):
+            self.entries[key] = seen_at
+        self.newest_published = self.db.execute("SELECT MAX(published_at) FROM seen").fetchone()[0]
+        log(logging.INFO, "dedup_loaded", entries=len(rows), path=self.path)
+        return len(rows)
+
+    def check_and_add(self, key, published_at=None):
+        """Return True the first time a key is seen within the TTL.
+
+        ``published_at`` is the announcement's own timestamp in epoch
+        seconds, when the source gave one.
+        """
+        now = time.time()
+        seen_at = self.entries.get(key)
+        if seen_at is not None and now - seen_at < self.ttl:
+            self.entries.move_to_end(key)
+            return False
+        self.entries[key] = now
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        if published_at is not None and (self.newest_published is None or published_at > self.newest_published):
+            self.newest_published = published_at
+        if self.path:
+            self.pending.append((key, now, published_at))
+        return True
+
+    def newest(self):
+        """Publish time (Binance clock, epoch seconds) of the newest announcement seen, or None."""
+        return self.newest_published
+
+    def flush(self):
+        if self.db is None or not self.pending:
+            return 0
+        batch, self.pending = self.pending, []
+        self.db.executemany("INSERT OR REPLACE INTO seen (id, seen_at, published_at) VALUES (?, ?, ?)", batch)
+        self.db.commit()
+        return len(batch)
+
+    async def run(self, interval=None):
+        interval = CONFIG.dedup_flush_interval if interval is None else interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                log(logging.ERROR, "dedup_flush_failed", error=str(e))
+
+    def close(self):
+        if self.db is not None:
+            self.flush()
+            self.db.close()
+            self.db = None
+
+DEDUP = AnnouncementDedup()
+
+def get_json_decoder(name=None):
+    """Pick the frame decoder: ``orjson`` when installed, stdlib otherwise."""
+    name = CONFIG.json_decoder if name is None else name
+    if name == "orjson" or (name == "auto" and orjson is not None):
+        if orjson is None:
+            raise RuntimeError("JSON_DECODER=orjson but orjson is not installed")
+        return orjson.loads
+    return json.loads
+
+json_decode = get_json_decoder()
+
+def decode_frame(raw):
+    """Decode only the websocket envelope.
+
+    DATA frames carry their payload as a JSON string; it stays undecoded
+    here so COMMAND frames, duplicates and other topics are routed without
+    paying for the inner parse. Call ``decode_payload`` when it is needed.
+    """
+    return json_decode(raw)
+
+def decode_payload(msg):
+    """Return the decoded inner payload of a DATA frame, parsing it once.
+
+    Raises ValueError when the payload is a string that is not JSON.
+    """
+    data = msg["data"]
+    if isinstance(data, (str, bytes)):
+        data = msg["data"] = json_decode(data)
+    return data
+
+def classify_disconnect(error):
+    """Sort a connection failure into ``clean``, ``auth`` or ``error``."""
+    if error is None or isinstance(error, websockets.exceptions.ConnectionClosedOK):
+        return "clean"
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status in (401, 403):
+        return "auth"
+    text = str(error).lower()
+    if "signature" in text or "timestamp" in text or "api-key" in text:
+        return "auth"
+    return "error"
+
+class ReconnectPolicy:
+    """Decide how long to wait before reconnecting after a disconnect.
+
+    A clean close after a healthy session, or a connection the keepalive
+    declared dead, reconnects immediately. Repeated
+    failures back off exponentially with jitter up to ``max_delay``. Auth and
+    signature errors start from ``auth_delay`` since hammering with a bad key
+    or skewed clock will not help. Successful subscribes reset the streak and
+    record how long recovery took.
+    """
+
+    def __init__(self, base_delay=None, max_delay=None, auth_delay=None):
+        self.base_delay = CONFIG.reconnect_base_delay if base_delay is None else base_delay
+        self.max_delay = CONFIG.reconnect_max_delay if max_delay is None else max_delay
+        self.auth_delay = CONFIG.reconnect_auth_delay if auth_delay is None else auth_delay
+        self.failures = 0
+        self.disconnected_at = None
+        self.reconnect_times = deque(maxlen=100)
+
+    def next_delay(self, kind):
+        if self.disconnected_at is None:
+            self.disconnected_at = time.monotonic()
+        self.failures += 1
+        if kind in ("clean", "dead") and self.failures == 1:
+            return 0.0
+        base = self.auth_delay if kind == "auth" else self.base_delay
+        # Cap the exponent: a long outage would otherwise overflow the float
+        delay = min(max(self.max_delay, base), base * 2 ** min(self.failures - 1, 32))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def mark_connected(self):
+        """Reset the failure streak; return the time-to-reconnect if any."""
+        self.failures = 0
+        if self.disconnected_at is None:
+            return None
+        elapsed = time.monotonic() - self.disconnected_at
+        self.disconnected_at = None
+        self.reconnect_times.append(elapsed)
+        return elapsed
+
+async def handle_command(msg, notify_connected=True, received_at=None):
+    if msg.get("data") == "SUCCESS" and msg.get("subType") == "SUBSCRIBE":
+        test_text = "Bot connected successfully to Binance announcements!"
+        log(logging.INFO, "subscribed")
+        if notify_connected:
+            enqueue_telegram(test_text, coalesce=False, lane="status")
+    else:
+        log(logging.INFO, "command_result", msg=msg)
+
+class TopicHandler:
+    """Classify and render DATA frames of one announcement topic."""
+
+    __slots__ = ("topic", "classifier", "template")
+
+    def __init__(self, topic, classifier, template=DEFAULT_ALERT_TEMPLATE):
+        self.topic = topic
+        self.classifier = classifier
+        self.template = template
+
+    def render(self, data, rule):
+        title = data.get("title", "")
+        symbols = extract_symbols(title, data.get("body"))
+        token_symbol = symbols[0] if symbols else "Unknown"
+        tokens = ", ".join(SYMBOLS.annotate(symbols)) if symbols else "Unknown"
+        text = self.template.format(token=token_symbol, tokens=tokens, title=title, rule=rule, topic=self.topic)
+        return token_symbol, text
+
+    def classify(self, msg, received_at=None):
+        """Decode, dedup and classify a DATA frame.
+
+        Returns ``(data, rule, classified_at)``, or None when the frame is
+        malformed or was already alerted. ``rule`` is None for announcements
+        that match nothing.
+        """
+        try:
+            data_parsed = decode_payload(msg)
+        except ValueError:
+            log(logging.WARNING, "data_not_json", topic=self.topic, data=str(msg["data"])[:200])
+            return None
+        
+        publish_date = data_parsed.get("publishDate")
+        published_at = None
+        if isinstance(publish_date, (int, float)):
+            METRICS.observe("publish_to_receive_seconds", max(0.0, (CLOCK.now_ms() - publish_date) / 1000))
+            published_at = publish_date / 1000
+        
+        if not DEDUP.check_and_add(announcement_id(data_parsed), published_at):
+            log(logging.INFO, "announcement_duplicate", title=data_parsed.get("title", ""))
+            return None
+        
+        rule = self.classifier.classify(data_parsed)
+        classified_at = time.monotonic()
+        HISTORY.add(data_parsed, rule)
+        if received_at is not None:
+            METRICS.observe("receive_to_classify_seconds", classified_at - received_at)
+        return data_parsed, rule, classified_at
+
+    def deliver(self, data, rule, classified_at):
+        """Render a matched announcement and hand it to the outbox."""
+        METRICS.inc("messages_matched")
+        token_symbol, text = self.render(data, rule)
+        log(logging.INFO, "listing_alert", topic=self.topic, rule=rule, token=token_symbol,
+            title=data.get("title", ""))
+        enqueue_telegram(text, classified_at, announcement_id(data))
+
+    def collect(self, data):
+        """Hold an announcement that matched no rule for the next digest."""
+        if DIGEST.add(self.topic, data):
+            log(logging.DEBUG, "announcement_digested", topic=self.topic, title=data.get("title", ""))
+
+    async def __call__(self, msg, notify_connected=True, received_at=None):
+        try:
+            result = self.classify(msg, received_at)
+            if result is None:
+                return
+            if result[1] is not None:
+                self.deliver(*result)
+            else:
+                self.collect(result[0])
         except Exception as e:
-            print("Connection / processing error:", e)
+            log(logging.ERROR, "data_processing_failed", topic=self.topic, error=str(e))
+
+def build_dispatch_table(topics=None, config_file=None):
+    """Map ``(topic, type)`` to the coroutine handling that kind of frame.
+
+    COMMAND frames carry no topic and are keyed on ``(None, "COMMAND")``.
+    Each DATA topic gets its own classifier and template from
+    TOPIC_CONFIG_FILE, a JSON object keyed by topic whose entries may set
+    ``rules`` (inline list), ``rules_file`` and ``template``. Topics without
+    an entry use ANNOUNCEMENT_RULES_FILE and the default template.
+    """
+    topics = CONFIG.topics if topics is None else topics
+    config_file = CONFIG.topic_config_file if config_file is None else config_file
+    config = {}
+    if config_file:
+        with open(config_file, encoding="utf-8") as f:
+            config = json.load(f)
+
+    table = {(None, "COMMAND"): handle_command}
+    for topic in topics:
+        topic_config = config.get(topic, {})
+        if "rules" in topic_config:
+            classifier = AnnouncementClassifier(topic_config["rules"])
+        else:
+            classifier = AnnouncementClassifier.from_file(topic_config.get("rules_file"))
+        template = topic_config.get("template", DEFAULT_ALERT_TEMPLATE)
+        table[(topic, "DATA")] = TopicHandler(topic, classifier, template)
+    return table
+
+HANDLERS = build_dispatch_table()
+
+async def handle_message(msg, notify_connected=True, received_at=None):
+    msg_type = msg.get("type")
+    if msg_type == "COMMAND":
+        key = (None, "COMMAND")
+    elif "data" in msg:
+        key = (msg.get("topic", CONFIG.topics[0]), msg_type or "DATA")
+    else:
+        key = None
+    handler = HANDLERS.get(key)
+    if handler is not None:
+        await handler(msg, notify_connected, received_at)
+    elif "result" in msg:
+        log(logging.INFO, "subscription_result", msg=msg)
+    else:
+        log(logging.DEBUG, "other_message", topic=msg.get("topic"), type=msg_type)
+
+class Pipeline:
+    """Staged frame processing: receive -> decode -> classify -> render -> deliver.
+
+    Connections only read frames and ``submit`` them. Each following stage
+    runs its own workers (PIPELINE_CONCURRENCY) and is connected to the next
+    by a bounded queue (PIPELINE_QUEUE_SIZE), so a stage that falls behind
+    pushes back on the one before it. Delivery is the TelegramOutbox, whose
+    enqueue never waits; a slow Telegram therefore sheds messages by its drop
+    policy instead of stalling the socket readers. Every stage records its
+    service time as ``stage_<name>_seconds`` and its queue depth as a gauge.
+    """
+
+    STAGES = ("decode", "classify", "render")
+
+    def __init__(self, queue_size=None, concurrency=None, arrivals=None):
+        queue_size = CONFIG.pipeline_queue_size if queue_size is None else queue_size
+        concurrency = _parse_pairs(CONFIG.pipeline_concurrency, int) if concurrency is None else concurrency
+        self.concurrency = {stage: max(1, concurrency.get(stage, 1)) for stage in self.STAGES}
+        self.queues = {stage: asyncio.Queue(queue_size) for stage in self.STAGES}
+        self.arrivals = arrivals or FirstArrivalFilter()
+        self._tasks = []
+
+    def start(self):
+        if not self._tasks:
+            workers = {"decode": self._decode, "classify": self._classify, "render": self._render}
+            for stage in self.STAGES:
+                for _ in range(self.concurrency[stage]):
+                    self._tasks.append(asyncio.create_task(self._run_stage(stage, workers[stage])))
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def join(self):
+        """Wait until every submitted frame has left the render stage."""
+        for stage in self.STAGES:
+            await self.queues[stage].join()
 
-        print("Reconnecting in 10s...")
-        await asyncio.sleep(10)
+    async def submit(self, raw, received_at, on_command=None):
+        """Receive stage: hand a raw frame to the decoder, waiting if it is full."""
+        await self.queues["decode"].put((raw, received_at, on_command))
+
+    async def submit_announcement(self, data, received_at, topic=None):
+        """Feed an already decoded announcement (e.g. from REST) to classification."""
+        handler = HANDLERS.get((topic or CONFIG.topics[0], "DATA"))
+        if handler is not None:
+            msg = {"type": "DATA", "topic": handler.topic, "data": data}
+            await self.queues["classify"].put((handler, msg, received_at))
+
+    async def _run_stage(self, stage, worker):
+        queue = self.queues[stage]
+        histogram = f"stage_{stage}_seconds"
+        gauge = f"pipeline_{stage}_queue"
+        while True:
+            item = await queue.get()
+            started = time.monotonic()
+            try:
+                await worker(*item)
+            except Exception as e:
+                log(logging.ERROR, "pipeline_stage_failed", stage=stage, error=str(e))
+            finally:
+                METRICS.observe(histogram, time.monotonic() - started)
+                METRICS.set_gauge(gauge, queue.qsize())
+                queue.task_done()
+
+    async def _decode(self, raw, received_at, on_command):
+        try:
+            msg = decode_frame(raw)
+        except Exception as e:
+            log(logging.WARNING, "frame_not_json", error=str(e), raw=str(raw)[:200])
+            return
+        if not isinstance(msg, dict):
+            return
+        if msg.get("type") == "COMMAND":
+            notify_connected = on_command(msg) if on_command is not None else True
+            await handle_command(msg, notify_connected)
+            return
+        if "data" not in msg:
+            await handle_message(msg)
+            return
+        handler = HANDLERS.get((msg.get("topic", CONFIG.topics[0]), msg.get("type") or "DATA"))
+        if handler is None:
+            log(logging.DEBUG, "other_message", topic=msg.get("topic"), type=msg.get("type"))
+            return
+        if not self.arrivals.first(frame_key(msg)):
+            return
+        await self.queues["classify"].put((handler, msg, received_at))
+
+    async def _classify(self, handler, msg, received_at):
+        result = handler.classify(msg, received_at)
+        if result is None:
+            return
+        if result[1] is not None:
+            await self.queues["render"].put((handler,) + result)
+        else:
+            handler.collect(result[0])
+
+    async def _render(self, handler, data, rule, classified_at):
+        handler.deliver(data, rule, classified_at)
+
+class LiveConnections(set):
+    """Ids of subscribed connections, with events signalling coverage changes."""
+
+    def __init__(self):
+        super().__init__()
+        self.up = asyncio.Event()
+        self.down = asyncio.Event()
+        self.down.set()
+
+    def add(self, conn_id):
+        super().add(conn_id)
+        self.down.clear()
+        self.up.set()
+        METRICS.set_gauge("live_connections", len(self))
+
+    def discard(self, conn_id):
+        super().discard(conn_id)
+        if not self:
+            self.up.clear()
+            self.down.set()
+        METRICS.set_gauge("live_connections", len(self))
+
+class AnnouncementPoller:
+    """REST fallback that fills gaps while no websocket is subscribed.
+
+    Polls the announcement listing only while ``live`` is empty, starting at
+    ``min_interval`` and doubling up to ``max_interval`` while nothing new
+    appears. Requests are conditional (ETag / Last-Modified) and results are
+    incremental: only articles newer than the watermark are submitted, and
+    they go through the pipeline's usual dedup and classification. When a
+    socket comes back one more catch-up sweep covers the handover window.
+    The first sweep reaches back ``lookback`` seconds, but never before
+    ``since``, the publish time of the last announcement this replica saw.
+    Watermarks are Binance timestamps, so they are never compared with the
+    local clock, only with CLOCK's estimate of server time.
+    """
+
+    def __init__(self, url=None, catalog_ids=None, min_interval=None, max_interval=None,
+                 lookback=None, page_size=10, since=None):
+        catalog_ids = list(CONFIG.poll_catalog_ids) if catalog_ids is None else catalog_ids
+        lookback = CONFIG.poll_lookback if lookback is None else lookback
+        self.url = CONFIG.announcement_rest_url if url is None else url
+        self.catalog_ids = catalog_ids
+        self.min_interval = CONFIG.poll_min_interval if min_interval is None else min_interval
+        self.max_interval = CONFIG.poll_max_interval if max_interval is None else max_interval
+        self.page_size = page_size
+        start = CLOCK.now_ms() / 1000 - lookback
+        if since is not None:
+            start = max(start, since)
+        self.watermarks = {c: int(start * 1000) for c in catalog_ids}
+        self.validators = {}
+        self.polls = 0
+        self.not_modified = 0
+
+    async def fetch(self, session, catalog_id):
+        """Return announcements of one catalog newer than its watermark."""
+        headers = {}
+        etag, last_modified = self.validators.get(catalog_id, (None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        params = {"type": "1", "catalogId": str(catalog_id), "pageNo": "1", "pageSize": str(self.page_size)}
+        self.polls += 1
+        async with session.get(self.url, params=params, headers=headers) as response:
+            if response.status == 304:
+                self.not_modified += 1
+                return []
+            response.raise_for_status()
+            self.validators[catalog_id] = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+            body = await response.json(content_type=None)
+
+        watermark = self.watermarks.get(catalog_id, 0)
+        announcements = []
+        for catalog in (body.get("data") or {}).get("catalogs") or ():
+            for article in catalog.get("articles") or ():
+                release_date = article.get("releaseDate") or 0
+                if release_date > watermark:
+                    announcements.append({
+                        "catalogId": catalog.get("catalogId", catalog_id),
+                        "catalogName": catalog.get("catalogName", ""),
+                        "title": article.get("title", ""),
+                        "publishDate": release_date,
+                        "code": article.get("code"),
+                    })
+        if announcements:
+            self.watermarks[catalog_id] = max(a["publishDate"] for a in announcements)
+        announcements.sort(key=lambda a: a["publishDate"])
+        return announcements
+
+    async def sweep(self, session, pipeline):
+        found = 0
+        for catalog_id in self.catalog_ids:
+            try:
+                announcements = await self.fetch(session, catalog_id)
+            except Exception as e:
+                log(logging.WARNING, "poll_failed", catalog_id=catalog_id, error=str(e))
+                continue
+            for data in announcements:
+                await pipeline.submit_announcement(data, time.monotonic())
+            found += len(announcements)
+        if found:
+            METRICS.inc("poll_announcements", found)
+            log(logging.INFO, "poll_found", announcements=found)
+        return found
+
+    async def run(self, live, pipeline):
+        timeout = aiohttp.ClientTimeout(total=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                await live.down.wait()
+                log(logging.INFO, "poller_started")
+                interval = self.min_interval
+                while not live:
+                    found = await self.sweep(session, pipeline)
+                    interval = self.min_interval if found else min(self.max_interval, interval * 2)
+                    try:
+                        await asyncio.wait_for(live.up.wait(), interval)
+                    except asyncio.TimeoutError:
+                        pass
+                await self.sweep(session, pipeline)
+                log(logging.INFO, "poller_stopped")
+
+def _duration(seconds):
+    seconds = max(0, int(seconds))
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d"
+
+class TelegramCommands:
+    """Answer chat commands from memory via a getUpdates long poll.
+
+    Understands ``/recent [hours]``, ``/symbol XYZ`` and ``/status``. Only
+    chats in CHAT_IDS get answers, and only the leader polls, since Telegram
+    rejects concurrent getUpdates calls for one bot. Replies go through the
+    outbox to the asking chat, so they share the alert rate limits.
+    """
+
+    def __init__(self, history=None, poll_timeout=None, limit=10):
+        self.history = history
+        self.poll_timeout = CONFIG.telegram_poll_timeout if poll_timeout is None else poll_timeout
+        self.limit = limit
+        self.offset = None
+        self.started_at = time.time()
+
+    def answer(self, text):
+        """Return the reply to one command, or None if it is not ours."""
+        command, _, argument = text.strip().partition(" ")
+        command = command.split("@", 1)[0].lower()
+        argument = argument.strip()
+        history = self.history or HISTORY
+        now = time.time()
+        if command == "/recent":
+            try:
+                hours = float(argument) if argument else 1.0
+            except ValueError:
+                return "Usage: /recent [hours]"
+            records = history.recent(self.limit, now - hours * 3600)
+            if not records:
+                return f"No announcements in the last {hours:g}h."
+            return "\n".join(self._line(r, now) for r in records)
+        if command == "/symbol":
+            if not argument:
+                return "Usage: /symbol XYZ"
+            symbol = argument.split()[0].upper()
+            records = history.symbol(symbol, self.limit)
+            status = SYMBOLS.status(symbol) or "not on the exchange yet"
+            lines = [f"{symbol}: {status}"] + [self._line(r, now) for r in records]
+            if not records:
+                lines.append("No recent announcements.")
+            return "\n".join(lines)
+        if command == "/status":
+            outbox = _outbox.queue.qsize() if _outbox is not None else 0
+            return "\n".join([
+                f"Up {_duration(now - self.started_at)}, replica {CONFIG.pod_name}{' (leader)' if LEADER.is_leader else ''}",
+                f"Live connections: {METRICS.gauges.get('live_connections', 0)}",
+                f"Last activity: {METRICS.activity_age():.0f}s ago",
+                f"Frames: {METRICS.counters.get('messages_received', 0)}, "
+                f"alerts: {METRICS.counters.get('messages_matched', 0)}, "
+                f"sent: {METRICS.counters.get('telegram_sent', 0)}, queued: {outbox}",
+                f"Clock offset: {CLOCK.offset_ms:.0f} ms",
+                f"Announcements in memory: {history.count}/{history.size}",
+            ])
+        return None
+
+    @staticmethod
+    def _line(record, now):
+        return f"{_duration(now - record.published_at)} ago - {record.title}"
+
+    def handle(self, update):
+        """Answer one update; return True if a reply was queued."""
+        message = update.get("message") or update.get("channel_post") or {}
+        chat_id = str(message.get("chat", {}).get("id", ""))
+        text = message.get("text") or ""
+        if not text.startswith("/") or chat_id not in CHAT_IDS:
+            return False
+        reply = self.answer(text)
+        if reply is None:
+            return False
+        log(logging.INFO, "command_answered", chat_id=chat_id, command=text.split()[0])
+        for chunk in pack_messages([reply]):
+            get_outbox().enqueue(chat_id, chunk, lane="status")
+        return True
+
+    async def poll(self, session):
+        params = {"timeout": self.poll_timeout, "allowed_updates": '["message","channel_post"]'}
+        if self.offset is not None:
+            params["offset"] = self.offset
+        timeout = aiohttp.ClientTimeout(total=self.poll_timeout + CONFIG.telegram_total_timeout)
+        async with session.get(f"{CONFIG.telegram_api_base}/bot{CONFIG.bot_token}/getUpdates",
+                               params=params, timeout=timeout) as response:
+            body = await response.json(content_type=None)
+        if not body.get("ok"):
+            raise RuntimeError(body.get("description", "getUpdates failed"))
+        updates = body.get("result", [])
+        for update in updates:
+            self.offset = update["update_id"] + 1
+            self.handle(update)
+        return len(updates)
+
+    async def run(self):
+        failures = 0
+        while True:
+            if not LEADER.is_leader:
+                await asyncio.sleep(CONFIG.lease_renew_interval)
+                continue
+            try:
+                await self.poll(await get_telegram_session())
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                log(logging.WARNING, "telegram_poll_failed", error=str(e))
+                await asyncio.sleep(min(30.0, 2 ** failures))
+
+class Shutdown:
+    """Graceful stop requested by SIGTERM/SIGINT, with one deadline for the flush.
+
+    Connections stop reading and close their sockets once ``requested`` is
+    set; the pipeline and the outbox then get whatever is left of
+    ``timeout`` to hand every received alert to Telegram, and the rest is
+    spooled for the next instance.
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = CONFIG.shutdown_timeout if timeout is None else timeout
+        self.requested = asyncio.Event()
+        self.deadline = None
+
+    def request(self, reason="requested"):
+        if self.requested.is_set():
+            return
+        self.deadline = time.monotonic() + self.timeout
+        self.requested.set()
+        log(logging.INFO, "shutdown_requested", reason=reason, timeout=self.timeout)
+
+    def remaining(self):
+        if self.deadline is None:
+            return self.timeout
+        return max(0.0, self.deadline - time.monotonic())
+
+    async def sleep(self, delay):
+        """Sleep up to ``delay`` seconds; return True if shutdown was requested."""
+        try:
+            await asyncio.wait_for(self.requested.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        return self.requested.is_set()
+
+    def install(self, signums=None):
+        import signal
+        signums = (signal.SIGTERM, signal.SIGINT) if signums is None else signums
+        loop = asyncio.get_running_loop()
+        for signum in signums:
+            loop.add_signal_handler(signum, self.request, signal.Signals(signum).name)
+
+    def uninstall(self, signums=None):
+        import signal
+        signums = (signal.SIGTERM, signal.SIGINT) if signums is None else signums
+        loop = asyncio.get_running_loop()
+        for signum in signums:
+            loop.remove_signal_handler(signum)
+
+async def run_connection(conn_id, api_key, api_secret, pipeline, live, shutdown=None):
+    """Keep one signed subscription alive and submit its frames to the pipeline.
+
+    Every connection shares the pipeline, whose first-arrival filter keeps
+    only the first copy of an announcement, and ``live`` so the connected
+    notification is only sent when coverage is restored, not for every
+    standby socket. Once ``shutdown`` is requested the socket is closed
+    cleanly, frames already received are still submitted, and the loop
+    returns instead of reconnecting.
+    """
+    shutdown = shutdown or Shutdown()
+    signer = PresignedUrl(api_secret=api_secret)
+    refresher = asyncio.create_task(signer.run())
+    policy = ReconnectPolicy()
+    # Identity of the open socket; acks decoded after it dropped are stale
+    current = None
+
+    async def close_on_shutdown(ws):
+        await shutdown.requested.wait()
+        await ws.close()
+
+    def on_command(socket_id, msg):
+        """Track subscription state; return whether to announce the connection.
+
+        Runs later, on a pipeline decode worker, so the socket that sent the
+        ack may already be gone and must not be marked live.
+        """
+        if socket_id is not current:
+            return False
+        if msg.get("subType") != "SUBSCRIBE" or msg.get("data") != "SUCCESS":
+            return False
+        elapsed = policy.mark_connected()
+        if elapsed is not None:
+            log(logging.INFO, "reconnected", conn=conn_id, seconds=round(elapsed, 3))
+        notify_connected = not live
+        live.add(conn_id)
+        return notify_connected
+
+    try:
+        while not shutdown.requested.is_set():
+            error = None
+            keepalive = None
+            try:
+                ws_url = signer.take()
+                headers = [("X-MBX-APIKEY", api_key)]
+
+                async with websockets.connect(ws_url, extra_headers=headers, ping_interval=None) as ws:
+                    sub = {"command": "SUBSCRIBE", "value": CONFIG.subscription}
+                    await ws.send(json.dumps(sub))
+
+                    keepalive = Keepalive(ws, conn_id)
+                    ping_task = asyncio.create_task(keepalive.run())
+                    closer = asyncio.create_task(close_on_shutdown(ws))
+                    current = socket_id = object()
+                    ack = lambda msg, socket_id=socket_id: on_command(socket_id, msg)
+
+                    try:
+                        async for raw in ws:
+                            received_at = time.monotonic()
+                            keepalive.frame_received()
+                            METRICS.inc("messages_received")
+                            METRICS.mark_activity()
+                            log(logging.DEBUG, "frame_received", conn=conn_id, frame=raw)
+                            await pipeline.submit(raw, received_at, ack)
+                        
+                        log(logging.INFO, "connection_ended", conn=conn_id)
+                    except websockets.exceptions.ConnectionClosed as e:
+                        error = e
+                        log(logging.WARNING, "connection_closed", conn=conn_id, error=str(e))
+                    except Exception as e:
+                        error = e
+                        log(logging.ERROR, "message_loop_error", conn=conn_id, error=str(e))
+                    finally:
+                        current = None
+                        live.discard(conn_id)
+                        ping_task.cancel()
+                        closer.cancel()
+
+            except Exception as e:
+                error = e
+                log(logging.ERROR, "connection_error", conn=conn_id, error=str(e))
+
+            if shutdown.requested.is_set():
+                log(logging.INFO, "connection_stopped", conn=conn_id)
+                break
+            kind = "dead" if keepalive is not None and keepalive.dead else classify_disconnect(error)
+            if kind == "auth":
+                await asyncio.to_thread(CLOCK.sync)
+                # The prepared URL was signed with the offset that just failed
+                signer.refresh()
+            delay = policy.next_delay(kind)
+            METRICS.inc("reconnects")
+            log(logging.INFO, "reconnecting", conn=conn_id, delay=round(delay, 3), reason=kind)
+            await shutdown.sleep(delay)
+    finally:
+        refresher.cancel()
+
+async def listen_announcements(connections=None, shutdown=None):
+    if not CONFIG.binance_api_key:
+        raise RuntimeError("BINANCE_API_KEY missing")
+
+    connections = connections or CONFIG.binance_connections
+    credentials = binance_credentials()
+    pipeline = Pipeline().start()
+    live = LiveConnections()
+    poller = None
+    if CONFIG.poll_enabled:
+        # Resume after the newest announcement already handled. With no
+        # dedup history a cold start cannot tell which recent listings were
+        # alerted before, so it does not sweep back at all.
+        since = DEDUP.newest()
+        since = CLOCK.now_ms() / 1000 if since is None else since
+        poller = asyncio.create_task(AnnouncementPoller(since=since).run(live, pipeline))
+    log(logging.INFO, "connections_opening", connections=connections, key_pairs=len(credentials))
+
+    try:
+        await asyncio.gather(*(
+            run_connection(i, *credentials[i % len(credentials)], pipeline, live, shutdown)
+            for i in range(connections)
+        ))
+    finally:
+        if poller is not None:
+            poller.cancel()
+            await asyncio.gather(poller, return_exceptions=True)
+        if shutdown is not None and shutdown.requested.is_set():
+            # Alerts from frames already read must reach the outbox
+            try:
+                await asyncio.wait_for(pipeline.join(), shutdown.remaining())
+            except asyncio.TimeoutError:
+                log(logging.WARNING, "pipeline_not_drained")
+        await pipeline.stop()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+class Metrics:
+    """Counters, gauges and latency histograms in Prometheus text format.
+
+    Everything runs on the event loop so no locking is needed. Counter and
+    gauge names are created on first use; ``render`` prefixes them with
+    ``notificationbot_``.
+    """
+
+    PREFIX = "notificationbot_"
+
+    def __init__(self):
+        self.counters = {name: 0 for name in (
+            "messages_received", "messages_matched", "telegram_sent",
+            "telegram_failed", "telegram_dropped", "reconnects",
+        )}
+        self.gauges = {"live_connections": 0}
+        self.histograms = {name: Histogram() for name in (
+            "publish_to_receive_seconds", "receive_to_classify_seconds", "classify_to_ack_seconds",
+        )}
+        self.started_at = time.monotonic()
+        self.last_activity = None
+
+    def inc(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def mark_activity(self):
+        self.last_activity = time.monotonic()
+
+    def activity_age(self):
+        since = self.last_activity if self.last_activity is not None else self.started_at
+        return time.monotonic() - since
+
+    def render(self):
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {self.PREFIX}{name}_total counter")
+            lines.append(f"{self.PREFIX}{name}_total {value}")
+        for name, value in self.gauges.items():
+            lines.append(f"# TYPE {self.PREFIX}{name} gauge")
+            lines.append(f"{self.PREFIX}{name} {value}")
+        lines.append(f"# TYPE {self.PREFIX}last_activity_age_seconds gauge")
+        lines.append(f"{self.PREFIX}last_activity_age_seconds {self.activity_age():.3f}")
+        for name, histogram in self.histograms.items():
+            full = self.PREFIX + name
+            lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{full}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{full}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{full}_sum {histogram.sum:.6f}")
+            lines.append(f"{full}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+def health_response(path):
+    """Return ``(status, body, content_type)`` for a metrics/health path."""
+    if path == "/metrics":
+        return 200, METRICS.render(), "text/plain; version=0.0.4"
+    if path == "/healthz":
+        age = METRICS.activity_age()
+        if age > CONFIG.health_max_silence:
+            return 503, f"stale: no activity for {age:.0f}s\n", "text/plain"
+        return 200, "ok\n", "text/plain"
+    if path == "/readyz":
+        if METRICS.gauges.get("live_connections", 0) > 0:
+            return 200, "ready\n", "text/plain"
+        return 503, "no live Binance connection\n", "text/plain"
+    return 404, "not found\n", "text/plain"
+
+async def handle_http(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        while True:
+            header = await asyncio.wait_for(reader.readline(), 5)
+            if header in (b"\r\n", b"\n", b""):
+                break
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+        status, body, content_type = health_response(path)
+        payload = body.encode("utf-8")
+        reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    except Exception as e:
+        log(logging.WARNING, "metrics_request_failed", error=str(e))
+    finally:
+        writer.close()
+
+async def start_metrics_server(host=None, port=None):
+    host = CONFIG.metrics_host if host is None else host
+    port = CONFIG.metrics_port if port is None else port
+    server = await asyncio.start_server(handle_http, host, port)
+    log(logging.INFO, "metrics_listening", host=host, port=port)
+    return server
+
+class LoopMonitor:
+    """Measure event-loop scheduling lag and name whatever blocks the loop.
+
+    A coroutine sleeps ``interval`` and records how late it woke up in
+    ``loop_lag_seconds``. Measuring lag afterwards cannot say who caused it,
+    so a watchdog thread also checks the coroutine's heartbeat; once it is
+    older than ``threshold`` the loop thread is still stuck, and its current
+    stack, the blocking callback, is logged once per stall. A threshold of
+    0 keeps the lag metric and disables the watchdog.
+    """
+
+    def __init__(self, interval=None, threshold=None):
+        self.interval = CONFIG.loop_lag_interval if interval is None else interval
+        self.threshold = CONFIG.loop_lag_threshold if threshold is None else threshold
+        self.heartbeat = time.monotonic()
+        self.stalls = 0
+        self._loop_thread = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start_watchdog(self):
+        self._loop_thread = threading.get_ident()
+        if self.threshold and self._watchdog is None:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def stop_watchdog(self):
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join(1)
+            self._watchdog = None
+
+    def _watch(self):
+        reported = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self.heartbeat
+            stalled = time.monotonic() - beat
+            if stalled < self.threshold + self.interval or reported == beat:
+                continue
+            reported = beat
+            self.stalls += 1
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            log(logging.WARNING, "loop_stalled", stalled=round(stalled, 3), stack=stack)
+
+    async def run(self):
+        self.start_watchdog()
+        try:
+            while True:
+                started = time.monotonic()
+                self.heartbeat = started
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - started - self.interval)
+                METRICS.observe("loop_lag_seconds", lag)
+                METRICS.set_gauge("loop_lag_seconds_last", lag)
+        finally:
+            self.stop_watchdog()
+
+class Profiler:
+    """Capture a time-boxed cProfile of the event loop thread to a file.
+
+    Triggered by SIGUSR1 in production (``kill -USR1 1`` in the pod); a
+    second signal while a capture runs is ignored. The profile is written as
+    ``profile-<pod>-<timestamp>.pstats`` under ``directory``, readable with
+    ``python -m pstats``.
+    """
+
+    def __init__(self, seconds=None, directory=None):
+        self.seconds = CONFIG.profile_seconds if seconds is None else seconds
+        self.directory = CONFIG.profile_dir if directory is None else directory
+        self.profile = None
+        self.last_path = None
+
+    def start(self):
+        if self.profile is not None:
+            log(logging.INFO, "profile_already_running")
+            return False
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+        asyncio.get_running_loop().call_later(self.seconds, self.stop)
+        log(logging.INFO, "profile_started", seconds=self.seconds)
+        return True
+
+    def stop(self):
+        if self.profile is None:
+            return None
+        profile, self.profile = self.profile, None
+        profile.disable()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"profile-{CONFIG.pod_name}-{stamp}.pstats")
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            log(logging.ERROR, "profile_write_failed", path=path, error=str(e))
+            return None
+        self.last_path = path
+        log(logging.INFO, "profile_written", path=path)
+        return path
+
+    def install(self, signum=None):
+        """Start a capture whenever ``signum`` (default SIGUSR1) arrives."""
+        import signal
+        signum = signal.SIGUSR1 if signum is None else signum
+        asyncio.get_running_loop().add_signal_handler(signum, self.start)
+
+def configure(config):
+    """Install ``config`` and rebuild the module-level components from it.
+
+    Components created later read ``CONFIG`` when they are constructed, so
+    this only has to replace the ones built at import from the defaults.
+    """
+    global CONFIG, _sample_rates, CHAT_IDS, SYMBOLS, HISTORY, CLOCK, DIGEST, LEADER, DEDUP, HANDLERS
+    CONFIG = config
+    _sample_rates = _parse_pairs(config.log_sample_rates)
+    CHAT_IDS = load_chat_ids(config.telegram_chats_file, config.chat_id)
+    SYMBOLS = SymbolIndex(config.symbol_snapshot_path, config.symbol_refresh_url, config.symbol_refresh_interval)
+    HISTORY = AnnouncementHistory(config.history_size)
+    CLOCK = ClockSync(config.clock_sync_samples, config.clock_sync_interval)
+    DIGEST = AnnouncementDigest(config.digest_interval)
+    LEADER = LeaderElector(make_lease_backend(config.lease_backend), config.pod_name, config.lease_duration,
+                           config.lease_renew_interval, config.standby_replay_window)
+    DEDUP = AnnouncementDedup(config.dedup_db_path, config.dedup_ttl, config.dedup_max_entries)
+    HANDLERS = build_dispatch_table(config.topics, config.topic_config_file)
+    return config
+
+async def main(config=None):
+    config = configure(Config.from_env() if config is None else config)
+    # Only the clock offset is needed before signing the first connection;
+    # the snapshot loads alongside it and Telegram warms up in the background
+    # while the socket connects, since the first alert comes after subscribe.
+    warmup = asyncio.create_task(warm_telegram_connection())
+    await asyncio.gather(asyncio.to_thread(CLOCK.sync), asyncio.to_thread(SYMBOLS.load))
+    DEDUP.load()
+    LEADER.restore(config.outbox_spool_path)
+    metrics_server = (await start_metrics_server(config.metrics_host, config.metrics_port)
+                      if config.metrics_port else None)
+    background = [warmup, asyncio.create_task(CLOCK.run()), asyncio.create_task(DEDUP.run()),
+                  asyncio.create_task(LoopMonitor(config.loop_lag_interval, config.loop_lag_threshold).run())]
+    profiler = Profiler(config.profile_seconds, config.profile_dir)
+    shutdown = Shutdown(config.shutdown_timeout)
+    try:
+        profiler.install()
+        shutdown.install()
+    except (NotImplementedError, AttributeError, RuntimeError) as e:
+        log(logging.WARNING, "signal_handlers_unavailable", error=str(e))
+    if config.symbol_refresh_interval:
+        background.append(asyncio.create_task(SYMBOLS.run()))
+    # Cancelled last: the lease is held until the outbox has drained
+    elector = asyncio.create_task(LEADER.run()) if LEADER.backend is not None else None
+    if DIGEST.interval > 0:
+        background.append(asyncio.create_task(DIGEST.run()))
+    if config.telegram_commands and config.bot_token:
+        background.append(asyncio.create_task(TelegramCommands(poll_timeout=config.telegram_poll_timeout).run()))
+    try:
+        await listen_announcements(config.binance_connections, shutdown=shutdown)
+    finally:
+        for task in background:
+            task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        profiler.stop()
+        DEDUP.close()
+        DIGEST.flush()
+        await stop_outbox(shutdown.remaining(), config.outbox_spool_path)
+        if elector is not None:
+            # Releasing publishes the ids delivered during the drain
+            elector.cancel()
+            await asyncio.gather(elector, return_exceptions=True)
+        await close_telegram_session()
+        log(logging.INFO, "shutdown_complete")
 
 if __name__ == "__main__":
-    
-    asyncio.run(listen_announcements())
+    config = Config.from_env()
+    setup_logging(config.log_level)
+    try:
+        asyncio.run(main(config))
+    finally:
+        stop_logging()
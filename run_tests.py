@@ -23,9 +23,9 @@ def run_tests(test_type="all"):
     
     if test_type == "unit":
         cmd = ["python", "-m", "pytest", "tests/test_binance_api.py", "tests/test_telegram.py", 
-               "tests/test_message_processing.py", "-v"]
+               "tests/test_message_processing.py", "tests/test_metrics.py", "tests/test_logging.py", "tests/test_leader.py", "tests/test_config.py", "-v"]
     elif test_type == "integration": 
-        cmd = ["python", "-m", "pytest", "tests/test_integration.py", "-v"]
+        cmd = ["python", "-m", "pytest", "tests/test_integration.py", "tests/test_end_to_end.py", "tests/test_poller.py", "tests/test_soak.py", "-v"]
     else:  # all
         cmd = ["python", "-m", "pytest", "tests/", "-v"]
     
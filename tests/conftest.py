@@ -1,5 +1,6 @@
 import pytest
 import asyncio
+import dataclasses
 import json
 import os
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
@@ -11,24 +12,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
 
-@pytest.fixture
-def mock_env_vars():
-    """Mock environment variables for testing"""
-    return {
-        "BINANCE_API_KEY": "test_api_key_123456789",
-        "BINANCE_API_SECRET": "test_api_secret_123456789",
-        "TELEGRAM_BOT_TOKEN": "123456789:TEST_BOT_TOKEN",
-        "TELEGRAM_CHAT_ID": "123456789"
-    }
-
-@pytest.fixture
-def mock_config(mock_env_vars):
-    """Mock the configuration loading"""
-    with patch.dict(os.environ, mock_env_vars):
-        # Reload the main module to pick up the mocked env vars
-        import importlib
-        importlib.reload(main)
-        yield main
+# Keep the REST fallback poller from reaching binance.com during tests;
+# tests that exercise it point it at a local fake server explicitly.
+main.configure(dataclasses.replace(main.CONFIG, poll_enabled=False))
 
 @pytest.fixture
 def sample_announcement_data():
@@ -71,4 +57,22 @@ def sample_websocket_messages():
                 "body": "Scheduled maintenance will occur..."
             })
         }
-    }
\ No newline at end of file
+    }
+
+@pytest.fixture
+def telegram_session_factory():
+    """Build a fake aiohttp session whose post() yields a canned response"""
+    def factory(status=200, text="", side_effect=None):
+        response = MagicMock()
+        response.status = status
+        response.text = AsyncMock(return_value=text)
+        response.json = AsyncMock(return_value={})
+
+        context = MagicMock()
+        context.__aenter__ = AsyncMock(return_value=response)
+        context.__aexit__ = AsyncMock(return_value=False)
+
+        session = MagicMock()
+        session.post = MagicMock(return_value=context, side_effect=side_effect)
+        return session
+    return factory
@@ -0,0 +1,331 @@
+"""
+Local stand-ins for the Binance announcement websocket and the Telegram
+Bot API, used by the end-to-end tests and the benchmarks in benchmarks/.
+Both servers bind to an ephemeral port on 127.0.0.1 and need no network.
+FakeWebSocket and RecordingPipeline replace a connection and the pipeline
+in-process for tests that drive run_connection directly.
+"""
+import asyncio
+import dataclasses
+import hashlib
+import hmac
+import json
+import time
+from unittest.mock import patch
+
+import websockets
+from aiohttp import web
+
+class FakeBinanceServer:
+    """Speaks the /sapi/wss subscribe protocol and pushes announcement frames"""
+
+    def __init__(self, api_key=None, api_secret=None):
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.clients = set()
+        self.subscriptions = []
+        self.connections = 0
+        self.rejected = 0
+        self.paths = []
+        self.close_codes = []
+        self.subscribe_result = "SUCCESS"
+        self.sent_at = {}
+        self.subscribed = asyncio.Event()
+        self.server = None
+
+    @property
+    def url(self):
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/sapi/wss"
+
+    async def start(self):
+        self.server = await websockets.serve(
+            self._handler, "127.0.0.1", 0,
+            process_request=self._check_request, ping_interval=None, compression=None,
+        )
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _check_request(self, path, headers):
+        self.paths.append(path)
+        if not path.startswith("/sapi/wss?"):
+            return self._reject(404, "unknown path")
+        if self.api_key and headers.get("X-MBX-APIKEY") != self.api_key:
+            return self._reject(401, "invalid api-key")
+        query = path.split("?", 1)[1]
+        payload, sep, signature = query.rpartition("&signature=")
+        if not sep:
+            return self._reject(400, "missing signature")
+        if self.api_secret:
+            expected = hmac.new(self.api_secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, signature):
+                return self._reject(401, "Signature for this request is not valid.")
+        return None
+
+    def _reject(self, status, reason):
+        self.rejected += 1
+        return status, [], reason.encode()
+
+    async def _handler(self, ws):
+        self.connections += 1
+        try:
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("command") == "SUBSCRIBE":
+                    self.subscriptions.append(msg.get("value"))
+                    await ws.send(json.dumps({
+                        "type": "COMMAND", "subType": "SUBSCRIBE", "data": self.subscribe_result, "code": "00000000",
+                    }))
+                    self.clients.add(ws)
+                    self.subscribed.set()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.close_codes.append(ws.close_code)
+            self.clients.discard(ws)
+            if not self.clients:
+                self.subscribed.clear()
+
+    async def push_raw(self, frame):
+        for ws in list(self.clients):
+            try:
+                await ws.send(frame)
+            except websockets.exceptions.ConnectionClosed:
+                self.clients.discard(ws)
+
+    async def push(self, data, topic="com_announcement_en"):
+        """Send one announcement to every subscribed client, recording when"""
+        self.sent_at[data.get("title")] = time.perf_counter()
+        await self.push_raw(json.dumps({"type": "DATA", "topic": topic, "data": json.dumps(data)}))
+
+    async def stream(self, announcements, rate=0.0):
+        """Push announcements at ``rate`` frames per second (0 = unpaced)"""
+        start = time.perf_counter()
+        for i, data in enumerate(announcements):
+            if rate:
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self.push(data)
+            if not rate and i % 64 == 63:
+                await asyncio.sleep(0)
+
+    def stall(self):
+        """Stop reading from every client, like a peer that vanished without a FIN.
+
+        The TCP connections stay open but pings are never answered.
+        """
+        for ws in self.clients:
+            ws.transport.pause_reading()
+
+    async def drop_clients(self, code=1000):
+        for ws in list(self.clients):
+            await ws.close(code)
+
+class FakeTelegramServer:
+    """Mimics sendMessage, getMe and getUpdates, with optional 429s, 500s and slowness"""
+
+    def __init__(self, delay=0.0, rate_limit_every=0, retry_after=0.05, fail_every=0):
+        self.delay = delay
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.fail_every = fail_every
+        self.requests = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.messages = []
+        self.updates = []
+        self._changed = asyncio.Condition()
+        self.runner = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/sendMessage", self._send_message)
+        app.router.add_get("/bot{token}/getMe", self._get_me)
+        app.router.add_route("*", "/bot{token}/getUpdates", self._get_updates)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def _get_me(self, request):
+        return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "username": "fake_bot"}})
+
+    async def _get_updates(self, request):
+        updates, self.updates = self.updates, []
+        return web.json_response({"ok": True, "result": updates})
+
+    async def _send_message(self, request):
+        self.requests += 1
+        form = await request.post()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+            self.rate_limited += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if self.fail_every and self.requests % self.fail_every == 0:
+            self.failed += 1
+            return web.json_response({"ok": False, "error_code": 500, "description": "Internal Server Error"},
+                                     status=500)
+        async with self._changed:
+            self.messages.append((form.get("chat_id"), form.get("text"), time.perf_counter()))
+            self._changed.notify_all()
+        return web.json_response({"ok": True, "result": {"message_id": len(self.messages)}})
+
+    async def wait_for_messages(self, count, timeout=5.0):
+        """Wait until at least ``count`` messages were acknowledged"""
+        async with self._changed:
+            await asyncio.wait_for(self._changed.wait_for(lambda: len(self.messages) >= count), timeout)
+        return self.messages
+
+class FakeAnnouncementServer:
+    """Mimics the announcement REST listing, with ETag conditional requests,
+    and the /api/v3/time endpoint used for clock sync"""
+
+    def __init__(self):
+        self.articles = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.runner = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/bapi/composite/v1/public/cms/article/list/query"
+
+    @property
+    def time_url(self):
+        return f"http://127.0.0.1:{self.port}/api/v3/time"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/bapi/composite/v1/public/cms/article/list/query", self._list)
+        app.router.add_get("/api/v3/time", self._time)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    def publish(self, data):
+        """Add an announcement in the same shape the websocket would push"""
+        self.articles.setdefault(data["catalogId"], []).insert(0, {
+            "id": len(self.articles.get(data["catalogId"], ())) + 1,
+            "code": f"code{data['publishDate']}",
+            "title": data["title"],
+            "releaseDate": data["publishDate"],
+            "catalogName": data.get("catalogName", ""),
+        })
+
+    async def _time(self, request):
+        return web.json_response({"serverTime": int(time.time() * 1000)})
+
+    async def _list(self, request):
+        self.requests += 1
+        catalog_id = int(request.query.get("catalogId", "0"))
+        page_size = int(request.query.get("pageSize", "10"))
+        articles = self.articles.get(catalog_id, [])[:page_size]
+        etag = f'"{catalog_id}-{len(self.articles.get(catalog_id, ()))}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        name = articles[0]["catalogName"] if articles else ""
+        body = {"code": "000000", "data": {"catalogs": [{
+            "catalogId": catalog_id, "catalogName": name,
+            "articles": [{k: v for k, v in a.items() if k != "catalogName"} for a in articles],
+        }]}}
+        return web.json_response(body, headers={"ETag": etag})
+
+class FakeWebSocket:
+    """Minimal websocket that replays frames and then stays open"""
+
+    def __init__(self, frames, hold=True):
+        self.frames = frames
+        self.hold = hold
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def ping(self):
+        pass
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for frame in self.frames:
+            yield frame
+            await asyncio.sleep(0)
+        if self.hold:
+            await asyncio.sleep(3600)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class RecordingPipeline:
+    """Pipeline stand-in that keeps submitted frames instead of decoding them"""
+
+    def __init__(self):
+        self.frames = []
+
+    async def submit(self, raw, received_at, on_command=None):
+        self.frames.append((raw, on_command))
+
+def configured(main, **settings):
+    """Patch ``main.CONFIG`` with ``settings`` changed; use as a context manager"""
+    return patch.object(main, "CONFIG", dataclasses.replace(main.CONFIG, **settings))
+
+def bot_overrides(main, binance, telegram, chat_ids=("1001",), **settings):
+    """Attributes to patch on ``main`` so the real bot talks to the fakes"""
+    config = dataclasses.replace(
+        main.CONFIG,
+        binance_ws_base=binance.url,
+        binance_api_key=binance.api_key or "fake_api_key",
+        binance_api_secret=binance.api_secret or "fake_api_secret",
+        telegram_api_base=telegram.url,
+        bot_token="123:FAKE",
+        poll_enabled=False,
+        # One sendMessage per alert, so callers can count deliveries
+        telegram_coalesce_window=0,
+    )
+    return {
+        "CONFIG": dataclasses.replace(config, **settings),
+        "CHAT_IDS": list(chat_ids),
+        "DEDUP": main.AnnouncementDedup(path=""),
+        "METRICS": main.Metrics(),
+    }
+
+def listing(i, symbol=None):
+    """A unique New Cryptocurrency Listing announcement"""
+    symbol = symbol or f"TK{i}"
+    return {
+        "catalogId": 48,
+        "catalogName": "New Cryptocurrency Listing",
+        "publishDate": int(time.time() * 1000),
+        "title": f"Binance Will List Token{i} ({symbol}) with Seed Tag Applied",
+        "body": f"Binance will list Token{i} ({symbol}) and open trading for {symbol}/USDT.",
+    }
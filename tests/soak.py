@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Soak test: hours of simulated traffic with a memory and task-count gate
+Usage: python tests/soak.py [--hours H] [--speedup N] [--max-growth-kb KB] [--max-task-growth N]
+
+Runs the real listen_announcements loop in-process against the fake
+Binance and Telegram servers from fakes.py. Time is compressed by
+``--speedup``: every simulated minute pushes one listing, two announcements
+that match no rule and one malformed frame, and every ten simulated minutes
+all sockets are dropped so the bot reconnects. Keepalive pings run at the
+production interval divided by the speedup. Telegram answers every 7th
+sendMessage with a 429 and every 11th with a 500.
+
+Bounded caches (first-arrival filter, dedup, history) are shrunk so that
+they reach their cap during the warm-up quarter of the run. After that,
+retained memory should stay flat. At the end of warm-up and then every ten
+simulated minutes, the run waits for the outbox to drain, collects garbage
+and records ``tracemalloc`` traced memory and the number of live asyncio
+tasks. It fails if either grows past its threshold between the first and
+the last sample, and prints the allocation sites that grew the most.
+Runs fully offline.
+"""
+import argparse
+import asyncio
+import functools
+import gc
+import os
+import sys
+import tracemalloc
+import urllib.parse
+from unittest.mock import patch
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "tests"))
+
+import main
+from fakes import FakeBinanceServer, FakeTelegramServer, bot_overrides, listing
+
+SAMPLE_MINUTES = 10
+CACHE_SIZE = 32
+
+def unmatched(i):
+    """An announcement no rule matches, so it is only classified and recorded"""
+    data = listing(i)
+    data.update(catalogId=49, catalogName="Latest Binance News",
+                title=f"Binance Completed Scheduled Maintenance Window {i}")
+    return data
+
+def check(samples, max_growth_kb, max_task_growth):
+    """Compare the first and last ``(minute, traced_bytes, tasks)`` samples; return failures."""
+    if len(samples) < 2:
+        return ["not enough samples; run for longer"]
+    _, first_bytes, first_tasks = samples[0]
+    _, last_bytes, last_tasks = samples[-1]
+    failures = []
+    growth_kb = (last_bytes - first_bytes) / 1024
+    if growth_kb > max_growth_kb:
+        failures.append(f"retained memory grew {growth_kb:.0f} KB (limit {max_growth_kb} KB)")
+    if last_tasks - first_tasks > max_task_growth:
+        failures.append(f"live tasks grew from {first_tasks} to {last_tasks} (limit +{max_task_growth})")
+    return failures
+
+async def settle(timeout=5.0):
+    """Let in-flight alerts finish so samples compare like with like"""
+    if main._outbox is not None:
+        try:
+            await main._outbox.drain(timeout)
+        except asyncio.TimeoutError:
+            pass
+    await asyncio.sleep(0)
+    # Every reconnect signs a new URL and urlsplit memoizes up to 128 of them
+    urllib.parse.clear_cache()
+    gc.collect()
+
+async def run_soak(hours=1.0, speedup=600.0, max_growth_kb=128, max_task_growth=2, top=10):
+    """Run the soak and return a report dict; ``report["failures"]`` is empty on success"""
+    minute = 60.0 / speedup
+    minutes = int(hours * 60)
+    warmup = max(SAMPLE_MINUTES, minutes // 4)
+    binance = await FakeBinanceServer(api_key="soak_key", api_secret="soak_secret").start()
+    telegram = await FakeTelegramServer(rate_limit_every=7, fail_every=11, retry_after=0.01).start()
+    keepalive = functools.partial(main.Keepalive, interval=main.CONFIG.ping_interval / speedup,
+                                  pong_timeout=main.CONFIG.pong_timeout)
+    arrivals = functools.partial(main.FirstArrivalFilter, maxsize=CACHE_SIZE)
+    overrides = bot_overrides(main, binance, telegram)
+    overrides.update(DEDUP=main.AnnouncementDedup(path="", maxsize=CACHE_SIZE),
+                     HISTORY=main.AnnouncementHistory(CACHE_SIZE),
+                     Keepalive=keepalive, FirstArrivalFilter=arrivals)
+    report = {"minutes": minutes, "samples": [], "listings": 0, "delivered": 0, "reconnects": 0}
+    baseline = None
+    tracemalloc.start(25)
+    try:
+        with patch.multiple(main, **overrides):
+            main._outbox = main.TelegramOutbox(global_rate=1000, chat_rate=1000)
+            main._outbox_loop = asyncio.get_running_loop()
+            task = asyncio.create_task(main.listen_announcements())
+            try:
+                await asyncio.wait_for(binance.subscribed.wait(), 5)
+                for m in range(1, minutes + 1):
+                    await binance.push(listing(m))
+                    await binance.push(unmatched(2 * m))
+                    await binance.push(unmatched(2 * m + 1))
+                    await binance.push_raw('{"type": "DATA", "topic": "com_announcement_en", "data": ')
+                    report["listings"] += 1
+                    await asyncio.sleep(minute)
+                    if m % SAMPLE_MINUTES:
+                        continue
+                    await binance.drop_clients()
+                    await asyncio.wait_for(binance.subscribed.wait(), 5)
+                    report["reconnects"] += 1
+                    if m < warmup:
+                        continue
+                    await settle()
+                    report["delivered"] += len(telegram.messages)
+                    telegram.messages.clear()
+                    binance.sent_at.clear()
+                    binance.close_codes.clear()
+                    traced, _ = tracemalloc.get_traced_memory()
+                    report["samples"].append((m, traced, len(asyncio.all_tasks())))
+                    snapshot = tracemalloc.take_snapshot()
+                    if baseline is None:
+                        baseline = snapshot
+                    else:
+                        last = snapshot
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                await main.stop_outbox(timeout=1)
+                await main.close_telegram_session()
+    finally:
+        tracemalloc.stop()
+        await binance.stop()
+        await telegram.stop()
+
+    report["delivered"] += len(telegram.messages)
+    report["rate_limited"] = telegram.rate_limited
+    report["server_errors"] = telegram.failed
+    report["failures"] = check(report["samples"], max_growth_kb, max_task_growth)
+    if baseline is not None and len(report["samples"]) > 1:
+        report["top_growth"] = [str(stat) for stat in last.compare_to(baseline, "lineno")[:top]]
+    return report
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hours", type=float, default=6.0, help="simulated hours to run")
+    parser.add_argument("--speedup", type=float, default=600.0, help="simulated seconds per real second")
+    parser.add_argument("--max-growth-kb", type=float, default=128)
+    parser.add_argument("--max-task-growth", type=int, default=2)
+    parser.add_argument("--log-level", default="CRITICAL")
+    args = parser.parse_args()
+    main.setup_logging(args.log_level)
+    try:
+        report = asyncio.run(run_soak(args.hours, args.speedup, args.max_growth_kb, args.max_task_growth))
+    finally:
+        main.stop_logging()
+
+    print(f"simulated {report['minutes']} min, {report['reconnects']} reconnects, "
+          f"{report['listings']} listings, {report['delivered']} messages delivered, "
+          f"{report['rate_limited']} 429s, {report['server_errors']} 500s")
+    for m, traced, tasks in report["samples"]:
+        print(f"minute {m:>5}   traced {traced / 1024:9.1f} KB   tasks {tasks}")
+    for line in report.get("top_growth", []):
+        print(f"  {line}")
+    for failure in report["failures"]:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if report["failures"] else 0)
+
+if __name__ == "__main__":
+    main_cli()
@@ -10,32 +10,37 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
+from fakes import configured
 
 class TestBinanceAPI:
     """Test Binance API integration"""
     
     @patch('main.requests.get')
-    def test_get_binance_server_time_success(self, mock_get):
-        """Test successful server time retrieval"""
+    @patch('main.time.time')
+    def test_clock_sync_queries_server_time(self, mock_time, mock_get):
+        """Test that a clock sync reads serverTime from the time endpoint"""
+        mock_time.side_effect = [1634567890.0, 1634567890.0]
         mock_response = Mock()
         mock_response.json.return_value = {"serverTime": 1634567890123}
         mock_get.return_value = mock_response
-        
-        result = main.get_binance_server_time()
-        
-        assert result == 1634567890123
+        clock = main.ClockSync(samples=1)
+
+        assert clock.sync() is True
+
+        assert clock.offset_ms == pytest.approx(123.0)
         mock_get.assert_called_once_with("https://api.binance.com/api/v3/time", timeout=5)
     
     @patch('main.requests.get')
     @patch('main.time.time')
-    def test_get_binance_server_time_failure_fallback(self, mock_time, mock_get):
-        """Test fallback to local time when server time fails"""
+    def test_clock_sync_failure_falls_back_to_local_time(self, mock_time, mock_get):
+        """Test that signing uses local time when server time is unreachable"""
         mock_get.side_effect = Exception("Connection failed")
         mock_time.return_value = 1634567890.123
-        
-        result = main.get_binance_server_time()
-        
-        assert result == 1634567890123  # Local time * 1000
+        clock = main.ClockSync(samples=2)
+
+        assert clock.sync() is False
+
+        assert clock.now_ms() == 1634567890123  # Local time * 1000
     
     def test_generate_random_string(self):
         """Test random string generation"""
@@ -52,13 +57,8 @@ class TestBinanceAPI:
     def test_create_signed_url(self):
         """Test WebSocket URL creation with signature"""
         # Test the function directly without complex mocking
-        with patch.dict(os.environ, {
-            'BINANCE_API_SECRET': 'test_secret_key_123456789',
-            'BINANCE_API_KEY': 'test_api_key_123456789'
-        }):
-            import importlib
-            importlib.reload(main)
-            
+        with configured(main, binance_api_secret='test_secret_key_123456789',
+                        binance_api_key='test_api_key_123456789'):
             result = main.create_signed_url()
             
             assert "wss://api.binance.com/sapi/wss" in result
@@ -70,9 +70,81 @@ class TestBinanceAPI:
     
     def test_create_signed_url_missing_secret(self):
         """Test error when API secret is missing"""
-        with patch.dict(os.environ, {'BINANCE_API_SECRET': ''}, clear=True):
-            import importlib
-            importlib.reload(main)
-            
+        with configured(main, binance_api_secret=''):
             with pytest.raises(RuntimeError, match="BINANCE_API_SECRET missing"):
-                main.create_signed_url()
\ No newline at end of file
+                main.create_signed_url()
+
+class TestClockSync:
+    """Test the cached Binance clock offset"""
+
+    def test_sync_keeps_lowest_rtt_sample(self):
+        """Test that the offset comes from the fastest round trip"""
+        clock = main.ClockSync(samples=3)
+        with patch.object(clock, 'measure', side_effect=[(500.0, 80.0), (120.0, 10.0), (300.0, 40.0)]):
+            assert clock.sync() is True
+
+        assert clock.offset_ms == 120.0
+        assert clock.rtt_ms == 10.0
+
+    def test_sync_failure_keeps_previous_offset(self):
+        """Test that failed samples leave the cached offset alone"""
+        clock = main.ClockSync(samples=2)
+        clock.offset_ms = 42.0
+        with patch.object(clock, 'measure', side_effect=Exception("timeout")):
+            assert clock.sync() is False
+
+        assert clock.offset_ms == 42.0
+
+    @patch('main.requests.get')
+    @patch('main.time.time')
+    def test_measure_assumes_midpoint(self, mock_time, mock_get):
+        """Test offset estimation from one round trip"""
+        mock_time.side_effect = [1000.0, 1000.2]
+        mock_response = Mock()
+        mock_response.json.return_value = {"serverTime": 1000600}
+        mock_get.return_value = mock_response
+
+        offset, rtt = main.ClockSync().measure()
+
+        assert rtt == pytest.approx(200.0)
+        assert offset == pytest.approx(500.0)
+
+    def test_now_ms_applies_offset(self):
+        """Test that signing time is local time plus the offset"""
+        clock = main.ClockSync()
+        clock.offset_ms = 1500.0
+        with patch('main.time.time', return_value=100.0):
+            assert clock.now_ms() == 101500
+
+class TestPresignedUrl:
+    """Test pre-signing of reconnect URLs"""
+
+    def test_take_reuses_prepared_url(self):
+        """Test that a prepared URL is handed out and the next one prepared"""
+        with patch('main.create_signed_url', side_effect=["url1", "url2", "url3"]) as mock_sign:
+            presigned = main.PresignedUrl()
+            presigned.refresh()
+
+            assert presigned.take() == "url1"
+            assert presigned.url == "url2"
+            assert mock_sign.call_count == 2
+
+    def test_take_signs_when_prepared_url_expired(self):
+        """Test that an expired URL is never used"""
+        with patch('main.create_signed_url', side_effect=["old", "fresh", "next"]):
+            presigned = main.PresignedUrl()
+            presigned.refresh()
+            presigned.expires_at = 0.0
+
+            assert presigned.take() == "fresh"
+            assert presigned.url == "next"
+
+    def test_create_signed_url_does_not_call_server(self):
+        """Test that signing uses the cached clock instead of an HTTP call"""
+        with configured(main, binance_api_secret='test_secret_key_123456789'):
+            with patch('main.requests.get') as mock_get:
+                main.CLOCK.offset_ms = 0.0
+                url = main.create_signed_url()
+
+            mock_get.assert_not_called()
+            assert "signature=" in url
@@ -0,0 +1,123 @@
+import pytest
+import subprocess
+import sys
+import os
+from unittest.mock import patch
+
+# Add the main directory to the path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import main
+
+class TestConfig:
+    """Test parsing and validation of the environment into Config"""
+
+    def test_defaults(self):
+        """Test that an empty environment yields the documented defaults"""
+        config = main.Config.from_env({"HOSTNAME": "bot-0"})
+
+        assert config.topics == ("com_announcement_en",)
+        assert config.metrics_port == 9100
+        assert config.poll_enabled is True
+        assert config.poll_catalog_ids == (48,)
+        assert config.pod_name == "bot-0"
+        assert config.bot_token is None
+
+    def test_values_are_cast(self):
+        """Test that raw strings become typed values"""
+        config = main.Config.from_env({
+            "BINANCE_TOPICS": "com_announcement_en, com_announcement_zh",
+            "POLL_ENABLED": "0",
+            "POLL_CATALOG_IDS": "48,161",
+            "TELEGRAM_GLOBAL_RATE": "12.5",
+            "LOG_LEVEL": "debug",
+            "POD_NAME": "bot-1",
+        })
+
+        assert config.topics == ("com_announcement_en", "com_announcement_zh")
+        assert config.poll_enabled is False
+        assert config.poll_catalog_ids == (48, 161)
+        assert config.telegram_global_rate == 12.5
+        assert config.log_level == "DEBUG"
+        assert config.pod_name == "bot-1"
+
+    def test_all_problems_reported_together(self):
+        """Test that one error lists every bad setting"""
+        with pytest.raises(main.ConfigError) as excinfo:
+            main.Config.from_env({
+                "METRICS_PORT": "nine",
+                "TELEGRAM_WORKERS": "0",
+                "TELEGRAM_DROP_POLICY": "drop_all",
+                "BINANCE_WS_BASE": "https://api.binance.com",
+            })
+
+        message = str(excinfo.value)
+        assert "METRICS_PORT='nine' is not a valid int" in message
+        assert "TELEGRAM_WORKERS must be > 0" in message
+        assert "TELEGRAM_DROP_POLICY must be one of" in message
+        assert "BINANCE_WS_BASE must be a ws/wss URL" in message
+
+    def test_cross_field_checks(self):
+        """Test settings that are only invalid in combination"""
+        with pytest.raises(main.ConfigError) as excinfo:
+            main.Config.from_env({
+                "POLL_MIN_INTERVAL": "30",
+                "POLL_MAX_INTERVAL": "15",
+                "LEASE_BACKEND": "file",
+                "LEASE_DURATION": "1",
+                "LEASE_RENEW_INTERVAL": "2",
+            })
+
+        assert "POLL_MIN_INTERVAL must not exceed POLL_MAX_INTERVAL" in str(excinfo.value)
+        assert "LEASE_RENEW_INTERVAL must be shorter than LEASE_DURATION" in str(excinfo.value)
+
+    def test_env_file_is_overridden_by_environment(self, tmp_path, monkeypatch):
+        """Test that config.env supplies values the real environment does not set"""
+        env_file = tmp_path / "config.env"
+        env_file.write_text("TELEGRAM_BOT_TOKEN=from_file\nMETRICS_PORT=9200\n")
+        monkeypatch.delenv("TELEGRAM_BOT_TOKEN", raising=False)
+        monkeypatch.setenv("METRICS_PORT", "9300")
+
+        config = main.Config.from_env(env_file=str(env_file))
+
+        assert config.bot_token == "from_file"
+        assert config.metrics_port == 9300
+
+    def test_import_reads_no_environment(self):
+        """Test that importing main leaves settings at their defaults"""
+        code = "import main; print(main.CONFIG.metrics_port, main.CONFIG.bot_token)"
+        env = dict(os.environ, METRICS_PORT="9300", TELEGRAM_BOT_TOKEN="from_env")
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True)
+
+        assert result.stdout.split() == ["9100", "None"]
+
+    def test_configure_rebuilds_components(self, tmp_path):
+        """Test that configure installs the config and rebuilds what depends on it"""
+        chats = tmp_path / "chats.txt"
+        chats.write_text("2002\n")
+        config = main.Config.from_env({"TELEGRAM_CHAT_ID": "1001", "TELEGRAM_CHATS_FILE": str(chats),
+                                       "HISTORY_SIZE": "7", "DEDUP_DB_PATH": ""})
+        with patch.multiple(main, CONFIG=main.CONFIG, CHAT_IDS=main.CHAT_IDS, HISTORY=main.HISTORY,
+                            DEDUP=main.DEDUP, SYMBOLS=main.SYMBOLS, CLOCK=main.CLOCK, DIGEST=main.DIGEST,
+                            LEADER=main.LEADER, HANDLERS=main.HANDLERS, _sample_rates=main._sample_rates):
+            assert main.configure(config) is config
+            assert main.CONFIG is config
+            assert main.CHAT_IDS == ["1001", "2002"]
+            assert main.HISTORY.size == 7
+            assert main.DEDUP.path == ""
+            assert main.TelegramOutbox().queue.maxsize == config.telegram_queue_size
+
+    def test_heavy_modules_load_lazily(self):
+        """Test that importing main does not execute requests or websockets"""
+        # type() does not trigger a lazy module; any attribute access would
+        code = (
+            "import sys, main\n"
+            "print(type(sys.modules['requests']).__name__, type(sys.modules['websockets']).__name__,\n"
+            "      sorted(m for m in sys.modules if m.startswith(('urllib3', 'websockets.'))))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+
+        assert result.stdout.split() == ["_LazyModule", "_LazyModule", "[]"]
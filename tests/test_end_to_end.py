@@ -0,0 +1,191 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import functools
+import signal
+from unittest.mock import patch
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fakes import FakeBinanceServer, FakeTelegramServer, bot_overrides, listing
+
+@pytest_asyncio.fixture
+async def fake_servers():
+    """Start the local Binance and Telegram stand-ins"""
+    binance = await FakeBinanceServer(api_key="fake_key", api_secret="fake_secret").start()
+    telegram = await FakeTelegramServer().start()
+    yield binance, telegram
+    await binance.stop()
+    await telegram.stop()
+
+async def run_bot(binance, telegram, body, **outbox_kwargs):
+    """Run the real listen_announcements against the fakes while ``body`` runs"""
+    with patch.multiple(main, **bot_overrides(main, binance, telegram)):
+        main._outbox = main.TelegramOutbox(**outbox_kwargs)
+        main._outbox_loop = asyncio.get_running_loop()
+        task = asyncio.create_task(main.listen_announcements())
+        try:
+            await asyncio.wait_for(binance.subscribed.wait(), 5)
+            return await body()
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await main.stop_outbox(timeout=1)
+            await main.close_telegram_session()
+
+class TestEndToEnd:
+    """Drive the real bot against local fake servers"""
+
+    @pytest.mark.asyncio
+    async def test_listing_reaches_telegram(self, fake_servers):
+        """Test a listing frame flowing from the socket to sendMessage"""
+        binance, telegram = fake_servers
+
+        async def body():
+            await telegram.wait_for_messages(1)
+            await binance.push(listing(1, "EDEN"))
+            return await telegram.wait_for_messages(2)
+
+        messages = await run_bot(binance, telegram, body)
+
+        assert "connected successfully" in messages[0][1]
+        assert "Token: EDEN" in messages[1][1]
+        assert messages[1][0] == "1001"
+        assert binance.subscriptions == ["com_announcement_en"]
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_alert_is_retried(self, fake_servers):
+        """Test that a 429 from Telegram delays but does not lose the alert"""
+        binance, telegram = fake_servers
+        telegram.rate_limit_every = 2
+
+        async def body():
+            await telegram.wait_for_messages(1)
+            await binance.push(listing(2))
+            return await telegram.wait_for_messages(2)
+
+        messages = await run_bot(binance, telegram, body, chat_rate=100)
+
+        assert telegram.rate_limited == 1
+        assert "TK2" in messages[1][1]
+
+    @pytest.mark.asyncio
+    async def test_bad_signature_is_rejected(self, fake_servers):
+        """Test that the fake server verifies the HMAC signature"""
+        binance, telegram = fake_servers
+        binance.api_secret = "other_secret"
+        overrides = bot_overrides(main, binance, telegram, binance_api_secret="fake_secret")
+
+        with patch.multiple(main, **overrides):
+            task = asyncio.create_task(main.listen_announcements())
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert binance.rejected >= 1
+        assert not binance.subscriptions
+
+    @pytest.mark.asyncio
+    async def test_auth_failure_resigns_with_synced_clock(self, fake_servers):
+        """Test that the retry after a rejected signature uses the resynced offset"""
+        binance, telegram = fake_servers
+        binance.api_secret = "other_secret"
+        overrides = bot_overrides(main, binance, telegram, binance_api_secret="fake_secret")
+        overrides["CLOCK"] = clock = main.ClockSync()
+        overrides["ReconnectPolicy"] = functools.partial(main.ReconnectPolicy, auth_delay=0.01)
+
+        def sync():
+            clock.offset_ms = 3_600_000
+            return True
+
+        with patch.multiple(main, **overrides), patch.object(clock, "sync", sync):
+            task = asyncio.create_task(main.listen_announcements())
+            await asyncio.sleep(0.3)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        timestamps = [int(path.split("timestamp=")[1].split("&")[0]) for path in binance.paths]
+        assert len(timestamps) >= 2
+        assert timestamps[1] - timestamps[0] > 3_000_000
+
+    @pytest.mark.asyncio
+    async def test_failed_subscribe_is_not_live(self, fake_servers):
+        """Test that a rejected SUBSCRIBE neither counts as coverage nor announces itself"""
+        binance, telegram = fake_servers
+        binance.subscribe_result = "FAILED"
+
+        async def body():
+            await asyncio.sleep(0.1)
+            return main.METRICS.gauges.get("live_connections")
+
+        assert await run_bot(binance, telegram, body) == 0
+        assert telegram.messages == []
+
+    @pytest.mark.asyncio
+    async def test_half_open_connection_is_replaced(self, fake_servers):
+        """Test that an unanswered ping forces a reconnect and alerts resume"""
+        binance, telegram = fake_servers
+        keepalive = functools.partial(main.Keepalive, interval=0.05, pong_timeout=0.1)
+
+        async def body():
+            await telegram.wait_for_messages(1)
+            binance.stall()
+            binance.subscribed.clear()
+            await asyncio.wait_for(binance.subscribed.wait(), 2)
+            await binance.push(listing(3, "PONG"))
+            # The reconnect announces itself again before the alert
+            return await telegram.wait_for_messages(3)
+
+        with patch('main.Keepalive', keepalive):
+            messages = await run_bot(binance, telegram, body)
+
+        assert binance.connections == 2
+        assert any("Token: PONG" in text for _, text, _ in messages)
+
+    @pytest.mark.asyncio
+    async def test_sigterm_mid_burst_loses_nothing(self, fake_servers, tmp_path):
+        """Test that alerts pending at SIGTERM are flushed or spooled for the next instance"""
+        binance, telegram = fake_servers
+        telegram.delay = 0.02
+        spool = str(tmp_path / "outbox-spool.json")
+        burst = [listing(100 + i) for i in range(20)]
+        loop = asyncio.get_running_loop()
+
+        with patch.multiple(main, **bot_overrides(main, binance, telegram)):
+            main._outbox = main.TelegramOutbox(chat_rate=5)
+            main._outbox_loop = loop
+            shutdown = main.Shutdown(timeout=0.3)
+            shutdown.install()
+            try:
+                task = asyncio.create_task(main.listen_announcements(shutdown=shutdown))
+                await asyncio.wait_for(binance.subscribed.wait(), 5)
+                for data in burst:
+                    await binance.push(data)
+                await telegram.wait_for_messages(4)
+                os.kill(os.getpid(), signal.SIGTERM)
+                await asyncio.wait_for(task, 5)
+                await main.stop_outbox(shutdown.remaining(), spool)
+            finally:
+                shutdown.uninstall()
+            stopped_with = len(telegram.messages)
+
+            # The next instance picks up the spool
+            main._outbox = main.TelegramOutbox(chat_rate=1000)
+            main._outbox_loop = loop
+            try:
+                assert main._outbox.load(spool) > 0
+                main._outbox.start()
+                await main.stop_outbox(timeout=5)
+            finally:
+                await main.close_telegram_session()
+
+        texts = [text for _, text, _ in telegram.messages]
+        assert stopped_with < len(texts)
+        assert binance.close_codes == [1000]
+        assert not os.path.exists(spool)
+        for i in range(100, 120):
+            assert any(f"Token: TK{i}" in text for text in texts), f"TK{i} lost"
@@ -10,6 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
+from fakes import FakeWebSocket, RecordingPipeline, configured
 
 class TestWebSocketIntegration:
     """Integration tests for WebSocket functionality"""
@@ -17,16 +18,9 @@ class TestWebSocketIntegration:
     @pytest.mark.asyncio
     async def test_websocket_connection_flow(self):
         """Test the complete WebSocket connection and message flow"""
-        # Set up environment variables first
-        with patch.dict(os.environ, {
-            'BINANCE_API_KEY': 'test_api_key_123456789',
-            'BINANCE_API_SECRET': 'test_api_secret_123456789',
-            'TELEGRAM_BOT_TOKEN': '123456789:TEST_BOT_TOKEN',
-            'TELEGRAM_CHAT_ID': '123456789'
-        }):
-            import importlib
-            importlib.reload(main)
-            
+        # Point the bot at test credentials first
+        with configured(main, binance_api_key='test_api_key_123456789',
+                        binance_api_secret='test_api_secret_123456789', bot_token='123456789:TEST_BOT_TOKEN'):
             # Test that the function exists and can be called without errors
             # We'll mock at a higher level to avoid the actual WebSocket connection
             with patch('main.websockets.connect') as mock_connect:
@@ -47,78 +41,86 @@ class TestWebSocketIntegration:
                 # Verify that WebSocket connection was attempted
                 assert mock_connect.call_count >= 1
     
-    @patch('main.send_ping')
     @pytest.mark.asyncio
-    async def test_ping_mechanism(self, mock_send_ping_func):
-        """Test WebSocket ping functionality"""
-        mock_ws = AsyncMock()
-        
-        # Test the ping function directly
-        ping_task = asyncio.create_task(main.send_ping(mock_ws))
-        
-        # Let it run briefly then cancel
-        await asyncio.sleep(0.1)
-        ping_task.cancel()
-        
-        try:
-            await ping_task
-        except asyncio.CancelledError:
-            pass
-        
-        # In a real scenario, this would call ws.ping()
-        # Our test verifies the structure is correct
-    
-    @patch.dict(os.environ, {'BINANCE_API_KEY': ''}, clear=True)
+    async def test_ping_mechanism(self):
+        """Test that pongs are awaited and their round trip recorded"""
+        class Pinged:
+            transport = Mock()
+
+            async def ping(self):
+                pong = asyncio.get_running_loop().create_future()
+                asyncio.get_running_loop().call_later(0.01, pong.set_result, None)
+                return pong
+
+        metrics = main.Metrics()
+        with patch('main.METRICS', metrics):
+            keepalive = main.Keepalive(Pinged(), interval=0.02, pong_timeout=0.5)
+            task = asyncio.create_task(keepalive.run())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert metrics.histograms["pong_rtt_seconds"].count >= 2
+        assert keepalive.rtt >= 0.01
+        assert keepalive.dead is None
+
+    @pytest.mark.asyncio
+    async def test_missing_pong_aborts_connection(self):
+        """Test that a half-open socket is dropped within interval + pong_timeout"""
+        class HalfOpen:
+            transport = Mock()
+
+            async def ping(self):
+                return asyncio.get_running_loop().create_future()
+
+        ws = HalfOpen()
+        keepalive = main.Keepalive(ws, interval=0.02, pong_timeout=0.05)
+        await asyncio.wait_for(keepalive.run(), 1)
+
+        assert keepalive.dead == "pong_timeout"
+        ws.transport.abort.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_data_silence_aborts_connection(self):
+        """Test the optional bound on time without any frame"""
+        ws = Mock()
+        keepalive = main.Keepalive(ws, interval=10, silence_timeout=0.05)
+        await asyncio.wait_for(keepalive.run(), 1)
+
+        assert keepalive.dead == "silence"
+        ws.transport.abort.assert_called_once()
+
     @pytest.mark.asyncio
     async def test_missing_api_key_error(self):
         """Test error handling when API key is missing"""
-        import importlib
-        importlib.reload(main)
-        
-        with pytest.raises(RuntimeError, match="BINANCE_API_KEY missing"):
+        with configured(main, binance_api_key=''), \
+             pytest.raises(RuntimeError, match="BINANCE_API_KEY missing"):
             await main.listen_announcements()
 
 class TestEndToEndScenarios:
     """End-to-end integration test scenarios"""
     
     @pytest.mark.asyncio
-    async def test_complete_new_listing_flow(self):
+    async def test_complete_new_listing_flow(self, telegram_session_factory):
         """Test complete flow from WebSocket message to Telegram notification"""
-        # Set up environment variables
-        with patch.dict(os.environ, {
-            'BINANCE_API_KEY': 'test_api_key_123456789',
-            'BINANCE_API_SECRET': 'test_api_secret_123456789',
-            'TELEGRAM_BOT_TOKEN': '123456789:TEST_BOT_TOKEN',
-            'TELEGRAM_CHAT_ID': '123456789'
-        }):
-            import importlib
-            importlib.reload(main)
-            
-            # Test that the Telegram notification function works
-            with patch('main.requests.post') as mock_post:
-                mock_response = Mock()
-                mock_response.status_code = 200
-                mock_post.return_value = mock_response
-                
-                # Test the notification function directly
-                await main.notify_telegram("Test new listing alert")
+        with configured(main, bot_token='123456789:TEST_BOT_TOKEN'), patch('main.CHAT_IDS', ['123456789']):
+            # Queue an alert and let the outbox deliver it
+            session = telegram_session_factory(status=200)
+            with patch('main.get_telegram_session', AsyncMock(return_value=session)):
+                assert main.enqueue_telegram("Test new listing alert", coalesce=False)
+                await main.stop_outbox(timeout=1)
                 
                 # Verify Telegram was called
-                mock_post.assert_called_once()
-                call_args = mock_post.call_args
+                session.post.assert_called_once()
+                call_args = session.post.call_args
                 assert call_args[1]['data']['chat_id'] == '123456789'
                 assert 'Test new listing alert' in call_args[1]['data']['text']
     
     @pytest.mark.asyncio
     async def test_error_recovery_and_reconnection(self):
         """Test error handling and reconnection logic"""
-        with patch.dict(os.environ, {
-            'BINANCE_API_KEY': 'test_api_key_123456789',
-            'BINANCE_API_SECRET': 'test_api_secret_123456789'
-        }):
-            import importlib
-            importlib.reload(main)
-            
+        with configured(main, binance_api_key='test_api_key_123456789',
+                        binance_api_secret='test_api_secret_123456789'):
             # Test the create_signed_url function to ensure it works
             try:
                 url = main.create_signed_url()
@@ -143,4 +145,142 @@ class TestEndToEndScenarios:
                     pass  # Expected since we're simulating connection failures
                 
                 # Should have attempted connection at least once
-                assert mock_connect.call_count >= 1
\ No newline at end of file
+                assert mock_connect.call_count >= 1
+
+class TestRedundantConnections:
+    """Test hot-standby connections with first-arrival dedup"""
+
+    @pytest.mark.asyncio
+    async def test_late_ack_does_not_mark_dropped_socket_live(self, sample_websocket_messages):
+        """Test that a SUBSCRIBE ack decoded after its socket closed is ignored"""
+        ack = json.dumps(sample_websocket_messages["subscribe_success"])
+        sockets = [FakeWebSocket([ack], hold=False), FakeWebSocket([])]
+        pipeline = RecordingPipeline()
+        live = main.LiveConnections()
+
+        with patch('main.websockets.connect', side_effect=sockets):
+            task = asyncio.create_task(main.run_connection(0, "key", "secret", pipeline, live))
+            await asyncio.sleep(0.05)
+            # The decode worker only now gets to the first socket's ack
+            raw, on_command = pipeline.frames[0]
+            notify = on_command(json.loads(raw))
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert notify is False
+        assert not live
+
+    def test_binance_credentials_parsing(self):
+        """Test that extra key pairs are appended after the primary one"""
+        with configured(main, binance_api_key='key1', binance_api_secret='secret1',
+                        binance_extra_credentials='key2:secret2, broken, key3:secret3'):
+            assert main.binance_credentials() == [("key1", "secret1"), ("key2", "secret2"), ("key3", "secret3")]
+
+    def test_first_arrival_filter_is_bounded(self):
+        """Test that duplicates are dropped and old keys evicted"""
+        arrivals = main.FirstArrivalFilter(maxsize=2)
+
+        assert arrivals.first("a") is True
+        assert arrivals.first("a") is False
+        arrivals.first("b")
+        arrivals.first("c")
+        assert arrivals.first("a") is True
+        assert arrivals.duplicates == 1
+
+    @pytest.mark.asyncio
+    async def test_announcement_processed_once_across_connections(self, sample_websocket_messages):
+        """Test that the same frame from two sockets triggers one alert"""
+        frames = [
+            json.dumps(sample_websocket_messages["subscribe_success"]),
+            json.dumps(sample_websocket_messages["new_listing_announcement"]),
+        ]
+        sockets = []
+
+        def connect(*args, **kwargs):
+            ws = FakeWebSocket(frames)
+            sockets.append(ws)
+            return ws
+
+        with configured(main, binance_api_key='test_api_key_123456789',
+                        binance_api_secret='test_api_secret_123456789'), \
+             patch('main.websockets.connect', side_effect=connect), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            task = asyncio.create_task(main.listen_announcements(connections=2))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        assert len(sockets) == 2
+        alerts = [c.args[0] for c in mock_enqueue.call_args_list if "NEW LISTING" in c.args[0]]
+        connected = [c.args[0] for c in mock_enqueue.call_args_list if "connected" in c.args[0]]
+        assert len(alerts) == 1
+        assert len(connected) == 1
+
+class TestReconnectPolicy:
+    """Test the adaptive reconnect scheduler"""
+
+    def test_clean_close_reconnects_immediately(self):
+        """Test that the first clean close has no delay"""
+        policy = main.ReconnectPolicy(base_delay=1, max_delay=8)
+
+        assert policy.next_delay("clean") == 0.0
+        assert policy.next_delay("clean") > 0.0
+
+    def test_repeated_errors_back_off_with_cap(self):
+        """Test exponential growth with jitter, capped at max_delay"""
+        policy = main.ReconnectPolicy(base_delay=1, max_delay=8)
+        delays = [policy.next_delay("error") for _ in range(6)]
+
+        for attempt, delay in enumerate(delays[:4]):
+            assert 2 ** attempt / 2 <= delay <= 2 ** attempt
+        assert all(4 <= d <= 8 for d in delays[4:])
+
+    def test_long_outage_does_not_overflow(self):
+        """Test that thousands of failures in a row stay at max_delay"""
+        policy = main.ReconnectPolicy(base_delay=1, max_delay=8)
+        policy.failures = 5000
+
+        assert 4 <= policy.next_delay("error") <= 8
+
+    def test_dead_connection_reconnects_immediately(self):
+        """Test that a keepalive failure skips the backoff once"""
+        policy = main.ReconnectPolicy(base_delay=1.0, max_delay=10.0)
+
+        assert policy.next_delay("dead") == 0.0
+        assert policy.next_delay("dead") > 0.0
+
+    def test_auth_errors_use_longer_delay(self):
+        """Test that auth failures start from the auth delay"""
+        policy = main.ReconnectPolicy(base_delay=0.5, max_delay=10, auth_delay=30)
+
+        assert 15 <= policy.next_delay("auth") <= 30
+
+    def test_mark_connected_records_recovery_time(self):
+        """Test that a successful subscribe resets the streak"""
+        policy = main.ReconnectPolicy()
+        assert policy.mark_connected() is None
+
+        policy.next_delay("error")
+        policy.next_delay("error")
+        elapsed = policy.mark_connected()
+
+        assert elapsed is not None and elapsed >= 0
+        assert policy.failures == 0
+        assert list(policy.reconnect_times) == [elapsed]
+        assert policy.next_delay("clean") == 0.0
+
+    def test_classify_disconnect(self):
+        """Test sorting of disconnect reasons"""
+        from websockets.frames import Close
+
+        clean = websockets.exceptions.ConnectionClosedOK(Close(1000, ""), Close(1000, ""))
+        dropped = websockets.exceptions.ConnectionClosedError(None, None)
+
+        assert main.classify_disconnect(None) == "clean"
+        assert main.classify_disconnect(clean) == "clean"
+        assert main.classify_disconnect(dropped) == "error"
+        assert main.classify_disconnect(websockets.exceptions.InvalidStatusCode(401, None)) == "auth"
+        assert main.classify_disconnect(Exception("Signature for this request is not valid")) == "auth"
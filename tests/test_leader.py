@@ -0,0 +1,228 @@
+import pytest
+import asyncio
+import time
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+class TestLeaseBackends:
+    """Test lease acquisition, renewal and expiry"""
+
+    @pytest.mark.asyncio
+    async def test_memory_lease_single_holder(self):
+        """Test that only one identity holds an unexpired lease"""
+        lease = main.MemoryLease()
+
+        assert await lease.try_acquire("a", 1.0, []) == (True, [])
+        assert await lease.try_acquire("b", 1.0, []) == (False, [])
+        assert await lease.try_acquire("a", 1.0, ["x"]) == (True, [])
+
+    @pytest.mark.asyncio
+    async def test_memory_lease_takeover_after_expiry(self):
+        """Test that a successor gets the previous holder's delivered ids"""
+        lease = main.MemoryLease()
+        await lease.try_acquire("a", 0.05, ["1", "2"])
+        # b starts timing the lease when it first sees it
+        assert await lease.try_acquire("b", 0.05, []) == (False, [])
+        await asyncio.sleep(0.06)
+
+        assert await lease.try_acquire("b", 0.05, []) == (True, ["1", "2"])
+
+    @pytest.mark.asyncio
+    async def test_expiry_ignores_holder_clock(self, tmp_path):
+        """Test that a holder with a skewed clock cannot keep or lose the lease early"""
+        path = str(tmp_path / "lease.json")
+        first, second = main.FileLease(path), main.FileLease(path)
+        with patch('main.time.time', return_value=time.time() + 3600):
+            assert (await first.try_acquire("a", 0.05, []))[0] is True
+
+        assert (await second.try_acquire("b", 0.05, []))[0] is False
+        await asyncio.sleep(0.06)
+        assert (await second.try_acquire("b", 0.05, []))[0] is True
+
+    @pytest.mark.asyncio
+    async def test_renewals_keep_lease(self):
+        """Test that a renewing holder is not expired by a watching standby"""
+        lease = main.MemoryLease()
+        for _ in range(3):
+            assert (await lease.try_acquire("a", 0.05, []))[0] is True
+            assert (await lease.try_acquire("b", 0.05, []))[0] is False
+            await asyncio.sleep(0.03)
+
+    @pytest.mark.asyncio
+    async def test_file_lease_shared_between_instances(self, tmp_path):
+        """Test that two replicas sharing a lease file exclude each other"""
+        path = str(tmp_path / "lease.json")
+        first, second = main.FileLease(path), main.FileLease(path)
+
+        assert (await first.try_acquire("a", 1.0, ["1"]))[0] is True
+        assert (await second.try_acquire("b", 1.0, []))[0] is False
+
+        await first.release("a", ["1"])
+        assert await second.try_acquire("b", 1.0, []) == (True, ["1"])
+
+    def test_unknown_backend_rejected(self):
+        """Test that a misspelled backend fails loudly"""
+        assert main.make_lease_backend("none") is None
+        with pytest.raises(ValueError):
+            main.make_lease_backend("zookeeper")
+
+class TestLeaderElector:
+    """Test that only the leader delivers and standbys replay on takeover"""
+
+    def test_without_backend_always_leader(self):
+        """Test that a single replica sends everything"""
+        elector = main.LeaderElector()
+        assert elector.should_send("text", None, "1") is True
+
+    @pytest.mark.asyncio
+    async def test_only_leader_sends(self):
+        """Test that a standby buffers instead of sending"""
+        lease = main.MemoryLease()
+        leader = main.LeaderElector(lease, identity="a")
+        standby = main.LeaderElector(lease, identity="b")
+
+        assert await leader.step() is True
+        assert await standby.step() is False
+        assert leader.should_send("alert", None, "1") is True
+        assert standby.should_send("alert", None, "1") is False
+        assert list(standby.standby)[0][0] == "1"
+
+    @pytest.mark.asyncio
+    async def test_takeover_replays_only_undelivered(self):
+        """Test that the new leader sends what the dead leader missed, once"""
+        lease = main.MemoryLease()
+        leader = main.LeaderElector(lease, identity="a", duration=0.05)
+        standby = main.LeaderElector(lease, identity="b", duration=0.05)
+        await leader.step()
+        await standby.step()
+
+        for alert_id in ("1", "2"):
+            standby.should_send(f"alert {alert_id}", None, alert_id)
+        assert leader.should_send("alert 1", None, "1") and leader.should_send("alert 2", None, "2")
+        leader.record_delivered(["1"])
+        await leader.step()
+        assert await standby.step() is False
+        # Leader dies before Telegram acknowledges alert 2; its lease expires
+        await asyncio.sleep(0.06)
+
+        enqueue = Mock(return_value=True)
+        with patch('main.enqueue_telegram', enqueue):
+            assert await standby.step() is True
+
+        enqueue.assert_called_once_with("alert 2", None, "2")
+        assert not standby.standby
+
+    @pytest.mark.asyncio
+    async def test_only_acknowledged_alerts_are_published(self):
+        """Test that alert ids reach the lease only after Telegram accepted them"""
+        async def sender(chat_id, text):
+            return (200, None) if text == "ok" else (400, None)
+
+        elector = main.LeaderElector(main.MemoryLease(), identity="a")
+        outbox = main.TelegramOutbox(sender=sender, global_rate=1000, chat_rate=1000)
+        with patch('main.LEADER', elector):
+            outbox.enqueue("1", "ok", alert_ids=("1",))
+            outbox.enqueue("1", "rejected", alert_ids=("2",))
+            assert list(elector.delivered) == []
+            outbox.start()
+            await outbox.drain(2)
+            await outbox.stop()
+
+        assert list(elector.delivered) == ["1"]
+
+    @pytest.mark.asyncio
+    async def test_backend_errors_demote_leader(self):
+        """Test that a leader which cannot renew stops sending"""
+        lease = main.MemoryLease()
+        elector = main.LeaderElector(lease, identity="a")
+        await elector.step()
+
+        with patch.object(lease, 'try_acquire', side_effect=OSError("api down")):
+            assert await elector.step() is False
+        assert elector.should_send("alert", None, "1") is False
+
+    @pytest.mark.asyncio
+    async def test_run_releases_lease_on_cancel(self):
+        """Test that a shut-down leader hands over without waiting for expiry"""
+        lease = main.MemoryLease()
+        elector = main.LeaderElector(lease, identity="a", duration=60, renew_interval=0.01)
+        task = asyncio.create_task(elector.run())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert (await lease.try_acquire("b", 1.0, []))[0] is True
+
+    @pytest.mark.asyncio
+    async def test_release_publishes_last_deliveries(self):
+        """Test that ids delivered after the last renewal reach the successor"""
+        lease = main.MemoryLease()
+        elector = main.LeaderElector(lease, identity="a", duration=60, renew_interval=60)
+        task = asyncio.create_task(elector.run())
+        await asyncio.sleep(0.01)
+        # Acknowledged while the outbox drains during shutdown
+        elector.record_delivered(["1"])
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert await lease.try_acquire("b", 60, []) == (True, ["1"])
+
+    def test_stale_standby_entries_not_replayed(self):
+        """Test that alerts older than the replay window are dropped"""
+        elector = main.LeaderElector(main.MemoryLease(), identity="b", replay_window=10)
+        elector.standby.append(("old", "old alert", None, time.time() - 60))
+
+        with patch('main.enqueue_telegram') as enqueue:
+            elector._take_over([])
+
+        enqueue.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_restarted_standby_does_not_resend_spool(self, tmp_path):
+        """Test that a replica restarting as standby replays its spool only after taking over"""
+        lease = main.MemoryLease()
+        spool = str(tmp_path / "spool.json")
+        a = main.LeaderElector(lease, identity="a", duration=60)
+        b = main.LeaderElector(lease, identity="b", duration=60)
+        await a.step()
+        await b.step()
+
+        # a accepts alerts 1 and 2 but shuts down before Telegram acknowledges them;
+        # b only saw alert 1
+        stopping = main.TelegramOutbox()
+        stopping.enqueue("1001", "alert 1", alert_ids=("1",))
+        stopping.enqueue("1001", "alert 2", alert_ids=("2",))
+        stopping.save(spool)
+        b.should_send("alert 1", None, "1")
+        await lease.release("a", list(a.delivered))
+
+        with patch('main.enqueue_telegram') as enqueue:
+            assert await b.step() is True
+        enqueue.assert_called_once_with("alert 1", None, "1")
+        b.record_delivered(["1"])
+        await b.step()
+
+        # a restarts as a standby and must not send its spool yet
+        restarted = main.LeaderElector(lease, identity="a", duration=60)
+        outbox = main.TelegramOutbox()
+        with patch('main.get_outbox', return_value=outbox):
+            restarted.restore(spool)
+            assert await restarted.step() is False
+            assert outbox.queue.qsize() == 0
+            assert os.path.exists(spool)
+
+            # b goes away; a takes over and sends only what b never delivered
+            await lease.release("b", list(b.delivered))
+            assert await restarted.step() is True
+
+        assert [outbox.queue.get_nowait()[1][:2] for _ in range(outbox.queue.qsize())] == [
+            (("1001",), "alert 2"),
+        ]
+        assert not os.path.exists(spool)
@@ -0,0 +1,74 @@
+import pytest
+import io
+import json
+import logging
+from unittest.mock import patch
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fakes import configured
+
+@pytest.fixture
+def log_stream():
+    """Route the bot logger into a buffer for the duration of a test"""
+    stream = io.StringIO()
+    main.setup_logging("DEBUG", stream)
+    yield stream
+    main.stop_logging()
+    main.logger.handlers = []
+    main.logger.setLevel(logging.NOTSET)
+
+def read_lines(stream):
+    main.stop_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class TestStructuredLogging:
+    """Test the JSON-lines logging subsystem"""
+
+    def test_events_are_json_lines(self, log_stream):
+        """Test that events carry their structured fields"""
+        main.log(logging.INFO, "reconnected", conn=1, seconds=0.25)
+
+        lines = read_lines(log_stream)
+
+        assert lines[0]["event"] == "reconnected"
+        assert lines[0]["level"] == "INFO"
+        assert lines[0]["conn"] == 1
+        assert lines[0]["seconds"] == 0.25
+
+    def test_secrets_are_redacted(self, log_stream):
+        """Test that credentials and signatures never reach the output"""
+        with configured(main, binance_api_secret='supersecretvalue'):
+            main.log(logging.INFO, "debug_dump",
+                     url="wss://x?timestamp=1&signature=abc123",
+                     note="secret is supersecretvalue",
+                     payload={"api_secret": "anything", "title": "ok"})
+            lines = read_lines(log_stream)
+
+        assert "abc123" not in lines[0]["url"]
+        assert "supersecretvalue" not in lines[0]["note"]
+        assert lines[0]["payload"] == {"api_secret": main.REDACTED, "title": "ok"}
+
+    def test_sampled_events(self, log_stream):
+        """Test per-event sampling rates"""
+        with patch.dict(main._sample_rates, {"frame_received": 0.0, "ping_sent": 1.0}):
+            for _ in range(20):
+                main.log(logging.DEBUG, "frame_received", frame="{}")
+            main.log(logging.DEBUG, "ping_sent")
+
+        assert [line["event"] for line in read_lines(log_stream)] == ["ping_sent"]
+
+    def test_disabled_level_is_skipped(self, log_stream):
+        """Test that records below the configured level are not queued"""
+        main.logger.setLevel(logging.INFO)
+        with patch.object(main.logger, 'log') as mock_log:
+            main.log(logging.DEBUG, "frame_received", frame="{}")
+            mock_log.assert_not_called()
+
+    def test_parse_sample_rates(self):
+        """Test the LOG_SAMPLE_RATES format"""
+        assert main._parse_pairs("a=0.5, b=1,broken") == {"a": 0.5, "b": 1.0}
@@ -1,6 +1,8 @@
 import pytest
 import asyncio
+import time
 import json
+import sqlite3
 import re
 from unittest.mock import Mock, patch, AsyncMock, MagicMock
 import sys
@@ -69,12 +71,12 @@ class TestWebSocketMessageHandling:
             "code": "00000000"
         }
         
-        with patch('main.notify_telegram') as mock_notify:
+        with patch('main.enqueue_telegram') as mock_notify:
             # Simulate the message processing logic
             if (message.get("type") == "COMMAND" and 
                 message.get("data") == "SUCCESS" and 
                 message.get("subType") == "SUBSCRIBE"):
-                await main.notify_telegram("Bot connected successfully to Binance announcements!")
+                main.enqueue_telegram("Bot connected successfully to Binance announcements!")
             
             mock_notify.assert_called_once_with("Bot connected successfully to Binance announcements!")
     
@@ -95,7 +97,7 @@ class TestWebSocketMessageHandling:
             "data": json.dumps(announcement_data)
         }
         
-        with patch('main.notify_telegram') as mock_notify:
+        with patch('main.enqueue_telegram') as mock_notify:
             # Simulate the message processing logic from main.py
             if "data" in message:
                 if isinstance(message["data"], str):
@@ -117,7 +119,7 @@ class TestWebSocketMessageHandling:
                     token_symbol = token_match.group(1) if token_match else "Unknown"
                     
                     text = f"NEW LISTING ALERT! \nToken: {token_symbol}\n {title}\n\nCheck Binance now!"
-                    await main.notify_telegram(text)
+                    main.enqueue_telegram(text)
             
             mock_notify.assert_called_once()
             call_args = mock_notify.call_args[0][0]
@@ -156,7 +158,7 @@ class TestWebSocketMessageHandling:
             "data": json.dumps(announcement_data)
         }
         
-        with patch('main.notify_telegram') as mock_notify:
+        with patch('main.enqueue_telegram') as mock_notify:
             # Simulate the message processing logic
             if "data" in message:
                 data_parsed = json.loads(message["data"])
@@ -170,6 +172,439 @@ class TestWebSocketMessageHandling:
                 keywords = ["will list", "new listing", "trading pair", "binance will list", "will add", "binance will add"]
                 
                 if any(k in full_text for k in keywords):
-                    await main.notify_telegram("Should not be called")
+                    main.enqueue_telegram("Should not be called")
             
-            mock_notify.assert_not_called()
\ No newline at end of file
+            mock_notify.assert_not_called()
+
+class TestAnnouncementClassifier:
+    """Test the compiled announcement rules engine"""
+
+    def test_default_rules_match_listing_keywords(self, sample_websocket_messages):
+        """Test that the default rules keep the legacy keyword behavior"""
+        classifier = main.AnnouncementClassifier(main.DEFAULT_ANNOUNCEMENT_RULES)
+        listing = json.loads(sample_websocket_messages["new_listing_announcement"]["data"])
+        regular = json.loads(sample_websocket_messages["regular_announcement"]["data"])
+
+        assert classifier.classify(dict(listing, catalogId=1)) == "listing_keywords"
+        assert classifier.classify(regular) is None
+
+    def test_catalog_fast_path(self):
+        """Test that catalog-only rules match without any text"""
+        classifier = main.AnnouncementClassifier(main.DEFAULT_ANNOUNCEMENT_RULES)
+
+        assert classifier.classify({"catalogId": 48}) == "new_listing_catalog"
+        assert 48 in classifier.by_catalog
+
+    def test_rules_keep_declared_order(self):
+        """Test that a text rule declared before a catalog-only rule wins"""
+        classifier = main.AnnouncementClassifier([
+            {"name": "delisting", "fields": ["title"], "include": ["delist"]},
+            {"name": "new_listing_catalog", "catalog_ids": [48]},
+            {"name": "futures", "fields": ["title"], "include": ["futures"]},
+        ])
+
+        assert classifier.classify({"catalogId": 48, "title": "Binance Will Delist XYZ"}) == "delisting"
+        assert classifier.classify({"catalogId": 48, "title": "Binance Futures Will List XYZ"}) == "new_listing_catalog"
+        assert classifier.classify({"catalogId": 49, "title": "Binance Futures Will List XYZ"}) == "futures"
+
+    def test_include_exclude_and_fields(self):
+        """Test per-field include and exclude terms"""
+        classifier = main.AnnouncementClassifier([
+            {"name": "futures", "fields": ["title"], "include": ["Perpetual"], "exclude": ["delist"]},
+        ])
+
+        assert classifier.classify({"title": "Binance Futures Will Launch USDⓈ-M XYZ PERPETUAL"}) == "futures"
+        assert classifier.classify({"title": "Binance Futures Will Delist XYZ Perpetual"}) is None
+        assert classifier.classify({"title": "Notice", "body": "perpetual contract"}) is None
+
+    def test_catalog_filter_combined_with_terms(self):
+        """Test that a rule with catalog ids and terms needs both to match"""
+        classifier = main.AnnouncementClassifier([
+            {"name": "futures_listing", "catalog_ids": [48], "include": ["futures"]},
+        ])
+
+        assert classifier.classify({"catalogId": 48, "title": "Futures launch"}) == "futures_listing"
+        assert classifier.classify({"catalogId": 49, "title": "Futures launch"}) is None
+        assert classifier.classify({"catalogId": 48, "title": "Spot listing"}) is None
+
+    def test_rules_from_file(self, tmp_path):
+        """Test loading rules from a JSON config file"""
+        rules_file = tmp_path / "rules.json"
+        rules_file.write_text(json.dumps([{"name": "airdrop", "include": ["airdrop"]}]))
+
+        classifier = main.AnnouncementClassifier.from_file(str(rules_file))
+
+        assert classifier.classify({"title": "HODLer Airdrops: XYZ"}) == "airdrop"
+
+    def test_compiled_term_matchers(self):
+        """Test both the substring and the combined regex matchers"""
+        small = main._compile_terms(["Will List", "binance will list"])
+        assert small("binance will list abc")
+        assert not small("will add")
+
+        many = [f"term{i} x" for i in range(main.TRIE_REGEX_MIN_TERMS + 4)]
+        large = main._compile_terms(many)
+        assert all(large(f"prefix {t} suffix") for t in many)
+        assert not large("term x")
+        assert main._compile_terms([]) is None
+
+class TestAnnouncementDedup:
+    """Test the persistent announcement dedup cache"""
+
+    def test_announcement_id_is_stable(self, sample_announcement_data):
+        """Test that identity ignores fields outside catalog and title"""
+        changed_body = dict(sample_announcement_data, body="edited")
+        changed_title = dict(sample_announcement_data, title="Other")
+        # The REST listing's releaseDate need not match the stream's publishDate
+        rest_copy = dict(sample_announcement_data, publishDate=sample_announcement_data["publishDate"] + 1500)
+
+        assert main.announcement_id(sample_announcement_data) == main.announcement_id(changed_body)
+        assert main.announcement_id(sample_announcement_data) == main.announcement_id(rest_copy)
+        assert main.announcement_id(sample_announcement_data) != main.announcement_id(changed_title)
+
+    def test_check_and_add_with_lru_eviction(self):
+        """Test duplicate detection and bounded size in memory"""
+        dedup = main.AnnouncementDedup(path="", maxsize=2)
+
+        assert dedup.check_and_add("a") is True
+        assert dedup.check_and_add("a") is False
+        dedup.check_and_add("b")
+        dedup.check_and_add("c")
+        assert len(dedup.entries) == 2
+        assert dedup.check_and_add("a") is True
+        # Nothing to flush to, so nothing is buffered for it either
+        assert dedup.pending == []
+
+    def test_expired_entries_are_new_again(self):
+        """Test that ids older than the TTL are alerted again"""
+        dedup = main.AnnouncementDedup(path="", ttl=60)
+        dedup.check_and_add("a")
+        dedup.entries["a"] -= 120
+
+        assert dedup.check_and_add("a") is True
+
+    def test_state_survives_restart(self, tmp_path):
+        """Test that flushed ids are reloaded by a new instance"""
+        path = str(tmp_path / "dedup.sqlite3")
+        first = main.AnnouncementDedup(path=path)
+        first.load()
+        first.check_and_add("a", 1759228202.5)
+        first.check_and_add("b")
+        assert first.flush() == 2
+        first.close()
+
+        second = main.AnnouncementDedup(path=path)
+        assert second.load() == 2
+        assert second.newest() == 1759228202.5
+        assert second.check_and_add("a") is False
+        assert second.check_and_add("c") is True
+        second.close()
+
+    def test_old_database_is_upgraded(self, tmp_path):
+        """Test that a database without publish times still loads"""
+        path = str(tmp_path / "dedup.sqlite3")
+        db = sqlite3.connect(path)
+        db.execute("CREATE TABLE seen (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")
+        db.execute("INSERT INTO seen VALUES ('a', ?)", (time.time(),))
+        db.commit()
+        db.close()
+
+        dedup = main.AnnouncementDedup(path=path)
+        assert dedup.load() == 1
+        assert dedup.newest() is None
+        dedup.check_and_add("b", 1759228202.5)
+        assert dedup.flush() == 1
+        dedup.close()
+
+    @pytest.mark.asyncio
+    async def test_handle_message_skips_duplicates(self, sample_websocket_messages):
+        """Test that a resent announcement is not alerted twice"""
+        msg = sample_websocket_messages["new_listing_announcement"]
+        with patch('main.DEDUP', main.AnnouncementDedup(path="")), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            await main.handle_message(msg)
+            await main.handle_message(msg)
+
+        assert mock_enqueue.call_count == 1
+
+class TestFrameDecoding:
+    """Test lazy two-level frame decoding"""
+
+    def test_envelope_keeps_payload_encoded(self, sample_websocket_messages):
+        """Test that decode_frame does not parse the inner payload"""
+        raw = json.dumps(sample_websocket_messages["new_listing_announcement"])
+
+        msg = main.decode_frame(raw)
+
+        assert isinstance(msg["data"], str)
+        payload = main.decode_payload(msg)
+        assert payload["catalogId"] == 48
+        assert main.decode_payload(msg) is payload
+
+    def test_invalid_payload_raises_value_error(self):
+        """Test that both decoders report bad payloads as ValueError"""
+        for name in ["json"] + (["orjson"] if main.orjson is not None else []):
+            with patch('main.json_decode', main.get_json_decoder(name)):
+                with pytest.raises(ValueError):
+                    main.decode_payload({"data": "not json"})
+
+    def test_decoder_selection(self):
+        """Test explicit and automatic decoder choice"""
+        assert main.get_json_decoder("json") is json.loads
+        if main.orjson is not None:
+            assert main.get_json_decoder("auto") is main.orjson.loads
+        else:
+            assert main.get_json_decoder("auto") is json.loads
+            with pytest.raises(RuntimeError):
+                main.get_json_decoder("orjson")
+
+    @pytest.mark.asyncio
+    async def test_other_topic_is_not_decoded(self):
+        """Test that frames for other topics skip the payload parse"""
+        msg = {"type": "DATA", "topic": "com_announcement_fr", "data": "{\"title\": \"x\"}"}
+
+        with patch('main.decode_payload') as mock_decode:
+            await main.handle_message(msg)
+
+        mock_decode.assert_not_called()
+
+class TestTopicDispatch:
+    """Test multi-topic subscriptions and the dispatch table"""
+
+    def test_dispatch_table_per_topic_config(self, tmp_path):
+        """Test that each topic gets its own classifier and template"""
+        config_file = tmp_path / "topics.json"
+        config_file.write_text(json.dumps({
+            "com_announcement_fr": {
+                "rules": [{"name": "fr_listing", "include": ["va lister"]}],
+                "template": "[{topic}] {token}: {title}",
+            }
+        }))
+
+        table = main.build_dispatch_table(["com_announcement_en", "com_announcement_fr"], str(config_file))
+
+        assert table[(None, "COMMAND")] is main.handle_command
+        en = table[("com_announcement_en", "DATA")]
+        fr = table[("com_announcement_fr", "DATA")]
+        assert en.template == main.DEFAULT_ALERT_TEMPLATE
+        assert fr.classifier.classify({"title": "Binance va lister ABC (ABC)"}) == "fr_listing"
+        assert fr.render({"title": "Binance va lister ABC (ABC)"}, "fr_listing")[1] == \
+            "[com_announcement_fr] ABC: Binance va lister ABC (ABC)"
+
+    def test_default_template_matches_legacy_alert(self):
+        """Test that the default template renders the original alert text"""
+        handler = main.TopicHandler("com_announcement_en", main.AnnouncementClassifier([]))
+        token, text = handler.render({"title": "Binance Will List TestCoin (TEST)"}, "rule")
+
+        assert token == "TEST"
+        assert text == "NEW LISTING ALERT! \nToken: TEST\n Binance Will List TestCoin (TEST)\n\nCheck Binance now!"
+
+    @pytest.mark.asyncio
+    async def test_frames_routed_by_topic(self):
+        """Test that frames reach the handler registered for their topic"""
+        en = AsyncMock()
+        fr = AsyncMock()
+        table = {("com_announcement_en", "DATA"): en, ("com_announcement_fr", "DATA"): fr}
+
+        with patch('main.HANDLERS', table):
+            await main.handle_message({"type": "DATA", "topic": "com_announcement_fr", "data": "{}"})
+            await main.handle_message({"result": None, "id": 1})
+
+        fr.assert_awaited_once()
+        en.assert_not_awaited()
+
+    def test_combined_subscription(self):
+        """Test that several topics share one signed URL and subscribe value"""
+        config = main.Config.from_env({
+            'BINANCE_TOPICS': 'com_announcement_en, com_announcement_fr',
+            'BINANCE_API_SECRET': 'test_secret_key_123456789',
+        })
+        with patch('main.CONFIG', config):
+            assert config.subscription == "com_announcement_en|com_announcement_fr"
+            assert "topic=com_announcement_en|com_announcement_fr" in main.create_signed_url()
+            assert ("com_announcement_fr", "DATA") in main.build_dispatch_table()
+
+class TestPipeline:
+    """Test the staged receive -> decode -> classify -> render pipeline"""
+
+    @pytest.mark.asyncio
+    async def test_frames_flow_through_stages(self, sample_websocket_messages):
+        """Test that a listing frame is rendered once and timed per stage"""
+        raw = json.dumps(sample_websocket_messages["new_listing_announcement"])
+        metrics = main.Metrics()
+        with patch('main.METRICS', metrics), \
+             patch('main.DEDUP', main.AnnouncementDedup(path="")), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            pipeline = main.Pipeline().start()
+            try:
+                await pipeline.submit(raw, 0.0)
+                await pipeline.submit(raw, 0.0)
+                await pipeline.join()
+            finally:
+                await pipeline.stop()
+
+        assert mock_enqueue.call_count == 1
+        assert "Token: TEST" in mock_enqueue.call_args[0][0]
+        for stage in main.Pipeline.STAGES:
+            assert metrics.histograms[f"stage_{stage}_seconds"].count >= 1
+
+    @pytest.mark.asyncio
+    async def test_command_frames_use_connection_callback(self, sample_websocket_messages):
+        """Test that subscribe acks go back to the owning connection"""
+        raw = json.dumps(sample_websocket_messages["subscribe_success"])
+        on_command = Mock(return_value=False)
+        with patch('main.enqueue_telegram') as mock_enqueue:
+            pipeline = main.Pipeline().start()
+            try:
+                await pipeline.submit(raw, 0.0, on_command)
+                await pipeline.join()
+            finally:
+                await pipeline.stop()
+
+        on_command.assert_called_once()
+        mock_enqueue.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_applies_backpressure(self):
+        """Test that submit waits once the decode queue is full"""
+        pipeline = main.Pipeline(queue_size=2)
+        await pipeline.submit("{}", 0.0)
+        await pipeline.submit("{}", 0.0)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.submit("{}", 0.0), 0.05)
+
+        pipeline.start()
+        try:
+            await asyncio.wait_for(pipeline.submit("{}", 0.0), 1)
+            await pipeline.join()
+        finally:
+            await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_unmatched_announcement_goes_to_digest(self):
+        """Test that announcements matching no rule are held for the digest"""
+        other = {"catalogId": 49, "title": "Notice on Scheduled Maintenance", "body": "", "publishDate": 1}
+        raw = json.dumps({"type": "DATA", "topic": "com_announcement_en", "data": json.dumps(other)})
+        digest = main.AnnouncementDigest(interval=60)
+        with patch('main.DIGEST', digest), \
+             patch('main.DEDUP', main.AnnouncementDedup(path="")), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            pipeline = main.Pipeline().start()
+            try:
+                await pipeline.submit(raw, 0.0)
+                await pipeline.join()
+            finally:
+                await pipeline.stop()
+
+        mock_enqueue.assert_not_called()
+        assert [title for _, _, title in digest.items] == ["Notice on Scheduled Maintenance"]
+
+    def test_stage_concurrency_config(self):
+        """Test per-stage worker counts"""
+        pipeline = main.Pipeline(concurrency={"classify": 4, "render": 0})
+
+        assert pipeline.concurrency == {"decode": 1, "classify": 4, "render": 1}
+
+class TestSymbolExtraction:
+    """Test multi-symbol extraction and the local symbol index"""
+
+    EXCHANGE_INFO = {"symbols": [
+        {"symbol": "WALUSDT", "baseAsset": "WAL", "status": "TRADING"},
+        {"symbol": "EDENBTC", "baseAsset": "EDEN", "status": "BREAK"},
+        {"symbol": "EDENUSDT", "baseAsset": "EDEN", "status": "TRADING"},
+        {"symbol": "PLUMEUSDT", "baseAsset": "PLUME", "status": "PENDING_TRADING"},
+    ]}
+
+    def test_extracts_every_symbol(self):
+        """Test digits, multiple tickers and body mentions"""
+        title = "Binance Will List Sats (1000SATS) and Walrus (WAL)"
+        body = "Deposits for Walrus (WAL) and Plume (PLUME) open at 08:00 (UTC)."
+
+        assert main.extract_symbols(title, body) == ["1000SATS", "WAL", "PLUME"]
+        assert main.extract_symbols("Notice (2025)", None) == []
+
+    def test_index_from_exchange_info(self):
+        """Test that an asset counts as trading if any of its pairs trade"""
+        index = main.SymbolIndex(path="")
+        index.assets = index._index(self.EXCHANGE_INFO)
+
+        assert index.status("EDEN") == "TRADING"
+        assert index.status("PLUME") == "PENDING_TRADING"
+        assert index.annotate(["WAL", "PLUME", "NEW"]) == ["WAL", "PLUME (not trading yet)", "NEW (not trading yet)"]
+
+    def test_annotate_without_snapshot(self):
+        """Test that nothing is flagged when no snapshot is loaded"""
+        assert main.SymbolIndex(path="").annotate(["NEW"]) == ["NEW"]
+
+    @patch('main.requests.get')
+    def test_refresh_writes_compact_snapshot(self, mock_get, tmp_path):
+        """Test background refresh and reloading the compact snapshot"""
+        mock_get.return_value = Mock(json=Mock(return_value=self.EXCHANGE_INFO))
+        path = str(tmp_path / "exchange_info.json")
+
+        assert main.SymbolIndex(path=path).refresh() == 3
+
+        reloaded = main.SymbolIndex(path=path)
+        assert reloaded.load() == 3
+        assert reloaded.status("WAL") == "TRADING"
+
+    def test_alert_lists_all_symbols(self):
+        """Test that the rendered alert flags symbols that are not trading"""
+        index = main.SymbolIndex(path="")
+        index.assets = index._index(self.EXCHANGE_INFO)
+        handler = main.TopicHandler("com_announcement_en", main.AnnouncementClassifier([]))
+
+        with patch('main.SYMBOLS', index):
+            token, text = handler.render({"title": "Binance Will List Plume (PLUME) and Walrus (WAL)"}, "rule")
+
+        assert token == "PLUME"
+        assert "Token: PLUME (not trading yet), WAL\n" in text
+
+class TestAnnouncementHistory:
+    """Test the fixed-size ring of recent announcements"""
+
+    def test_ring_evicts_oldest_and_its_index_entries(self):
+        """Test that memory stays bounded and indexes follow evictions"""
+        history = main.AnnouncementHistory(size=3)
+        for i, symbol in enumerate(["AAA", "BBB", "AAA", "CCC"]):
+            history.add({"title": f"Binance Will List T{i} ({symbol})", "catalogId": 48, "publishDate": 1000 * i})
+
+        assert history.count == 3
+        assert [r.title for r in history.recent()] == [
+            "Binance Will List T3 (CCC)", "Binance Will List T2 (AAA)", "Binance Will List T1 (BBB)",
+        ]
+        assert [r.title for r in history.symbol("aaa")] == ["Binance Will List T2 (AAA)"]
+        assert len(history.catalog(48)) == 3
+        assert sum(len(d) for d in history.by_symbol.values()) == 3
+
+    def test_recent_since(self):
+        """Test that only announcements newer than the cutoff are returned"""
+        history = main.AnnouncementHistory(size=10)
+        now = time.time()
+        history.add({"title": "old", "publishDate": (now - 7200) * 1000})
+        history.add({"title": "new", "publishDate": (now - 60) * 1000})
+
+        assert [r.title for r in history.recent(since=now - 3600)] == ["new"]
+
+    def test_recent_orders_by_publish_time(self):
+        """Test that an older catch-up article does not hide newer ones"""
+        history = main.AnnouncementHistory(size=10)
+        now = time.time()
+        history.add({"title": "stream", "publishDate": (now - 60) * 1000})
+        history.add({"title": "catch-up", "publishDate": (now - 7200) * 1000})
+
+        assert [r.title for r in history.recent(since=now - 3600)] == ["stream"]
+        assert [r.title for r in history.recent()] == ["stream", "catch-up"]
+
+    def test_classified_announcements_are_recorded(self, sample_websocket_messages):
+        """Test that every deduplicated announcement lands in the history"""
+        history = main.AnnouncementHistory(size=10)
+        handler = main.TopicHandler("com_announcement_en", main.AnnouncementClassifier(main.DEFAULT_ANNOUNCEMENT_RULES))
+        msg = sample_websocket_messages["new_listing_announcement"]
+        with patch('main.HISTORY', history), patch('main.DEDUP', main.AnnouncementDedup(path="")):
+            handler.classify(msg)
+            handler.classify(msg)
+
+        assert history.count == 1
+        assert history.symbol("TEST")[0].rule is not None
@@ -0,0 +1,154 @@
+import pytest
+import asyncio
+import json
+import time
+from unittest.mock import patch
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+class TestMetrics:
+    """Test counters, histograms and Prometheus rendering"""
+
+    def test_counters_and_histograms_render(self):
+        """Test the Prometheus text exposition"""
+        metrics = main.Metrics()
+        metrics.inc("messages_received", 3)
+        metrics.observe("receive_to_classify_seconds", 0.002)
+        metrics.observe("receive_to_classify_seconds", 0.7)
+
+        text = metrics.render()
+
+        assert "notificationbot_messages_received_total 3" in text
+        assert 'notificationbot_receive_to_classify_seconds_bucket{le="0.005"} 1' in text
+        assert 'notificationbot_receive_to_classify_seconds_bucket{le="1"} 2' in text
+        assert 'notificationbot_receive_to_classify_seconds_bucket{le="+Inf"} 2' in text
+        assert "notificationbot_receive_to_classify_seconds_count 2" in text
+
+    def test_health_responses(self):
+        """Test liveness and readiness decisions"""
+        with patch('main.METRICS', main.Metrics()) as metrics:
+            assert main.health_response("/readyz")[0] == 503
+            metrics.set_gauge("live_connections", 1)
+            assert main.health_response("/readyz")[0] == 200
+
+            metrics.mark_activity()
+            assert main.health_response("/healthz")[0] == 200
+            metrics.last_activity = time.monotonic() - main.CONFIG.health_max_silence - 1
+            assert main.health_response("/healthz")[0] == 503
+
+            assert main.health_response("/nope")[0] == 404
+
+    @pytest.mark.asyncio
+    async def test_metrics_server_serves_http(self):
+        """Test the asyncio HTTP endpoint end to end"""
+        server = await main.start_metrics_server("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        assert response.startswith(b"HTTP/1.1 200 OK")
+        assert b"notificationbot_reconnects_total" in response
+
+    @pytest.mark.asyncio
+    async def test_pipeline_records_latencies(self, sample_websocket_messages):
+        """Test that a matched announcement feeds the latency histograms"""
+        msg = sample_websocket_messages["new_listing_announcement"]
+        # publishDate is server time; this host runs 10 s behind Binance
+        clock = main.ClockSync()
+        clock.offset_ms = 10_000
+        data = json.loads(msg["data"])
+        data["publishDate"] = clock.now_ms() - 1500
+        msg = dict(msg, data=json.dumps(data))
+
+        metrics = main.Metrics()
+        with patch('main.METRICS', metrics), patch('main.CLOCK', clock), \
+             patch('main.DEDUP', main.AnnouncementDedup(path="")), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            await main.handle_message(msg, received_at=time.monotonic())
+
+        assert metrics.counters["messages_matched"] == 1
+        assert metrics.histograms["receive_to_classify_seconds"].count == 1
+        assert 1.5 <= metrics.histograms["publish_to_receive_seconds"].sum < 5
+        assert mock_enqueue.call_args[0][1] is not None
+
+    @pytest.mark.asyncio
+    async def test_delivery_records_ack_latency(self):
+        """Test that a delivered alert observes classify-to-ack latency"""
+        async def sender(chat_id, text):
+            return 200, None
+
+        metrics = main.Metrics()
+        with patch('main.METRICS', metrics):
+            outbox = main.TelegramOutbox(sender=sender)
+            await outbox.deliver("1", "alert", time.monotonic())
+
+        assert metrics.counters["telegram_sent"] == 1
+        assert metrics.histograms["classify_to_ack_seconds"].count == 1
+
+def blocking_handler():
+    time.sleep(0.3)
+
+class TestLoopMonitor:
+    """Test loop-lag measurement, stall stacks and the on-demand profiler"""
+
+    @pytest.mark.asyncio
+    async def test_stall_is_measured_and_blamed(self):
+        """Test that a blocking call shows up as lag with its stack logged"""
+        metrics = main.Metrics()
+        monitor = main.LoopMonitor(interval=0.02, threshold=0.1)
+        with patch('main.METRICS', metrics), patch('main.log') as mock_log:
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.05)
+            blocking_handler()
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert monitor.stalls == 1
+        assert metrics.histograms["loop_lag_seconds"].count >= 2
+        assert metrics.gauges["loop_lag_seconds_last"] < 0.3
+        stalled = [c for c in mock_log.call_args_list if c[0][1] == "loop_stalled"]
+        assert "blocking_handler" in stalled[0][1]["stack"]
+        assert monitor._watchdog is None
+
+    @pytest.mark.asyncio
+    async def test_profiler_writes_time_boxed_profile(self, tmp_path):
+        """Test that a capture stops on its own and lands in the directory"""
+        profiler = main.Profiler(seconds=0.05, directory=str(tmp_path))
+
+        assert profiler.start() is True
+        assert profiler.start() is False
+        await asyncio.sleep(0.1)
+
+        assert profiler.profile is None
+        assert os.path.dirname(profiler.last_path) == str(tmp_path)
+        import pstats
+        pstats.Stats(profiler.last_path)
+
+    @pytest.mark.asyncio
+    async def test_profiler_starts_on_signal(self, tmp_path):
+        """Test that SIGUSR1 triggers a capture"""
+        import signal
+        profiler = main.Profiler(seconds=0.05, directory=str(tmp_path))
+        profiler.install()
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            await asyncio.sleep(0.01)
+            assert profiler.profile is not None
+            await asyncio.sleep(0.1)
+        finally:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+
+        assert profiler.last_path is not None
@@ -0,0 +1,111 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import time
+from unittest.mock import patch, AsyncMock
+import aiohttp
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fakes import FakeAnnouncementServer, listing
+
+@pytest_asyncio.fixture
+async def rest_server():
+    """Start the local announcement listing stand-in"""
+    server = await FakeAnnouncementServer().start()
+    yield server
+    await server.stop()
+
+class TestAnnouncementPoller:
+    """Test the REST fallback poller against a local fake server"""
+
+    @pytest.mark.asyncio
+    async def test_fetch_is_incremental_and_conditional(self, rest_server):
+        """Test that only new articles are returned and 304s are used"""
+        poller = main.AnnouncementPoller(url=rest_server.url, catalog_ids=[48])
+        rest_server.publish(listing(1, "AAA"))
+
+        async with aiohttp.ClientSession() as session:
+            first = await poller.fetch(session, 48)
+            unchanged = await poller.fetch(session, 48)
+            rest_server.publish(dict(listing(2, "BBB"), publishDate=first[0]["publishDate"] + 1))
+            second = await poller.fetch(session, 48)
+
+        assert [a["title"] for a in first] == [listing(1, "AAA")["title"]]
+        assert first[0]["catalogId"] == 48
+        assert first[0]["catalogName"] == "New Cryptocurrency Listing"
+        assert unchanged == []
+        assert rest_server.not_modified == 1
+        assert [a["title"] for a in second] == [listing(2, "BBB")["title"]]
+
+    @pytest.mark.asyncio
+    async def test_lookback_skips_old_articles(self, rest_server):
+        """Test that articles older than the lookback are never alerted"""
+        poller = main.AnnouncementPoller(url=rest_server.url, catalog_ids=[48], lookback=60)
+        rest_server.publish(dict(listing(1), publishDate=int((time.time() - 3600) * 1000)))
+
+        async with aiohttp.ClientSession() as session:
+            assert await poller.fetch(session, 48) == []
+
+    @pytest.mark.asyncio
+    async def test_first_sweep_starts_after_last_seen(self, rest_server):
+        """Test that a restart does not re-sweep announcements it already handled"""
+        now = time.time()
+        dedup = main.AnnouncementDedup(path="")
+        dedup.check_and_add("seen", now - 30)
+        poller = main.AnnouncementPoller(url=rest_server.url, catalog_ids=[48], lookback=600,
+                                         since=dedup.newest())
+        rest_server.publish(dict(listing(1, "OLD"), publishDate=int((now - 60) * 1000)))
+        rest_server.publish(dict(listing(2, "NEW"), publishDate=int((now - 10) * 1000)))
+
+        async with aiohttp.ClientSession() as session:
+            found = await poller.fetch(session, 48)
+
+        assert [a["title"] for a in found] == [listing(2, "NEW")["title"]]
+        assert main.AnnouncementDedup(path="").newest() is None
+
+    @pytest.mark.asyncio
+    async def test_polls_only_while_socket_is_down(self, rest_server):
+        """Test adaptive polling, gap fill and the catch-up sweep"""
+        live = main.LiveConnections()
+        pipeline = AsyncMock()
+        poller = main.AnnouncementPoller(url=rest_server.url, catalog_ids=[48],
+                                         min_interval=0.02, max_interval=0.05)
+        rest_server.publish(listing(1, "GAP"))
+
+        task = asyncio.create_task(poller.run(live, pipeline))
+        try:
+            await asyncio.sleep(0.15)
+            polls_while_down = rest_server.requests
+            live.add(0)
+            await asyncio.sleep(0.05)
+            polls_after_catchup = rest_server.requests
+            await asyncio.sleep(0.15)
+            assert rest_server.requests == polls_after_catchup
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert polls_while_down >= 3
+        assert polls_after_catchup == polls_while_down + 1
+        pipeline.submit_announcement.assert_awaited_once()
+        assert pipeline.submit_announcement.call_args[0][0]["title"] == listing(1, "GAP")["title"]
+
+    @pytest.mark.asyncio
+    async def test_polled_announcement_uses_pipeline_dedup(self, sample_announcement_data):
+        """Test that a REST copy of a streamed announcement is not re-alerted"""
+        with patch('main.DEDUP', main.AnnouncementDedup(path="")), \
+             patch('main.enqueue_telegram') as mock_enqueue:
+            pipeline = main.Pipeline().start()
+            try:
+                await pipeline.submit_announcement(dict(sample_announcement_data), 0.0)
+                await pipeline.submit_announcement(dict(sample_announcement_data), 0.0)
+                await pipeline.join()
+            finally:
+                await pipeline.stop()
+
+        assert mock_enqueue.call_count == 1
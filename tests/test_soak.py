@@ -0,0 +1,35 @@
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add the main directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import soak
+
+class TestSoak:
+    """Test that the message loop keeps memory and tasks flat over time"""
+
+    def test_gate_flags_growth(self):
+        """Test that growth past either threshold fails the soak"""
+        flat = [(10, 400_000, 22), (20, 410_000, 23)]
+        leaking = [(10, 400_000, 22), (20, 900_000, 30)]
+
+        assert soak.check(flat, max_growth_kb=128, max_task_growth=2) == []
+        failures = soak.check(leaking, max_growth_kb=128, max_task_growth=2)
+        assert len(failures) == 2
+        assert soak.check(flat[:1], 128, 2) == ["not enough samples; run for longer"]
+
+    @pytest.mark.asyncio
+    async def test_short_soak_stays_flat(self):
+        """Test an hour of simulated traffic with reconnects, bad frames and Telegram errors"""
+        # pytest keeps every captured log record, which would read as growth
+        with patch.object(main.logger, "disabled", True):
+            report = await soak.run_soak(hours=1, speedup=2400)
+
+        assert report["reconnects"] == 6
+        assert report["rate_limited"] and report["server_errors"]
+        assert len(report["samples"]) >= 4
+        assert report["failures"] == [], report.get("top_growth")
@@ -1,6 +1,8 @@
 import pytest
 import asyncio
 import json
+import time
+import aiohttp
 from unittest.mock import Mock, patch, AsyncMock
 import sys
 import os
@@ -9,84 +11,410 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import main
+from fakes import configured
 
 class TestTelegramIntegration:
     """Test Telegram bot integration"""
     
-    @patch.dict(os.environ, {
-        'TELEGRAM_BOT_TOKEN': '123456789:TEST_BOT_TOKEN',
-        'TELEGRAM_CHAT_ID': '123456789'
-    })
-    @patch('main.requests.post')
-    @pytest.mark.asyncio
-    async def test_notify_telegram_success(self, mock_post):
-        """Test successful Telegram notification"""
-        # Reload main to pick up env vars
-        import importlib
-        importlib.reload(main)
-        
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_post.return_value = mock_response
-        
-        await main.notify_telegram("Test message")
+    @pytest.mark.asyncio
+    async def test_send_message_success(self, telegram_session_factory):
+        """Test a successful sendMessage call"""
+        session = telegram_session_factory(status=200)
+        with configured(main, bot_token='123456789:TEST_BOT_TOKEN'), \
+             patch('main.get_telegram_session', AsyncMock(return_value=session)):
+            assert await main.send_telegram_message('123456789', "Test message") == (200, None)
         
-        mock_post.assert_called_once()
-        call_args = mock_post.call_args
+        session.post.assert_called_once()
+        call_args = session.post.call_args
         assert call_args[1]['data']['chat_id'] == '123456789'
         assert call_args[1]['data']['text'] == 'Test message'
         assert 'bot123456789:TEST_BOT_TOKEN' in call_args[0][0]
     
-    @patch.dict(os.environ, {
-        'TELEGRAM_BOT_TOKEN': '123456789:TEST_BOT_TOKEN',
-        'TELEGRAM_CHAT_ID': '123456789'
-    })
-    @patch('main.requests.post')
     @pytest.mark.asyncio
-    async def test_notify_telegram_api_error(self, mock_post):
+    async def test_send_message_api_error(self, telegram_session_factory):
         """Test Telegram API error handling"""
-        import importlib
-        importlib.reload(main)
+        session = telegram_session_factory(status=400, text="Bad Request")
+        with patch('main.get_telegram_session', AsyncMock(return_value=session)):
+            # Should not raise exception, just log error
+            assert await main.send_telegram_message('123456789', "Test message") == (400, None)
         
-        mock_response = Mock()
-        mock_response.status_code = 400
-        mock_response.text = "Bad Request"
-        mock_post.return_value = mock_response
-        
-        # Should not raise exception, just log error
-        await main.notify_telegram("Test message")
-        
-        mock_post.assert_called_once()
+        session.post.assert_called_once()
     
-    @patch.dict(os.environ, {
-        'TELEGRAM_BOT_TOKEN': '',
-        'TELEGRAM_CHAT_ID': ''
-    }, clear=False)
-    @pytest.mark.asyncio
-    async def test_notify_telegram_missing_config(self):
-        """Test behavior when Telegram config is missing"""
-        import importlib
-        importlib.reload(main)
-        
-        # Should return early without making any requests
-        with patch('main.requests.post') as mock_post:
-            await main.notify_telegram("Test message")
-            mock_post.assert_not_called()
+    @pytest.mark.asyncio
+    async def test_enqueue_without_config(self):
+        """Test that alerts are not queued when Telegram is not configured"""
+        with configured(main, bot_token=''), patch('main.CHAT_IDS', []), \
+             patch('main.get_outbox') as mock_outbox:
+            assert main.enqueue_telegram("Test message") is False
+            mock_outbox.assert_not_called()
     
-    @patch.dict(os.environ, {
-        'TELEGRAM_BOT_TOKEN': '123456789:TEST_BOT_TOKEN',
-        'TELEGRAM_CHAT_ID': '123456789'
-    })
-    @patch('main.requests.post')
     @pytest.mark.asyncio
-    async def test_notify_telegram_network_error(self, mock_post):
+    async def test_send_message_network_error(self, telegram_session_factory):
         """Test network error handling"""
-        import importlib
-        importlib.reload(main)
-        
-        mock_post.side_effect = Exception("Network error")
-        
-        # Should not raise exception, just log error
-        await main.notify_telegram("Test message")
+        session = telegram_session_factory(side_effect=Exception("Network error"))
+        with patch('main.get_telegram_session', AsyncMock(return_value=session)):
+            # Should not raise exception, just log error
+            assert await main.send_telegram_message('123456789', "Test message") == (None, None)
         
-        mock_post.assert_called_once()
\ No newline at end of file
+        session.post.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_telegram_session_is_shared(self):
+        """Test that every send reuses one pooled session"""
+        first = await main.get_telegram_session()
+        second = await main.get_telegram_session()
+        try:
+            assert first is second
+            assert first.connector.limit == main.CONFIG.telegram_pool_size
+        finally:
+            await main.close_telegram_session()
+        assert first.closed
+
+class TestTelegramOutbox:
+    """Test the rate-limited outbound queue"""
+
+    @pytest.mark.asyncio
+    async def test_enqueue_does_not_wait_for_delivery(self):
+        """Test that enqueue returns before the sender completes"""
+        release = asyncio.Event()
+        sent = []
+
+        async def sender(chat_id, text):
+            await release.wait()
+            sent.append((chat_id, text))
+            return 200, None
+
+        outbox = main.TelegramOutbox(workers=1, sender=sender)
+        outbox.start()
+        try:
+            assert outbox.enqueue("1", "hello") is True
+            assert sent == []
+            release.set()
+            await outbox.drain(1)
+            assert sent == [("1", "hello")]
+            assert outbox.sent == 1
+        finally:
+            await outbox.stop()
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_honored(self):
+        """Test that a 429 pauses the chat and the message is retried"""
+        calls = []
+
+        async def sender(chat_id, text):
+            calls.append(asyncio.get_running_loop().time())
+            if len(calls) == 1:
+                return 429, 0.2
+            return 200, None
+
+        outbox = main.TelegramOutbox(workers=1, chat_rate=100, sender=sender)
+        assert await outbox.deliver("1", "hello") is True
+        assert len(calls) == 2
+        assert calls[1] - calls[0] >= 0.19
+
+    @pytest.mark.asyncio
+    async def test_permanent_error_is_not_retried(self):
+        """Test that a 400 response is counted as failed without retries"""
+        sender = AsyncMock(return_value=(400, None))
+        outbox = main.TelegramOutbox(sender=sender)
+
+        assert await outbox.deliver("1", "hello") is False
+        assert sender.call_count == 1
+        assert outbox.failed == 1
+
+    @pytest.mark.asyncio
+    async def test_drop_policies(self):
+        """Test that a full queue drops according to the configured policy"""
+        oldest = main.TelegramOutbox(maxsize=2, drop_policy="drop_oldest")
+        for text in ("a", "b", "c"):
+            oldest.enqueue("1", text)
+        assert [oldest.queue.get_nowait()[1][1] for _ in range(2)] == ["b", "c"]
+        assert oldest.dropped == 1
+
+        newest = main.TelegramOutbox(maxsize=2, drop_policy="drop_newest")
+        assert newest.enqueue("1", "a") and newest.enqueue("1", "b")
+        assert newest.enqueue("1", "c") is False
+        assert [newest.queue.get_nowait()[1][1] for _ in range(2)] == ["a", "b"]
+
+    def test_lower_lanes_shed_first(self):
+        """Test that a full queue sheds digests, then status, before any listing"""
+        outbox = main.TelegramOutbox(maxsize=3, drop_policy="drop_newest")
+        outbox.enqueue("1", "digest", lane="digest")
+        outbox.enqueue("1", "status", lane="status")
+        outbox.enqueue("1", "listing 1")
+
+        with patch.object(main, "METRICS", main.Metrics()):
+            assert outbox.enqueue("1", "listing 2") is True
+            assert outbox.enqueue("1", "late digest", lane="digest") is False
+            assert outbox.enqueue("1", "listing 3") is True
+            counters = main.METRICS.counters
+        assert outbox.queue.qsize("status") == 0
+        # Drops are counted under the lane that lost a message
+        assert counters["telegram_dropped_digest"] == 2
+        assert counters["telegram_dropped_status"] == 1
+        assert "telegram_dropped_listing" not in counters
+        assert [outbox.queue.get_nowait()[1][1] for _ in range(3)] == ["listing 1", "listing 2", "listing 3"]
+
+    @pytest.mark.asyncio
+    async def test_listings_preempt_backlog(self):
+        """Test that a listing queued behind a status backlog goes out next"""
+        sent = []
+
+        async def sender(chat_id, text):
+            sent.append(text)
+            await asyncio.sleep(0.01)
+            return 200, None
+
+        outbox = main.TelegramOutbox(workers=2, global_rate=1000, chat_rate=1000, sender=sender,
+                                     lane_rates={"status": 1000, "digest": 1000})
+        for i in range(10):
+            outbox.enqueue("1", f"status {i}", lane="status")
+        outbox.enqueue("1", "listing")
+        outbox.start()
+        try:
+            await asyncio.wait_for(outbox.queue.join(), 2)
+        finally:
+            await outbox.stop()
+
+        assert sent[0] == "listing"
+        assert len(sent) == 11
+
+    @pytest.mark.asyncio
+    async def test_stop_keeps_in_flight_messages(self, tmp_path):
+        """Test that sends cut off by stop are spooled with the queued ones"""
+        async def sender(chat_id, text):
+            await asyncio.sleep(60)
+            return 200, None
+
+        outbox = main.TelegramOutbox(workers=1, sender=sender)
+        outbox.enqueue(["1", "2"], "listing")
+        outbox.enqueue("1", "status", lane="status")
+        outbox.start()
+        await asyncio.sleep(0.01)
+        await outbox.stop()
+
+        spool = str(tmp_path / "spool.json")
+        assert outbox.save(spool) == 3
+        restored = main.TelegramOutbox()
+        assert restored.load(spool) == 3
+        assert [restored.queue.get_nowait()[1][:2] for _ in range(3)] == [
+            (("1",), "listing"), (("2",), "listing"), (("1",), "status"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_listing_not_held_by_chat_bucket_waiters(self):
+        """Test that a listing overtakes lower-lane waiters on a chat bucket"""
+        bucket = main.TokenBucket(rate=20, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def take(name, priority):
+            await bucket.acquire(priority)
+            order.append(name)
+
+        low = asyncio.create_task(take("status", 1))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(take("listing", 0))
+        await asyncio.gather(low, high)
+
+        assert order == ["listing", "status"]
+
+    @pytest.mark.asyncio
+    async def test_token_bucket_limits_rate(self):
+        """Test that the bucket spaces acquisitions beyond its burst"""
+        bucket = main.TokenBucket(rate=20, capacity=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        assert loop.time() - start >= 0.09
+
+class TestTelegramBroadcast:
+    """Test fan-out of one alert to many chats"""
+
+    def test_load_chat_ids_merges_env_and_file(self, tmp_path):
+        """Test that chat ids come from the env var and the chats file"""
+        chats_file = tmp_path / "chats.txt"
+        chats_file.write_text("# channels\n-1001\n\n-1002  # ops\n111\n")
+
+        result = main.load_chat_ids(str(chats_file), "111,222")
+
+        assert result == ["111", "222", "-1001", "-1002"]
+
+    def test_load_chat_ids_missing_file(self):
+        """Test that a missing chats file falls back to the env var"""
+        assert main.load_chat_ids("/nonexistent/chats.txt", "111") == ["111"]
+
+    @pytest.mark.asyncio
+    async def test_broadcast_reports_per_chat_status(self):
+        """Test that every chat gets the same text and failures are reported"""
+        texts = set()
+
+        async def sender(chat_id, text):
+            texts.add(id(text))
+            return (400, None) if chat_id == "bad" else (200, None)
+
+        outbox = main.TelegramOutbox(global_rate=1000, sender=sender)
+        chats = [str(i) for i in range(20)] + ["bad"]
+
+        report = await outbox.broadcast(chats, "alert")
+
+        assert report["bad"] is False
+        assert all(report[c] for c in chats[:-1])
+        assert len(texts) == 1
+
+    @pytest.mark.asyncio
+    async def test_broadcast_bounds_parallelism(self):
+        """Test that no more than broadcast_concurrency sends run at once"""
+        active = 0
+        peak = 0
+
+        async def sender(chat_id, text):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return 200, None
+
+        outbox = main.TelegramOutbox(global_rate=1000, broadcast_concurrency=3, sender=sender)
+        await outbox.broadcast([str(i) for i in range(12)], "alert")
+
+        assert peak == 3
+
+class TestAlertCoalescing:
+    """Test burst coalescing and the digest of unmatched announcements"""
+
+    def test_pack_messages_respects_limit(self):
+        """Test that parts are packed in order without exceeding the limit"""
+        parts = ["a" * 40, "b" * 40, "c" * 40]
+
+        messages = main.pack_messages(parts, limit=100)
+
+        assert messages == ["a" * 40 + "\n\n" + "b" * 40, "c" * 40]
+
+    def test_pack_messages_splits_overlong_part(self):
+        """Test that one huge alert is split at line breaks, then hard"""
+        text = "\n".join(["x" * 30] * 5) + "\n" + "y" * 130
+
+        messages = main.pack_messages([text], limit=64)
+
+        assert all(len(m) <= 64 for m in messages)
+        assert "".join(messages).replace("\n", "") == text.replace("\n", "")
+
+    @pytest.mark.asyncio
+    async def test_burst_is_merged_after_leading_alert(self):
+        """Test that the first alert goes out at once and the rest are merged"""
+        sent = []
+        coalescer = main.AlertCoalescer(lambda *message: sent.append(message), window=0.05)
+
+        coalescer.add("first", 1.0, "1")
+        assert sent == [("first", 1.0, ("1",))]
+        coalescer.add("second", 2.0, "2")
+        coalescer.add("third", 3.0, "3")
+        assert len(sent) == 1
+
+        await asyncio.sleep(0.08)
+
+        assert sent[1] == ("second\n\nthird", 2.0, ("2", "3"))
+        coalescer.add("later", 4.0)
+        assert len(sent) == 2
+
+    def test_flush_keeps_ids_with_their_message(self):
+        """Test that a burst split over several messages tags each with its own alerts"""
+        sent = []
+        coalescer = main.AlertCoalescer(lambda *message: sent.append(message), window=60, limit=20)
+        coalescer._window_ends = time.monotonic() + 60
+        coalescer.pending = [("a" * 8, None, "1"), ("b" * 8, None, "2"), ("c" * 8, None, "3")]
+
+        coalescer.flush()
+
+        assert sent == [("a" * 8 + "\n\n" + "b" * 8, None, ("1", "2")), ("c" * 8, None, ("3",))]
+
+    def test_zero_window_passes_through(self):
+        """Test that coalescing can be switched off"""
+        sent = []
+        coalescer = main.AlertCoalescer(lambda text, created_at, alert_ids: sent.append(text), window=0)
+
+        coalescer.add("one")
+        coalescer.add("two")
+
+        assert sent == ["one", "two"]
+
+    def test_digest_batches_titles(self):
+        """Test that unmatched announcements are summarized in one message"""
+        digest = main.AnnouncementDigest(interval=60)
+        digest.add("com_announcement_en", {"title": "Maintenance", "catalogName": "Latest News"})
+        digest.add("com_announcement_en", {"title": "Delisting of XYZ"})
+
+        with patch('main.enqueue_telegram') as mock_enqueue:
+            assert digest.flush() == 2
+            assert digest.flush() == 0
+
+        text = mock_enqueue.call_args[0][0]
+        assert text.startswith("Binance announcements digest (2)")
+        assert "- Maintenance [Latest News]" in text
+        assert mock_enqueue.call_args[1] == {"coalesce": False, "lane": "digest"}
+
+    def test_digest_disabled_by_default(self):
+        """Test that a zero interval keeps the old drop-and-log behavior"""
+        assert main.AnnouncementDigest(interval=0).add("t", {"title": "x"}) is False
+
+class TestTelegramCommands:
+    """Test the /recent, /symbol and /status chat commands"""
+
+    def history(self):
+        history = main.AnnouncementHistory(size=10)
+        now_ms = time.time() * 1000
+        history.add({"title": "Binance Will List Eden (EDEN)", "catalogId": 48, "publishDate": now_ms - 600_000}, "x")
+        history.add({"title": "Notice on Maintenance", "catalogId": 49, "publishDate": now_ms - 60_000})
+        return history
+
+    def test_recent_lists_newest_first(self):
+        """Test that /recent answers from memory within the window"""
+        reply = main.TelegramCommands(self.history()).answer("/recent@fake_bot")
+
+        assert reply.splitlines() == ["1m ago - Notice on Maintenance", "10m ago - Binance Will List Eden (EDEN)"]
+        assert main.TelegramCommands(main.AnnouncementHistory(3)).answer("/recent 2") == "No announcements in the last 2h."
+
+    def test_symbol_includes_trading_status(self):
+        """Test that /symbol shows the exchange status and matching announcements"""
+        with patch.object(main.SYMBOLS, 'assets', {"EDEN": "TRADING"}):
+            reply = main.TelegramCommands(self.history()).answer("/symbol eden")
+
+        assert reply.splitlines() == ["EDEN: TRADING", "10m ago - Binance Will List Eden (EDEN)"]
+        assert main.TelegramCommands(self.history()).answer("/symbol") == "Usage: /symbol XYZ"
+
+    def test_status_and_unknown_commands(self):
+        """Test /status and that other commands are ignored"""
+        commands = main.TelegramCommands(self.history())
+
+        assert "Announcements in memory: 2/10" in commands.answer("/status")
+        assert commands.answer("/start") is None
+
+    @pytest.mark.asyncio
+    async def test_poll_answers_only_known_chats(self):
+        """Test the getUpdates loop against the fake Telegram server"""
+        from fakes import FakeTelegramServer
+
+        telegram = await FakeTelegramServer().start()
+        telegram.updates = [
+            {"update_id": 7, "message": {"chat": {"id": 1001}, "text": "/recent"}},
+            {"update_id": 8, "message": {"chat": {"id": 666}, "text": "/status"}},
+        ]
+        commands = main.TelegramCommands(self.history())
+        try:
+            with configured(main, telegram_api_base=telegram.url, bot_token="123:FAKE"), \
+                 patch('main.CHAT_IDS', ["1001"]):
+                async with aiohttp.ClientSession() as session:
+                    assert await commands.poll(session) == 2
+                await main.get_outbox().drain(2)
+        finally:
+            await main.stop_outbox()
+            await main.close_telegram_session()
+            await telegram.stop()
+
+        assert commands.offset == 9
+        assert [(chat, text.splitlines()[0]) for chat, text, _ in telegram.messages] == [
+            ("1001", "1m ago - Notice on Maintenance"),
+        ]